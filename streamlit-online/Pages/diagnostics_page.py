@@ -0,0 +1,111 @@
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+import streamlit as st
+
+from engine.instrument import metrics
+from engine.loaders import parse_flag
+from mode_toggle import get_password_secret
+from prefetch import get_prefetcher
+
+# Set to 1 to give every visitor the profiling controls (e.g. on a local run without a password).
+CONTROLS_ENV = "MOVIE_APP_DIAGNOSTICS_CONTROLS"
+
+
+def _controls_unlocked() -> bool:
+    """Profiling and resets act on the whole process: only for the env opt-in or the heavy-mode password."""
+    if parse_flag(os.getenv(CONTROLS_ENV)):
+        return True
+    password_secret = get_password_secret()
+    if not password_secret:
+        return False
+    if st.session_state.get("diagnostics_unlocked", False):
+        return True
+    with st.expander("🔒 Profiling controls"):
+        pwd = st.text_input("Heavy mode password", type="password", key="diagnostics_pwd")
+        if st.button("Unlock", key="diagnostics_unlock_btn"):
+            if pwd == password_secret:
+                st.session_state["diagnostics_unlocked"] = True
+                st.rerun()
+            st.warning("Incorrect password.")
+    return False
+
+
+st.title("🩺 Diagnostics")
+st.caption("Timings and memory of this app process. Not linked from the menu.")
+
+controls = _controls_unlocked()
+if controls:
+    col1, col2 = st.columns(2)
+    with col1:
+        profile = st.toggle("Profile timed calls (cProfile)", value=metrics.profile)
+    with col2:
+        trace = st.toggle("Trace Python allocations (tracemalloc)", value=tracemalloc.is_tracing())
+    metrics.configure(profile=profile, tracemalloc=trace)
+
+snapshot = metrics.snapshot()
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("RSS", "n/a" if snapshot["rss_mb"] is None else f"{snapshot['rss_mb']:.0f} MB")
+with col2:
+    st.metric("Measuring for", f"{(snapshot['taken_at'] - snapshot['since']) / 60:.0f} min")
+with col3:
+    st.metric("PID", snapshot["pid"])
+
+st.header("Stages")
+stages = pd.DataFrame.from_dict(
+    {name: {k: v for k, v in row.items() if k != "profile"} for name, row in snapshot["stages"].items()},
+    orient="index",
+)
+if stages.empty:
+    st.write("Nothing measured yet.")
+else:
+    st.dataframe(stages.sort_values("total_s", ascending=False), width="stretch")
+
+st.header("Artifacts")
+artifacts = pd.DataFrame.from_dict(snapshot["artifacts"], orient="index")
+if artifacts.empty:
+    st.write("No artifact loaded in this process yet.")
+else:
+    artifacts["loaded_at"] = pd.to_datetime(artifacts["loaded_at"], unit="s")
+    st.dataframe(artifacts, width="stretch")
+    st.caption("RSS deltas overlap when artifacts load concurrently (prefetch) or load each other.")
+
+prefetch = get_prefetcher().status()
+if prefetch:
+    st.subheader("Prefetch")
+    st.dataframe(
+        pd.DataFrame(
+            [{"artifact": s.name, "state": s.state, "seconds": s.seconds, "error": s.error} for s in prefetch.values()]
+        ),
+        width="stretch",
+    )
+
+st.header("Result cache")
+st.json(snapshot.get("result_cache", {}))
+
+profiles = {name: row["profile"] for name, row in snapshot["stages"].items() if "profile" in row}
+if profiles:
+    st.header("Profiles (last call per stage)")
+    for name, text in profiles.items():
+        with st.expander(name):
+            st.code(text)
+if "top_allocations" in snapshot:
+    st.header("Top allocations")
+    st.code("\n".join(snapshot["top_allocations"]))
+
+st.markdown("---")
+col1, col2 = st.columns(2)
+with col1:
+    st.download_button(
+        "Download JSON",
+        metrics.to_json(indent=1),
+        file_name=f"metrics-{snapshot['pid']}-{int(time.time())}.json",
+        mime="application/json",
+    )
+with col2:
+    if controls and st.button("Reset measurements"):
+        metrics.reset()
+        st.rerun()
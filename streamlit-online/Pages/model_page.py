@@ -1,103 +1,45 @@
 import streamlit as st
-import numpy as np
 
-from data_loader import get_data_source_label, load_cf_bundle, load_content_bundle
+from data_loader import (
+    get_data_source_label,
+    get_service,
+    load_cf_bundle,
+    load_content_engine,
+    load_facet_index,
+    load_movies,
+    search_titles,
+)
+from facet_controls import facet_filter
 from mode_toggle import resolve_light_mode
+from poster_cards import clear_results, set_results, show_results
+from prefetch import start_prefetch
 
 # Streamlit app
 st.title("🎥 Cool Movie Recommendation Page")
 st.write("Choose a recommendation method below:")
 
 light_mode = resolve_light_mode(key_prefix="model_")
+if not light_mode:
+    # Start the ratings/SVD loads now so they overlap with the content models below.
+    start_prefetch(include_heavy=True)
+
+# One filter for every tab; it is applied before each recommender picks its top N.
+facet_index = load_facet_index()
+facets = facet_filter(facet_index, key_prefix="model_") if facet_index is not None else None
 
 # Tabs for different recommendation methods
 tab1, tab2, tab3 = st.tabs(["👤 User-Based", "✨ Custom Preferences", "🎬 Movie Similarity"])
 
-content_bundle = load_content_bundle()
-if content_bundle is None:
+# Loaded up front so a memory failure falls back to light mode before any tab renders.
+if load_content_engine() is None:
     st.session_state["model_heavy_mode_unlocked"] = False
     st.session_state["model_light_mode_override"] = True
     st.stop()
-movies, features, knn_pl, title_to_idx, idx_to_title = content_bundle
+# Recommendations come from the same engine the HTTP server uses (``python -m engine.server``).
+service = get_service()
 st.caption(f"Data source: {get_data_source_label()}")
 
 
-def scrollableElement(output, header):
-    scroll_container_style = """
-    <style>
-    .scrollable-container {
-        white-space: nowrap;
-        overflow-x: auto;
-    }
-
-    .scrollable-container img {
-        display: inline-block;
-        margin-right: 16px;
-        border: 1px solid #ccc;
-        border-radius: 4px;
-    }
-    </style>
-    """
-    st.markdown(scroll_container_style, unsafe_allow_html=True)
-
-    image_elements = ""
-    if "rating" in output.columns:
-        for img_path, title, rating in zip(
-            output["poster_path"].values, output["title"].values, output["rating"].values
-        ):
-            image_elements += f'''<div style="display: inline-block; text-align: center;">
-            <img src="{img_path}" alt="Some Image" width="120" height="160">
-            <h6 style= "padding-top: 10px">{title}</h6>
-            <h6>User rating: {rating}</h6>
-            </div>'''
-    else:
-        for img_path, title in zip(output["poster_path"].values, output["title"].values):
-            image_elements += f'''<div style="display: inline-block; text-align: center;">
-            <img src="{img_path}" alt="Some Image" width="120" height="160">
-            <h6 style= "padding-top: 10px">{title}</h6>
-            </div>'''
-
-    st.markdown(
-        f"""
-        <div class="scrollable-container">
-        <h3>{header}</h3>
-            {image_elements}
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-
-
-def get_cf_recommendations(user_id, ratings, algo, weighted_algo, top_n=10, weighted=False):
-    user_ratings = ratings[ratings["userId"] == user_id]
-    user_movies = user_ratings["movieId"].tolist()
-    all_movies = movies["movieId"].tolist()
-    movies_to_predict = list(set(all_movies) - set(user_movies))
-
-    predictions = [(weighted_algo if weighted else algo).predict(user_id, movie_id) for movie_id in movies_to_predict]
-    predictions = sorted(predictions, key=lambda x: x.est, reverse=True)
-
-    top_predictions = predictions[:top_n]
-    top_movie_ids = [pred.iid for pred in top_predictions]
-    return movies[movies["movieId"].isin(top_movie_ids)]
-
-
-def get_content_recommendation(movieName, numberOfMovies=10, direct=False):
-    vector = None
-    if direct:
-        vector = movieName
-    else:
-        index = title_to_idx[movieName]
-        vector = features.iloc[[index]].values
-    vector = knn_pl.named_steps["L2 normalization"].transform(vector)
-    _, indices = knn_pl.named_steps.KNN.kneighbors(vector.reshape(1, -1), numberOfMovies + 1)
-    if direct:
-        indices = indices[0]
-    else:
-        indices = [i for i in indices[0] if i != index]
-    return movies[movies.title.isin(idx_to_title[indices].tolist())]
-
-
 # 1. User-Based Recommendations
 with tab1:
     st.subheader("👤 Recommendations for a User")
@@ -113,62 +55,58 @@ with tab1:
             st.session_state["model_heavy_mode_unlocked"] = False
             st.session_state["model_light_mode_override"] = True
             st.stop()
-        ratings, algo, weighted_algo = cf_bundle
-        user_choices = list(ratings["userId"].unique().astype(str))
+        ratings, _, _ = cf_bundle
+        user_choices = list(ratings.user_ids.astype(str))
         user_id = st.selectbox("Select a User ID", options=user_choices)
         useWeightedRating = st.toggle("Use Weighted Ratings", False)
         if st.button("Get Recommendations"):
-            temp = ratings[ratings["userId"] == int(user_id)]
-            watched_movies = movies[movies["movieId"].isin(temp["movieId"])]
-            watched_movies = temp.merge(watched_movies, on="movieId").sort_values(
-                ["rating", "popularity", "timestamp"], ascending=False
-            )
-            if not watched_movies.empty:
-                scrollableElement(watched_movies, "Movies Watched by User")
+            set_results("user_watched", service.user_history(int(user_id)), "Movies Watched by User")
+            if ratings.user_movies(int(user_id)).size:
+                positions, scores = service.hybrid_for_user(int(user_id), weighted=useWeightedRating, facets=facets)
+                set_results("user_recommended", service.rows(positions, scores), "Recommended Movies")
             else:
-                st.write("No movies watched by this user.")
-            if not temp.empty:
-                recommendations = get_cf_recommendations(
-                    int(user_id), ratings, algo, weighted_algo, weighted=useWeightedRating
-                )
-                content_rec = [get_content_recommendation(title) for title in recommendations["title"]]
-                if content_rec:
-                    recommendations = pd.concat(
-                        [recommendations, pd.concat(content_rec, ignore_index=True)], ignore_index=True
-                    )
-                scrollableElement(recommendations, "Recommended Movies")
+                clear_results("user_recommended")
+        # Results stay on screen (and page) across the reruns the page buttons trigger.
+        show_results("user_watched", empty_message="No movies watched by this user.")
+        show_results("user_recommended")
 
 # 2. Custom User Preferences
 with tab2:
     st.subheader("✨ Recommendations Based on Your Preferences")
-    genres = features.columns[:-1]
+    genres = service.genres()
     selected_genres = st.multiselect("Choose your favorite genres:", genres)
 
     if st.button("Recommend for Me"):
-        profile = []
         if selected_genres:
-            for genre in features.columns:
-                profile.append(1 if genre in selected_genres else 0)
-            profile = np.array(profile, dtype=np.float32).reshape(1, -1)
-            recommendations = get_content_recommendation(profile, 50, True).sort_values(
-                ["weightedVoteAverage", "popularity"], ascending=False
-            )
-            scrollableElement(recommendations, "Recommended Movies")
+            positions, _ = service.genre_profile(selected_genres, 50, facets=facets)
+            set_results("genre_recommended", service.rows(positions), "Recommended Movies")
         else:
+            clear_results("genre_recommended")
             st.write("Please select at least one genre to get recommendations.")
+    show_results("genre_recommended")
 
 # 3. Movie Similarity Recommendations
 with tab3:
     st.subheader("🎬 Recommendations Based on a Movie")
-    selected_movie = st.selectbox("Pick a Movie", options=movies["title"])
-    st.image(movies[movies["title"] == selected_movie]["poster_path"].values[0], width=200)
-    st.write(f"**Popularity:** {movies[movies['title'] == selected_movie]['popularity'].values[0]}")
-    st.write(
-        f"**Weighted Vote Average:** {movies[movies['title'] == selected_movie]['weightedVoteAverage'].values[0]:.2f}"
-    )
-    st.write(f"**Runtime:** {movies[movies['title'] == selected_movie]['runtime'].values[0]} minutes")
-    st.write(f"**Release Date:** {movies[movies['title'] == selected_movie]['release_date'].values[0]}")
+    movie_query = st.text_input("Search for a movie", key="similar_movie_query")
+    # Narrow the picker to the matches instead of sending every title to the browser.
+    if movie_query:
+        choices = search_titles(movie_query, limit=50, columns=["title"])["title"]
+    else:
+        choices = load_movies(["title"])["title"]
+    if len(choices) == 0:
+        st.write("No movies match that search.")
+        st.stop()
+    selected_movie = st.selectbox("Pick a Movie", options=choices)
+    # One hashed title lookup instead of a scan of the title column per field.
+    details = service.movie_by_title(selected_movie)
+    st.image(details["poster_path"], width=200)
+    st.write(f"**Popularity:** {details['popularity']}")
+    st.write(f"**Weighted Vote Average:** {details['weightedVoteAverage']:.2f}")
+    st.write(f"**Runtime:** {details['runtime']} minutes")
+    st.write(f"**Release Date:** {details['release_date']}")
 
     if st.button("Find Similar Movies"):
-        recommendations = get_content_recommendation(selected_movie, 50)
-        scrollableElement(recommendations, "Recommended Movies")
+        positions, _ = service.similar_to_title(selected_movie, 50, facets=facets)
+        set_results("similar_recommended", service.rows(positions), "Recommended Movies")
+    show_results("similar_recommended")
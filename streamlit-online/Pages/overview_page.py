@@ -1,11 +1,11 @@
 
 import streamlit as st
-import pandas as pd
 from PIL import Image
 import requests
 import io
 
-from data_loader import load_movies
+from data_loader import search_titles
+from poster_cards import set_results, show_results
 # Load banner image
 @st.cache_resource
 def load_image():
@@ -13,9 +13,6 @@ def load_image():
     image = image.crop((200, 600, 2120, 1200))
     return image
 
-if 'df' not in st.session_state:
-    st.session_state.df = load_movies()
-
 if "banner_image" not in st.session_state:
     st.session_state.banner = load_image()
 
@@ -47,50 +44,10 @@ st.markdown("---")
 st.subheader("🎥 Quick Movie Search")
 user_input = st.text_input("Search for a movie to explore its details:")
 if user_input:
-    output = st.session_state.df[st.session_state.df['title'].str.casefold().str.startswith(user_input.casefold())].head(30)
-    output_temp = st.session_state.df[st.session_state.df['title'].str.contains(user_input, case=False)].head(30)
-    output = pd.concat([output, output_temp]).drop_duplicates(subset=['title'], keep='first')
-    # images = [st.image(image, width=200) for image in output['poster_path'].values]
-    # CSS for horizontal scroll
-    scroll_container_style = """
-    <style>
-    .scrollable-container {
-        /* Force images to stay on one line and scroll horizontally */
-        white-space: nowrap; 
-        overflow-x: auto;  
-    }
-
-    /* Style each image (inline-block to stay side-by-side) */
-    .scrollable-container img {
-        display: inline-block;
-        margin-right: 16px;  /* spacing between images */
-        border: 1px solid #ccc; /* optional: add a border or some styling */
-        border-radius: 4px;     /* optional: rounded corners */
-    }
-    </style>
-    """
-
-    # Inject CSS
-    st.markdown(scroll_container_style, unsafe_allow_html=True)
-
-    # --- 3) Build a single HTML string with all images ---
-    image_elements = ""
-    for img_path, title in zip(output['poster_path'].values, output['title'].values):
-        # Adjust width/height to fit your needs
-        image_elements += f'''<div style="display: inline-block; text-align: center;">
-        <img src="{img_path}" alt="Some Image" width="120" height="160">
-        <h6 style= "padding-top: 10px">{title}</h6>
-        </div>'''
-
-    # --- 4) Display them in one container ---
-    st.markdown(
-        f"""
-        <div class="scrollable-container">
-            {image_elements}
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    # Only the columns the cards show are loaded; every session shares them.
+    output = search_titles(user_input, limit=30, columns=["title", "poster_path", "popularity"])
+    set_results("overview_search", output)
+    show_results("overview_search", empty_message="No movies match that search.")
 
 # Add a fun fact or inspirational quote about movies
 st.markdown("---")
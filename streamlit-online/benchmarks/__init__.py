@@ -0,0 +1 @@
+"""Synthetic data generator and benchmark harness for the app's loaders and recommenders."""
@@ -0,0 +1,153 @@
+"""Benchmark the poster thumbnail cache against a local stand-in for the TMDB image server.
+
+Usage::
+
+    python -m benchmarks.posters [--posters 300] [--workers 8] [--latency-ms 50] [--cache DIR]
+
+``PosterServer`` answers any ``/<name>.jpg`` with a deterministic full-size
+(500x750) JPEG after ``latency`` seconds, and with 404 for names starting with
+``missing``, so the cache can be exercised without network access. The run
+fetches one page of cards cold, the rest of the posters in pages as the cards
+ask for them, then every poster again warm, and reports the latencies, the
+bytes downloaded against the bytes stored and how many requests reached the
+server (each poster exactly once).
+"""
+
+import argparse
+import hashlib
+import io
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from PIL import Image
+
+from engine.posters import PosterCache
+
+POSTER_SIZE = (500, 750)
+PAGE_SIZE = 10
+
+
+def poster_bytes(name: str, size=POSTER_SIZE) -> bytes:
+    """A JPEG of ``size`` whose colours depend on ``name``."""
+    digest = hashlib.sha256(name.encode("utf-8")).digest()
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    image = Image.blend(image, Image.new("RGB", size, tuple(digest[:3])), 0.6)
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+class PosterServer:
+    """Threaded HTTP server on localhost serving ``poster_bytes``; use as a context manager."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency)
+                name = self.path.rsplit("/", 1)[-1]
+                if name.startswith("missing") or not name.endswith(".jpg"):
+                    self.send_error(404)
+                    return
+                body = poster_bytes(name)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def poster_urls(self, n: int, missing: int = 0) -> List[str]:
+        return [f"{self.url}/t/p/w500/{i:08x}.jpg" for i in range(n)] + [
+            f"{self.url}/t/p/w500/missing-{i}.jpg" for i in range(missing)
+        ]
+
+    def __enter__(self) -> "PosterServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def benchmark(root: str, n_posters: int, workers: int, latency: float, page_size: int = PAGE_SIZE) -> dict:
+    with PosterServer(latency) as server:
+        urls = server.poster_urls(n_posters, missing=2)
+        posters = PosterCache(root, workers=workers)
+        started = time.perf_counter()
+        first = posters.thumbnails(urls[:page_size])
+        first_page_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for start in range(page_size, len(urls), page_size):
+            posters.request(urls[start + page_size : start + 2 * page_size])
+            posters.thumbnails(urls[start : start + page_size])
+        rest_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        warm = posters.thumbnails(urls)
+        warm_s = time.perf_counter() - started
+        stats = posters.stats()
+        posters.close()
+        return {
+            "posters": n_posters,
+            "workers": workers,
+            "first_page_s": first_page_s,
+            "first_page_ok": sum(path is not None for path in first),
+            "rest_s": rest_s,
+            "warm_s": warm_s,
+            "warm_ok": sum(path is not None for path in warm),
+            "server_requests": server.requests,
+            **stats,
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posters", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=8, help="concurrent downloads")
+    parser.add_argument("--latency-ms", type=float, default=50, help="stand-in server delay per request")
+    parser.add_argument("--cache", help="thumbnail cache directory (default: a temporary one)")
+    args = parser.parse_args(argv)
+
+    root = args.cache or tempfile.mkdtemp(prefix="posters-")
+    try:
+        report = benchmark(root, args.posters, args.workers, args.latency_ms / 1000)
+    finally:
+        if not args.cache:
+            shutil.rmtree(root, ignore_errors=True)
+    print(
+        f"first page  {report['first_page_ok']:>5} posters {report['first_page_s'] * 1000:>9.1f} ms\n"
+        f"rest        {report['posters'] - PAGE_SIZE:>5} posters {report['rest_s'] * 1000:>9.1f} ms\n"
+        f"warm        {report['warm_ok']:>5} posters {report['warm_s'] * 1000:>9.1f} ms\n"
+        f"{report['server_requests']} requests for {report['posters']} posters + 2 missing; "
+        f"{report['bytes_in'] / 2**20:.1f} MB downloaded -> {report['bytes_out'] / 2**20:.2f} MB of {report['format']} "
+        f"thumbnails"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
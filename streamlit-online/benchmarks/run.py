@@ -0,0 +1,407 @@
+"""Benchmark the app's loaders and recommenders on a data folder.
+
+Usage::
+
+    python -m benchmarks.run --scale 100k [--data DIR] [--out results.json]
+    python -m benchmarks.run --data /path/to/data --out results.json
+    python -m benchmarks.run compare before.json after.json
+
+With ``--scale`` the folder is generated by ``benchmarks.synthetic`` (under
+``--data``, default ``./bench-data/<scale>``) unless it already holds data from
+the same parameters. Every stage runs in a fresh process with
+``MOVIE_APP_LOCAL_DATA_DIR`` pointing at the folder and goes through
+``data_loader`` exactly like the pages do, so whatever else the environment
+configures (``MOVIE_APP_ANN_INDEX``, ``MOVIE_APP_MODEL_STORE``, exported
+factors or columnar tables in the folder) is what gets measured:
+
+    load       every loader twice in one process: ``cold`` (first call) and
+               ``warm`` (cached), with the RSS each load added
+    restart    the same loads in a second process, now with a warm page cache
+    cf         top-N for sampled users, excluding their rated movies
+    content    similar movies for sampled titles
+    profile    genre-profile queries
+    hybrid     CF seeds fused with their content neighbours
+    search     title search: prefixes, substrings and typos
+    analytics  the Analysis page aggregates, computed from the ratings
+
+Query stages report latency percentiles of the timed calls (the first call
+separately) and the peak RSS growth while they ran. The page cache is not
+dropped before ``load``, so its ``cold`` figures are only truly cold on the
+first run after generating or copying the data.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from benchmarks import synthetic
+
+RESULTS_VERSION = 1
+QUERY_STAGES = ("cf", "content", "profile", "hybrid", "search", "analytics")
+STAGES = ("load", "restart") + QUERY_STAGES
+# Loaders in the order the pages trigger them.
+LOADERS = (
+    "movies",
+    "title_index",
+    "content_engine",
+    "ratings_index",
+    "svd",
+    "weighted_svd",
+)
+ENV_VARS = (
+    "MOVIE_APP_ANN_INDEX",
+    "MOVIE_APP_ANN_PARAMS",
+    "MOVIE_APP_MODEL_STORE",
+    "MOVIE_APP_CACHE_DIR",
+    "MOVIE_APP_RESULT_CACHE_MB",
+    "OMP_NUM_THREADS",
+)
+
+
+def _rss_mb() -> float:
+    from engine.instrument import rss_bytes
+
+    rss = rss_bytes()
+    return float("nan") if rss is None else rss / (1 << 20)
+
+
+def _reset_peak() -> bool:
+    """Restart the kernel's high-water mark (Linux); False when it cannot be reset."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _latency(seconds) -> dict:
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    if ms.size == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+def _loader(name: str) -> Callable:
+    import data_loader
+
+    if name == "svd":
+        return data_loader.load_svd_scorer
+    if name == "weighted_svd":
+        return lambda: data_loader.load_svd_scorer(weighted=True)
+    return getattr(data_loader, f"load_{name}")
+
+
+def _load_stage() -> dict:
+    from engine.instrument import metrics
+
+    out = {"cold": {}, "warm": {}}
+    for phase in ("cold", "warm"):
+        for name in LOADERS:
+            before = _rss_mb()
+            started = time.perf_counter()
+            value = _loader(name)()
+            elapsed = time.perf_counter() - started
+            if value is None:
+                raise RuntimeError(f"load_{name} returned None")
+            out[phase][name] = {"seconds": elapsed, "rss_delta_mb": _rss_mb() - before}
+    out["peak_rss_mb"] = _peak_rss_mb()
+    out["rss_mb"] = _rss_mb()
+    out["stages"] = metrics.snapshot()["stages"]
+    from data_loader import get_data_source_label
+
+    out["source"] = get_data_source_label()
+    return out
+
+
+def _queries(stage: str, rng: np.random.Generator, n: int):
+    """Set up ``stage`` through the loaders; returns the list of zero-argument queries to time."""
+    import data_loader
+
+    if stage == "search":
+        movies = data_loader.load_movies()
+        data_loader.load_title_index()
+        titles = movies["title"].to_numpy()[rng.integers(0, len(movies), n)].tolist()
+        queries = []
+        for i, title in enumerate(titles):
+            kind = i % 3
+            if kind == 0:
+                text = title[: rng.integers(2, 7)]
+            elif kind == 1:
+                words = title.split(" ")
+                text = words[len(words) // 2]
+            else:
+                cut = int(rng.integers(1, max(len(title) - 1, 2)))
+                text = title[: cut - 1] + title[cut] + title[cut - 1] + title[cut + 1 :]
+            queries.append(lambda text=text: data_loader.search_titles(text, 30))
+        return queries
+
+    if stage == "analytics":
+        from engine.aggregates import RatingAggregates
+
+        movies, ratings = data_loader.load_movies(), data_loader.load_ratings_index()
+        return [lambda: RatingAggregates.compute(ratings, movies, source="benchmark") for _ in range(max(n // 20, 3))]
+
+    if stage in ("content", "profile"):
+        engine = data_loader.load_content_engine()
+        movies = engine.movies
+        if stage == "content":
+            titles = movies["title"].to_numpy()[rng.integers(0, len(movies), n)].tolist()
+            return [lambda title=title: engine.title_neighbours(title, 50) for title in titles]
+        features = engine.features
+        queries = []
+        for _ in range(n):
+            profile = np.zeros((1, features.shape[1]), dtype=np.float32)
+            profile[0, rng.choice(features.shape[1] - 1, rng.integers(1, 4), replace=False)] = 1
+            queries.append(lambda profile=profile: engine.vector_neighbours(profile, 50))
+        return queries
+
+    ratings, algo, _ = data_loader.load_cf_bundle()
+    users = ratings.user_ids[rng.integers(0, ratings.n_users, n)].tolist()
+    if stage == "cf":
+        return [lambda user=user: algo.recommend(user, 10, exclude=ratings.user_movies(user)) for user in users]
+
+    engine = data_loader.load_content_engine()
+
+    def hybrid(user):
+        watched = ratings.user_movies(user)
+        positions, scores = algo.recommend(user, 10, exclude=watched)
+        return engine.hybrid_scores(algo.item_ids[positions], scores, exclude=watched, rating_scale=algo.rating_scale)
+
+    return [lambda user=user: hybrid(user) for user in users]
+
+
+def _query_stage(stage: str, n: int, seed: int) -> dict:
+    started = time.perf_counter()
+    queries = _queries(stage, np.random.default_rng(seed), n)
+    setup = time.perf_counter() - started
+    baseline = _rss_mb()
+    resettable = _reset_peak()
+    peak_before = _peak_rss_mb()
+
+    started = time.perf_counter()
+    queries[0]()
+    first = time.perf_counter() - started
+    durations = []
+    for query in queries[1:]:
+        started = time.perf_counter()
+        query()
+        durations.append(time.perf_counter() - started)
+    out = {
+        "setup_s": setup,
+        "first_ms": first * 1000,
+        "latency": _latency(durations),
+        "qps": len(durations) / sum(durations) if durations else None,
+        "rss_mb": baseline,
+        "peak_rss_delta_mb": _peak_rss_mb() - (baseline if resettable else peak_before),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    return out
+
+
+def _child(stage: str, data_dir: str, n: int, seed: int, queue) -> None:
+    # Only the data folder is forced; the rest of the environment is what is being measured.
+    os.environ["MOVIE_APP_LOCAL_DATA_DIR"] = data_dir
+    from streamlit import config, logger
+
+    # Loaders run outside ``streamlit run``; silence the "no runtime" warnings. Reading an
+    # option first parses the config, which would otherwise reset the level later.
+    config.get_option("logger.level")
+    logger.set_log_level("error")
+    try:
+        started = time.perf_counter()
+        result = _load_stage() if stage in ("load", "restart") else _query_stage(stage, n, seed)
+        result["wall_s"] = time.perf_counter() - started
+    except Exception as exc:
+        result = {"error": f"{type(exc).__name__}: {exc}"}
+    queue.put(result)
+
+
+def run_stage(stage: str, data_dir: str, n: int = 200, seed: int = 0) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(stage, os.path.abspath(data_dir), n, seed, queue))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0 and queue.empty():
+        # Killed (usually by the OOM killer) before it could report.
+        return {"error": f"exit code {proc.exitcode}"}
+    return queue.get()
+
+
+def _git() -> dict:
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def git(*args) -> Optional[str]:
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=here, capture_output=True, text=True, check=True, timeout=30
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": git("rev-parse", "HEAD"), "branch": git("rev-parse", "--abbrev-ref", "HEAD"), "dirty": bool(status)}
+
+
+def _versions() -> Dict[str, Optional[str]]:
+    from importlib import metadata
+
+    versions = {"python": platform.python_version()}
+    for package in ("numpy", "pandas", "scikit-learn", "scikit-surprise", "streamlit"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def _data_info(data_dir: str) -> dict:
+    files = {}
+    for root, _, names in os.walk(data_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, data_dir)] = os.path.getsize(path)
+    return {"path": os.path.abspath(data_dir), "synthetic": synthetic.read_manifest(data_dir), "files": files}
+
+
+def benchmark(data_dir: str, stages=STAGES, n: int = 200, seed: int = 0, log=print) -> dict:
+    results = {
+        "version": RESULTS_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": _git(),
+        "host": {"platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "versions": _versions(),
+        "env": {name: os.environ[name] for name in ENV_VARS if name in os.environ},
+        "data": _data_info(data_dir),
+        "queries": n,
+        "seed": seed,
+        "stages": {},
+    }
+    for stage in stages:
+        started = time.perf_counter()
+        results["stages"][stage] = run_stage(stage, data_dir, n, seed)
+        log(f"{stage:<10}{time.perf_counter() - started:>8.1f}s  {_summary(results['stages'][stage])}")
+    return results
+
+
+def _summary(result: dict) -> str:
+    if "error" in result:
+        return f"error: {result['error']}"
+    if "cold" in result:
+        return (
+            f"cold {sum(r['seconds'] for r in result['cold'].values()):.2f}s  "
+            f"warm {sum(r['seconds'] for r in result['warm'].values()) * 1000:.2f}ms  "
+            f"peak {result['peak_rss_mb']:.0f} MB"
+        )
+    latency = result["latency"]
+    return f"p50 {latency.get('p50_ms', 0):.2f}ms  p95 {latency.get('p95_ms', 0):.2f}ms  +{result['peak_rss_delta_mb']:.1f} MB"
+
+
+def _flatten(results: dict) -> Dict[str, float]:
+    """Comparable metrics of one results file: ``stage.metric`` -> value."""
+    flat = {}
+    for stage, result in results["stages"].items():
+        if "error" in result:
+            continue
+        if "cold" in result:
+            for phase in ("cold", "warm"):
+                for name, row in result[phase].items():
+                    flat[f"{stage}.{phase}.{name}_s"] = row["seconds"]
+                flat[f"{stage}.{phase}_s"] = sum(row["seconds"] for row in result[phase].values())
+            flat[f"{stage}.peak_rss_mb"] = result["peak_rss_mb"]
+        else:
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                if key in result["latency"]:
+                    flat[f"{stage}.{key}"] = result["latency"][key]
+            flat[f"{stage}.first_ms"] = result["first_ms"]
+            flat[f"{stage}.peak_rss_delta_mb"] = result["peak_rss_delta_mb"]
+    return flat
+
+
+def compare(before: dict, after: dict) -> str:
+    a, b = _flatten(before), _flatten(after)
+    head = f"{(before['git'].get('commit') or '?')[:10]} -> {(after['git'].get('commit') or '?')[:10]}"
+    lines = [head, f"{'metric':<40}{'before':>12}{'after':>12}{'change':>10}"]
+    for key in sorted(set(a) & set(b)):
+        change = (b[key] - a[key]) / a[key] * 100 if a[key] else float("nan")
+        lines.append(f"{key:<40}{a[key]:>12.3f}{b[key]:>12.3f}{change:>9.1f}%")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compare"]:
+        parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+        parser.add_argument("before")
+        parser.add_argument("after")
+        args = parser.parse_args(argv[1:])
+        with open(args.before, encoding="utf-8") as f, open(args.after, encoding="utf-8") as g:
+            print(compare(json.load(f), json.load(g)))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark loaders and recommenders on a (synthetic) data folder.")
+    parser.add_argument("--scale", choices=list(synthetic.SCALES), help="generate synthetic data of this size")
+    parser.add_argument("--data", help="data folder (default with --scale: ./bench-data/<scale>)")
+    parser.add_argument("--out", help="write the results JSON here")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--queries", type=int, default=200, help="queries per query stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fit-svd", action="store_true", help="fit the synthetic SVD models (slow at 25m)")
+    args = parser.parse_args(argv)
+    if not args.scale and not args.data:
+        parser.error("give --scale, --data or both")
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    data_dir = args.data or os.path.join("bench-data", args.scale)
+    if args.scale:
+        params = dict(synthetic.scale_params(args.scale), seed=args.seed, n_factors=100, fit_svd=args.fit_svd)
+        manifest = synthetic.read_manifest(data_dir)
+        if manifest is None or manifest.get("version") != synthetic.GENERATOR_VERSION or manifest["params"] != params:
+            print(f"generating {args.scale} data in {data_dir}")
+            synthetic.generate(data_dir, **params)
+
+    results = benchmark(data_dir, stages, args.queries, args.seed)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print(f"-> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
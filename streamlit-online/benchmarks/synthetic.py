@@ -0,0 +1,313 @@
+"""Synthetic MovieLens-like artifacts with the schemas the app loads.
+
+Usage::
+
+    python -m benchmarks.synthetic OUT --scale 100k|1m|25m [--seed 0] [--fit-svd]
+
+Writes the same files as the downloadable data folder, so ``OUT`` can be used
+as ``MOVIE_APP_LOCAL_DATA_DIR`` (and fed to the ``engine.*`` exporters):
+
+    movies.pkl             metadata columns plus one-hot genre columns, movieId order
+    ratings.pkl            userId, movieId, rating, timestamp, weightedRating
+    knn.joblib             L2 normalizer + cosine NearestNeighbors fitted on the genres
+    svd.joblib / weighted_svd.joblib   Surprise SVD models with their full trainsets
+    title_to_idx.pkl / idx_to_title.pkl
+    synthetic.json         the parameters, so a harness can tell whether to regenerate
+
+Ratings follow planted structure: movie popularity is heavy-tailed, user
+activity log-normal and each rating comes from genre-driven latent factors, so
+recommenders return meaningful (and repeatable) neighbours. By default the SVD
+models carry those planted factors instead of being fitted, which keeps the
+25M scale to minutes; ``--fit-svd`` runs ``SVD.fit`` like the notebook. The
+25M scale needs roughly 16 GB of RAM, mostly for the Surprise trainsets.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# (ratings, users, movies) of the MovieLens releases the scales are named after.
+SCALES = {
+    "100k": (100_836, 610, 9_742),
+    "1m": (1_000_209, 6_040, 3_706),
+    "25m": (25_000_095, 162_541, 59_047),
+}
+MANIFEST_FILE = "synthetic.json"
+GENERATOR_VERSION = 1
+# MovieLens genres in order of first appearance, with their relative frequency.
+GENRES = {
+    "Adventure": 4.1,
+    "Animation": 1.6,
+    "Children": 2.2,
+    "Comedy": 16.9,
+    "Fantasy": 2.4,
+    "Romance": 7.5,
+    "Drama": 25.6,
+    "Action": 7.3,
+    "Crime": 5.3,
+    "Thriller": 8.7,
+    "Horror": 5.6,
+    "Mystery": 2.6,
+    "Sci-Fi": 3.6,
+    "IMAX": 0.2,
+    "Documentary": 5.5,
+    "War": 1.9,
+    "Musical": 1.0,
+    "Western": 1.1,
+    "Film-Noir": 0.4,
+    "(no genres listed)": 0.4,
+}
+WORDS = (
+    "Love Night Dark City Last Man Woman Story Day Time Blood House Dead Life World Girl King "
+    "Star War Home Secret Dream Fire Water Lost Moon Black White Red Blue Road River Summer "
+    "Winter Ghost Heart Island Shadow Game Edge Return Rise Fall Hunt Escape Journey Legend "
+    "Monster Angel Devil Kiss Wild Silent Broken Golden Iron Paper Glass Stone Wind"
+).split()
+LANGUAGES = {"en": 0.72, "fr": 0.06, "ja": 0.04, "it": 0.03, "de": 0.03, "es": 0.03, "ko": 0.02, "zh": 0.02, "hi": 0.02}
+RATING_SCALE = (0.5, 5.0)
+LATENT = 16
+DAY = 60 * 60 * 24
+FIRST_TIMESTAMP = 946_684_800  # 2000-01-01
+LAST_TIMESTAMP = 1_696_118_400  # 2023-10-01
+
+
+def _movies(rng: np.random.Generator, n_movies: int) -> pd.DataFrame:
+    names = list(GENRES)
+    freq = np.array(list(GENRES.values()))
+    counts = np.minimum(rng.geometric(0.5, n_movies), 4)
+    onehot = np.zeros((n_movies, len(names)), dtype=np.int64)
+    for row, count in enumerate(counts):
+        onehot[row, rng.choice(len(names) - 1, count, replace=False, p=freq[:-1] / freq[:-1].sum())] = 1
+    # A few movies have no genre at all, as in MovieLens.
+    onehot[rng.random(n_movies) < freq[-1] / freq.sum(), :] = 0
+    onehot[onehot.sum(axis=1) == 0, -1] = 1
+
+    years = rng.integers(1920, 2024, n_movies)
+    words = rng.integers(1, 4, n_movies)
+    base = pd.Series([" ".join(rng.choice(WORDS, n, replace=False)) for n in words.tolist()])
+    # Repeated names become sequels, so titles stay unique like the title -> row map expects.
+    sequel = base.groupby(base).cumcount().to_numpy()
+    titles = [
+        f"{name}{f' {k + 1}' if k else ''} ({year})" for name, k, year in zip(base, sequel.tolist(), years.tolist())
+    ]
+    language = rng.choice(list(LANGUAGES), n_movies, p=np.array(list(LANGUAGES.values())) / sum(LANGUAGES.values()))
+    release = pd.to_datetime(years.astype(str), format="%Y") + pd.to_timedelta(rng.integers(0, 365, n_movies), "D")
+    movies = pd.DataFrame(
+        {
+            "movieId": np.sort(rng.choice(np.arange(1, n_movies * 4), n_movies, replace=False)),
+            "title": titles,
+            "genres": ["|".join(np.array(names)[row.astype(bool)]) for row in onehot],
+            "original_language": language,
+            "popularity": np.round(rng.lognormal(1.5, 1.2, n_movies), 3),
+            "runtime": np.clip(rng.normal(100, 20, n_movies), 60, 240).round(),
+            "release_date": release,
+            "poster_path": [f"https://image.tmdb.org/t/p/w500/{h:016x}.jpg" for h in rng.integers(0, 1 << 62, n_movies)],
+            "weightedVoteAverage": np.clip(rng.normal(6.2, 0.9, n_movies), 1, 9.5).round(3),
+        }
+    )
+    return pd.concat([movies, pd.DataFrame(onehot, columns=names)], axis=1)
+
+
+def _factors(rng: np.random.Generator, movies: pd.DataFrame, n_users: int):
+    genres = movies[list(GENRES)].to_numpy(dtype=np.float64)
+    genre_factors = rng.normal(0, 0.5, (len(GENRES), LATENT))
+    item = genres @ genre_factors / np.sqrt(genres.sum(axis=1, keepdims=True)) + rng.normal(0, 0.15, (len(movies), LATENT))
+    user = rng.normal(0, 0.35, (n_users, LATENT))
+    item_bias = 0.6 * (movies["weightedVoteAverage"].to_numpy() - 6.2)
+    user_bias = rng.normal(0, 0.4, n_users)
+    return user, item, user_bias, item_bias
+
+
+def _pairs(rng: np.random.Generator, n_ratings: int, n_users: int, popularity: np.ndarray) -> np.ndarray:
+    """Distinct (user, movie) pairs as ``user * n_movies + movie``, sorted like ratings.csv."""
+    n_movies = popularity.size
+    activity = rng.lognormal(0, 1.1, n_users)
+    activity /= activity.sum()
+    weights = popularity / popularity.sum()
+    keys = np.empty(0, dtype=np.int64)
+    while keys.size < n_ratings:
+        draw = int((n_ratings - keys.size) * 1.2) + 1000
+        users = rng.choice(n_users, draw, p=activity).astype(np.int64)
+        keys = np.unique(np.concatenate([keys, users * n_movies + rng.choice(n_movies, draw, p=weights)]))
+    return np.sort(rng.choice(keys, n_ratings, replace=False))
+
+
+def _ratings(rng: np.random.Generator, movies: pd.DataFrame, n_ratings: int, n_users: int, factors) -> pd.DataFrame:
+    user, item, user_bias, item_bias = factors
+    keys = _pairs(rng, n_ratings, n_users, movies["popularity"].to_numpy())
+    u, m = np.divmod(keys, len(movies))
+    raw = np.empty(keys.size)
+    for lo in range(0, keys.size, 1 << 20):
+        sl = slice(lo, lo + (1 << 20))
+        raw[sl] = np.einsum("ij,ij->i", user[u[sl]], item[m[sl]])
+    raw += 3.5 + user_bias[u] + item_bias[m] + rng.normal(0, 0.6, keys.size)
+    rating = np.clip(np.round(raw * 2) / 2, *RATING_SCALE)
+
+    start = rng.integers(FIRST_TIMESTAMP, LAST_TIMESTAMP, n_users)
+    timestamp = np.minimum(start[u] + rng.exponential(120 * DAY, keys.size).astype(np.int64), LAST_TIMESTAMP)
+    ratings = pd.DataFrame({"userId": u + 1, "movieId": movies["movieId"].to_numpy()[m], "rating": rating, "timestamp": timestamp})
+    # Same recency decay as the preprocessing notebook.
+    ratings["weightedRating"] = ratings["rating"] * np.exp(-0.1 * (timestamp.max() - timestamp) / DAY)
+    return ratings
+
+
+def _trainset(ratings: pd.DataFrame, column: str):
+    """Surprise ``Trainset`` equal to ``Dataset.load_from_df(...).build_full_trainset()``, built with NumPy."""
+    from surprise import Trainset
+
+    raw_users, inner_users = np.unique(ratings["userId"].to_numpy(), return_inverse=True)
+    raw_items, inner_items = np.unique(ratings["movieId"].to_numpy(), return_inverse=True)
+    values = ratings[column].to_numpy(dtype=np.float64)
+
+    def grouped(keys: np.ndarray, others: np.ndarray) -> dict:
+        order = np.argsort(keys, kind="stable")
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        starts = np.concatenate([[0], bounds]).tolist()
+        ends = np.concatenate([bounds, [keys.size]]).tolist()
+        others, vals, keys = others[order].tolist(), values[order].tolist(), keys[order]
+        return {int(keys[lo]): list(zip(others[lo:hi], vals[lo:hi])) for lo, hi in zip(starts, ends)}
+
+    return Trainset(
+        grouped(inner_users, inner_items),
+        grouped(inner_items, inner_users),
+        raw_users.size,
+        raw_items.size,
+        len(ratings),
+        RATING_SCALE,
+        {raw: inner for inner, raw in enumerate(raw_users.tolist())},
+        {raw: inner for inner, raw in enumerate(raw_items.tolist())},
+    )
+
+
+def _svd(trainset, factors, movies: pd.DataFrame, n_factors: int, fit: bool, seed: int):
+    from surprise import SVD
+
+    algo = SVD(n_factors=n_factors, random_state=seed)
+    if fit:
+        return algo.fit(trainset)
+    user, item, user_bias, item_bias = factors
+    rng = np.random.default_rng(seed)
+    users = np.array([trainset.to_raw_uid(i) for i in range(trainset.n_users)]) - 1
+    items = np.searchsorted(movies["movieId"].to_numpy(), [trainset.to_raw_iid(i) for i in range(trainset.n_items)])
+    # Planted factors in the first columns, small noise in the rest, like a fitted model.
+    algo.trainset = trainset
+    algo.pu = rng.normal(0, 0.02, (trainset.n_users, n_factors))
+    algo.qi = rng.normal(0, 0.02, (trainset.n_items, n_factors))
+    width = min(LATENT, n_factors)
+    algo.pu[:, :width] = user[users, :width]
+    algo.qi[:, :width] = item[items, :width]
+    algo.bu = user_bias[users] + 3.5 - trainset.global_mean
+    algo.bi = item_bias[items]
+    return algo
+
+
+def _knn(movies: pd.DataFrame):
+    from sklearn.neighbors import NearestNeighbors
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import Normalizer
+
+    # The notebook builds the same two steps with imblearn's Pipeline; the loaders only use named_steps.
+    pipeline = Pipeline(
+        [
+            ("L2 normalization", Normalizer(norm="l2")),
+            ("KNN", NearestNeighbors(metric="cosine", algorithm="brute", n_neighbors=11)),
+        ]
+    )
+    return pipeline.fit(movies[list(GENRES)])
+
+
+def read_manifest(out_dir: str):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def generate(
+    out_dir: str,
+    n_ratings: int,
+    n_users: int,
+    n_movies: int,
+    seed: int = 0,
+    n_factors: int = 100,
+    fit_svd: bool = False,
+    log=print,
+) -> dict:
+    """Write a full synthetic data folder to ``out_dir``; returns its manifest."""
+    if n_ratings > n_users * n_movies // 2:
+        raise ValueError(f"{n_ratings} ratings do not fit {n_users} users x {n_movies} movies")
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+
+    movies = _movies(rng, n_movies)
+    movies.to_pickle(os.path.join(out_dir, "movies.pkl"))
+    pd.Series(movies.index, index=movies["title"]).drop_duplicates().to_pickle(os.path.join(out_dir, "title_to_idx.pkl"))
+    pd.Series(movies["title"], index=movies.index).to_pickle(os.path.join(out_dir, "idx_to_title.pkl"))
+    joblib.dump(_knn(movies), os.path.join(out_dir, "knn.joblib"))
+    log(f"movies: {n_movies} ({time.perf_counter() - started:.1f}s)")
+
+    factors = _factors(rng, movies, n_users)
+    ratings = _ratings(rng, movies, n_ratings, n_users, factors)
+    ratings.to_pickle(os.path.join(out_dir, "ratings.pkl"))
+    log(f"ratings: {len(ratings)} from {ratings['userId'].nunique()} users ({time.perf_counter() - started:.1f}s)")
+
+    for name, column in (("svd", "rating"), ("weighted_svd", "weightedRating")):
+        trainset = _trainset(ratings, column)
+        joblib.dump(_svd(trainset, factors, movies, n_factors, fit_svd, seed), os.path.join(out_dir, f"{name}.joblib"), compress=0)
+        del trainset
+        log(f"{name}.joblib ({time.perf_counter() - started:.1f}s)")
+
+    manifest = {
+        "version": GENERATOR_VERSION,
+        "params": {
+            "n_ratings": n_ratings,
+            "n_users": n_users,
+            "n_movies": n_movies,
+            "seed": seed,
+            "n_factors": n_factors,
+            "fit_svd": fit_svd,
+        },
+        "users_with_ratings": int(ratings["userId"].nunique()),
+        "seconds": time.perf_counter() - started,
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def scale_params(scale: str) -> dict:
+    n_ratings, n_users, n_movies = SCALES[scale]
+    return {"n_ratings": n_ratings, "n_users": n_users, "n_movies": n_movies}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic data folder for the app and benchmarks.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--scale", choices=list(SCALES), default="100k")
+    parser.add_argument("--ratings", type=int, help="override the scale's rating count")
+    parser.add_argument("--users", type=int, help="override the scale's user count")
+    parser.add_argument("--movies", type=int, help="override the scale's movie count")
+    parser.add_argument("--factors", type=int, default=100, help="SVD factors (Surprise default: 100)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fit-svd", action="store_true", help="fit the SVD models instead of planting factors")
+    args = parser.parse_args(argv)
+
+    params = scale_params(args.scale)
+    params.update(
+        {k: v for k, v in (("n_ratings", args.ratings), ("n_users", args.users), ("n_movies", args.movies)) if v}
+    )
+    manifest = generate(args.out_dir, **params, seed=args.seed, n_factors=args.factors, fit_svd=args.fit_svd)
+    print(f"{args.out_dir}: {manifest['seconds']:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
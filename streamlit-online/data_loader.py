@@ -1,218 +1,214 @@
-import io
 import os
-import os.path
-from typing import Optional, Tuple
+from typing import Optional, Sequence, Tuple
 
-import joblib
 import pandas as pd
-import requests
 import streamlit as st
 
-MOVIES_URL = "https://drive.usercontent.google.com/u/0/uc?id=1-SJ8oASjn4Ubbm5VlLGJXju_HfYe_HJp&export=download"
-RATINGS_URL = "https://drive.usercontent.google.com/download?id=1I5OyLwZs26RZtbG0QUpi9H0ntZv9Ov7C&export=download&authuser=0&confirm=t&uuid=9da5ac1b-c3c3-410f-8d00-2f001585b64d&at=APvzH3ootqPTp4kiQ44Ew8EDit-R%3A1735991866003"
-SVD_URL = "https://drive.usercontent.google.com/download?id=1-EZ3pUuoKn_C8RXuM-n8W8coo-20q4nB&export=download&authuser=0&confirm=t&uuid=f4f15388-b689-4fe7-aebe-b5ca56adda7f&at=APvzH3pCgFqBQ8ISNTL5zHrTIu5u%3A1735951544081"
-WEIGHTED_SVD_URL = "https://drive.usercontent.google.com/download?id=1-9F142ZpJTyJCyP46NVwkButsVc7PfHC&export=download&authuser=0&confirm=t&uuid=7856b7f9-e65a-4c70-a719-8362fe70a431&at=APvzH3qxH32v9fKo2ASzcH4avHni%3A1735951432618"
-KNN_URL = "https://drive.usercontent.google.com/u/0/uc?id=1-2j6yK1ajE37xifio-Eo1YLpbHsjLyLr&export=download"
-TITLE_TO_IDX_URL = "https://drive.usercontent.google.com/u/0/uc?id=1-AoCFwt2MZ2ExVR1wt-LiT8IDehnvjUP&export=download"
-IDX_TO_TITLE_URL = "https://drive.usercontent.google.com/u/0/uc?id=1-5kmSUkujuIKGAGHI76mRMZme6miXDCp&export=download"
-LOCAL_DATA_DIR_ENV = "MOVIE_APP_LOCAL_DATA_DIR"
-LOCAL_DATA_DIR_SECRET = "local_data_dir"
-SOURCE_SESSION_KEY = "data_source_info"
-
-MOVIES_FILE = "movies.pkl"
-RATINGS_FILE = "ratings.pkl"
-SVD_FILE = "svd.joblib"
-WEIGHTED_SVD_FILE = "weighted_svd.joblib"
-KNN_FILE = "knn.joblib"
-TITLE_TO_IDX_FILE = "title_to_idx.pkl"
-IDX_TO_TITLE_FILE = "idx_to_title.pkl"
-
-TRUE_VALUES = {"1", "true", "yes", "on"}
-FALSE_VALUES = {"0", "false", "no", "off"}
-
-
-def _flag_from(value: Optional[object]) -> Optional[bool]:
-    if value is None:
+from engine.aggregates import RatingAggregates
+from engine.cf import SVDScorer
+from engine.charts import AnalysisCharts
+from engine.content import ContentRecommender
+from engine.facets import FacetIndex
+from engine.incremental import Ratings
+from engine.instrument import metrics
+from engine.loaders import (
+    CACHE_DIR_SECRET,
+    LOCAL_DATA_DIR_SECRET,
+    MODEL_STORE_SECRET,
+    ArtifactLoader,
+    LoaderSettings,
+    parse_flag,
+)
+from engine.neighbours import NeighbourTable
+from engine.posters import PosterCache
+from engine.ratings_index import RatingsIndex
+from engine.result_cache import ResultCache
+from engine.service import RecommendationService
+from engine.title_search import TitleIndex
+
+METRICS_FILE_ENV = "MOVIE_APP_METRICS_FILE"
+
+
+def _secret(name: str) -> Optional[object]:
+    try:
+        return st.secrets.get(name, None)
+    except Exception:
         return None
-    if isinstance(value, bool):
-        return value
-    lowered = str(value).strip().lower()
-    if lowered in TRUE_VALUES:
-        return True
-    if lowered in FALSE_VALUES:
-        return False
-    return None
 
 
 def light_mode_enabled(default: bool = True) -> bool:
     """Return True when the app should avoid heavy data loads."""
-    secret_value = None
-    try:
-        secret_value = st.secrets.get("light_mode", None)
-    except Exception:
-        secret_value = None
-    env_value = os.getenv("MOVIE_APP_LIGHT_MODE")
-    flag = _flag_from(secret_value)
+    flag = parse_flag(_secret("light_mode"))
     if flag is None:
-        flag = _flag_from(env_value)
+        flag = parse_flag(os.getenv("MOVIE_APP_LIGHT_MODE"))
     if flag is None:
         return default
     return flag
 
 
-def _download_bytes(url: str) -> io.BytesIO:
-    response = requests.get(url, timeout=30)
-    response.raise_for_status()
-    return io.BytesIO(response.content)
+@st.cache_resource(show_spinner=False)
+def get_loader() -> ArtifactLoader:
+    """Process-wide artifact loader; every session and the prefetch threads share its artifacts."""
+    secrets = {name: _secret(name) for name in (LOCAL_DATA_DIR_SECRET, CACHE_DIR_SECRET, MODEL_STORE_SECRET)}
+    loader = ArtifactLoader(LoaderSettings.from_env(secrets))
+    metrics.register("result_cache", loader.result_cache().stats)
+    return loader
 
 
-def _local_dir() -> Optional[str]:
-    secret_value = None
-    try:
-        secret_value = st.secrets.get(LOCAL_DATA_DIR_SECRET, None)
-    except Exception:
-        secret_value = None
-    env_value = os.getenv(LOCAL_DATA_DIR_ENV)
-    return secret_value or env_value
+@st.cache_resource(show_spinner=False)
+def get_service() -> RecommendationService:
+    return RecommendationService(get_loader())
 
 
-def _maybe_local_bytes(filename: str) -> Optional[io.BytesIO]:
-    base = _local_dir()
-    if not base:
-        return None
-    candidate = os.path.join(base, filename)
-    if os.path.exists(candidate):
-        with open(candidate, "rb") as f:
-            return io.BytesIO(f.read())
-    return None
+def _out_of_memory(what: str) -> None:
+    st.error(f"Not enough memory to {what}. Staying in light mode—try running locally with more RAM.")
 
 
-def _record_source(filename: str, source: str) -> None:
+def get_data_source_label() -> str:
+    """Return 'store', 'local', 'remote', 'cache', 'mixed', or 'unknown' based on the loads so far."""
+    return get_loader().source_label()
+
+
+def load_movies(columns: Optional[Sequence[str]] = None) -> Optional[pd.DataFrame]:
+    """The movies table in display order; pass ``columns`` to load only those (shared by every session)."""
     try:
-        if SOURCE_SESSION_KEY not in st.session_state:
-            st.session_state[SOURCE_SESSION_KEY] = {}
-        st.session_state[SOURCE_SESSION_KEY][filename] = source
-    except Exception:
-        # If session_state not available (e.g., during CLI use), ignore.
-        pass
+        return get_loader().movies(columns)
+    except MemoryError:
+        _out_of_memory("load movie metadata")
+        return None
 
 
-def get_data_source_label() -> str:
-    """Return 'local', 'remote', 'mixed', or 'unknown' based on current session loads."""
+def load_title_index() -> Optional[TitleIndex]:
     try:
-        info = st.session_state.get(SOURCE_SESSION_KEY, {})
-    except Exception:
-        return "unknown"
-    if not info:
-        return "unknown"
-    sources = set(info.values())
-    if sources == {"local"}:
-        return "local"
-    if sources == {"remote"}:
-        return "remote"
-    if "local" in sources and "remote" in sources:
-        return "mixed"
-    return "unknown"
-
-
-def _open_bytes(filename: str, url: str) -> io.BytesIO:
-    local = _maybe_local_bytes(filename)
-    if local is not None:
-        _record_source(filename, "local")
-        return local
-    _record_source(filename, "remote")
-    return _download_bytes(url)
-
-
-@st.cache_data(show_spinner=False)
-def load_movies() -> Optional[pd.DataFrame]:
+        return get_loader().title_index()
+    except MemoryError:
+        _out_of_memory("load movie metadata")
+        return None
+
+
+def search_titles(query: str, limit: int = 30, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Movies whose title matches ``query`` (prefix first, then substring/typo matches), most popular first."""
+    if load_title_index() is None:
+        return pd.DataFrame()
+    return get_loader().search_titles(query, limit, columns)
+
+
+def movies_by_id(movie_ids, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Rows of ``movie_ids`` in their order, indexed by movieId, gathered through the id lookup."""
+    return get_loader().movies_by_id(movie_ids, columns)
+
+
+def load_facet_index() -> Optional[FacetIndex]:
+    """Genre / year / runtime / language filters over the movies table (shared by every session)."""
     try:
-        movies = pd.read_pickle(_open_bytes(MOVIES_FILE, MOVIES_URL))
-        dtype_map = {
-            "movieId": "int32",
-            "popularity": "float32",
-            "runtime": "float32",
-            "weightedVoteAverage": "float32",
-        }
-        for col, dtype in dtype_map.items():
-            if col in movies:
-                movies[col] = pd.to_numeric(movies[col], errors="coerce").astype(dtype)
-        if "release_date" in movies:
-            movies["release_date"] = pd.to_datetime(movies["release_date"], errors="coerce")
-        return movies.sort_values(
-            by=["popularity", "weightedVoteAverage", "release_date"], ascending=False
-        )
+        return get_loader().facet_index()
     except MemoryError:
-        st.error(
-            "Not enough memory to load movie metadata. Staying in light mode—try running locally with more RAM."
-        )
+        _out_of_memory("load movie metadata")
         return None
 
 
-@st.cache_resource(show_spinner=False)
+def load_knn_pipeline() -> object:
+    return get_loader().knn_pipeline()
+
+
+def load_title_to_idx() -> pd.Series:
+    return get_loader().title_to_idx()
+
+
+def load_idx_to_title() -> pd.Series:
+    return get_loader().idx_to_title()
+
+
 def load_content_bundle() -> Optional[Tuple[pd.DataFrame, pd.DataFrame, object, object, object]]:
     try:
-        movies = load_movies()
-        if movies is None:
-            return None
-        features = movies.drop(
-            [
-                "original_language",
-                "popularity",
-                "runtime",
-                "release_date",
-                "poster_path",
-                "weightedVoteAverage",
-                "title",
-                "movieId",
-                "genres",
-            ],
-            axis="columns",
-            errors="ignore",
-        )
-        knn_pl = joblib.load(_open_bytes(KNN_FILE, KNN_URL))
-        title_to_idx = pd.read_pickle(_open_bytes(TITLE_TO_IDX_FILE, TITLE_TO_IDX_URL))
-        idx_to_title = pd.read_pickle(_open_bytes(IDX_TO_TITLE_FILE, IDX_TO_TITLE_URL))
-        return movies, features, knn_pl, title_to_idx, idx_to_title
+        return get_loader().content_bundle()
     except MemoryError:
-        st.error(
-            "Not enough memory to load content-based models. Staying in light mode—try running locally with more RAM."
-        )
+        _out_of_memory("load content-based models")
         return None
 
 
-@st.cache_data(show_spinner=False)
+def load_neighbour_table() -> Optional[NeighbourTable]:
+    return get_loader().neighbour_table()
+
+
+def load_content_engine() -> Optional[ContentRecommender]:
+    if load_content_bundle() is None:
+        return None
+    return get_loader().content_engine()
+
+
 def load_ratings() -> Optional[pd.DataFrame]:
     try:
-        ratings = pd.read_pickle(_open_bytes(RATINGS_FILE, RATINGS_URL))
-        dtype_map = {"userId": "int32", "movieId": "int32", "rating": "float32"}
-        for col, dtype in dtype_map.items():
-            if col in ratings:
-                ratings[col] = pd.to_numeric(ratings[col], errors="coerce").astype(dtype)
-        if "timestamp" in ratings:
-            ratings["timestamp"] = pd.to_numeric(ratings["timestamp"], errors="coerce").astype(
-                "int32"
-            )
-        return ratings
+        return get_loader().ratings()
     except MemoryError:
-        st.error(
-            "Not enough memory to load ratings. Staying in light mode—try running locally with more RAM."
-        )
+        _out_of_memory("load ratings")
         return None
 
 
-@st.cache_resource(show_spinner=False)
-def load_cf_bundle() -> Optional[Tuple[pd.DataFrame, object, object]]:
+def load_ratings_index() -> Optional[RatingsIndex]:
     try:
-        ratings = load_ratings()
-        if ratings is None:
-            return None
-        algo = joblib.load(_open_bytes(SVD_FILE, SVD_URL))
-        weighted_algo = joblib.load(_open_bytes(WEIGHTED_SVD_FILE, WEIGHTED_SVD_URL))
-        return ratings, algo, weighted_algo
+        return get_loader().ratings_index()
     except MemoryError:
-        st.error(
-            "Not enough memory to load collaborative filtering models. "
-            "Staying in light mode—try running locally with more RAM."
-        )
+        _out_of_memory("index ratings")
+        return None
+
+
+def load_rating_aggregates(compute: bool = False) -> Optional[RatingAggregates]:
+    """Analysis page aggregates; see ``ArtifactLoader.rating_aggregates``."""
+    try:
+        return get_loader().rating_aggregates(compute)
+    except MemoryError:
+        _out_of_memory("load ratings")
+        return None
+
+
+def load_analysis_charts(compute: bool = False) -> AnalysisCharts:
+    """Analysis page charts; see ``ArtifactLoader.analysis_charts`` (``compute`` as for the aggregates)."""
+    try:
+        return get_loader().analysis_charts(compute)
+    except MemoryError:
+        _out_of_memory("load rating analytics")
+        return get_loader().analysis_charts(compute=False)
+
+
+def load_svd_scorer(weighted: bool = False) -> Optional[SVDScorer]:
+    if load_movies(["movieId"]) is None:
         return None
+    return get_loader().svd_scorer(weighted)
+
+
+def load_cf_bundle() -> Optional[Tuple[Ratings, SVDScorer, SVDScorer]]:
+    try:
+        return get_loader().cf_bundle()
+    except MemoryError:
+        _out_of_memory("load collaborative filtering models")
+        return None
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide cache of recommendation results (ids + scores), shared by all sessions."""
+    return get_loader().result_cache()
+
+
+def get_poster_cache() -> Optional[PosterCache]:
+    """Poster thumbnails shared by every session; None when the download cache is off."""
+    return get_loader().poster_cache()
+
+
+def export_metrics() -> None:
+    """Write the instrumentation snapshot to ``MOVIE_APP_METRICS_FILE`` (if set) for scraping."""
+    path = os.getenv(METRICS_FILE_ENV)
+    if not path:
+        return
+    try:
+        metrics.write_json(path)
+    except OSError:
+        pass
+
+
+def sync_model_store() -> bool:
+    """Hand off to a newly published store version; returns True when the loaded artifacts were dropped.
+
+    Call once per script run.
+    """
+    return get_loader().sync_store()
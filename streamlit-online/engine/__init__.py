@@ -0,0 +1,7 @@
+"""Streamlit-free recommendation engine used by the app pages."""
+
+from engine.cf import SVDScorer
+from engine.content import ContentRecommender
+from engine.ratings_index import RatingsIndex
+
+__all__ = ["ContentRecommender", "RatingsIndex", "SVDScorer"]
@@ -0,0 +1,167 @@
+"""Materialised rating aggregates for the Analysis page.
+
+Usage::
+
+    python -m engine.aggregates /path/to/data
+
+Everything the page plots is derived from a few kilobytes: per-movie rating
+counts and sums, per-genre counts and sums (a sparse movie x genre incidence
+matrix applied to the per-movie totals), the distinct rating values with
+their frequencies, and the distinct user count. They are computed once from
+the ratings index with ``bincount`` and saved as ``analytics.npz``, next to
+the data by the CLI or under the download cache by the app. Each file
+records the ratings it was built from (``ArtifactLoader.ratings_fingerprint``)
+and is ignored once they change.
+"""
+
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from engine.ratings_index import RatingsIndex
+
+AGGREGATES_FILE = "analytics.npz"
+FORMAT_VERSION = 1
+
+
+def genre_incidence(movie_ids: np.ndarray, movies: pd.DataFrame) -> Tuple[sparse.csr_matrix, np.ndarray]:
+    """(len(movie_ids) x n_genres) 0/1 matrix of each movie's genres, and the sorted genre names."""
+    genres = movies[["movieId", "genres"]].dropna()
+    genres = genres.assign(genres=genres["genres"].str.split("|")).explode("genres")
+    genres = genres[genres["genres"] != ""].drop_duplicates()
+    names, genre_col = np.unique(genres["genres"].to_numpy(dtype=str), return_inverse=True)
+
+    order = np.argsort(movie_ids, kind="stable")
+    ids = genres["movieId"].to_numpy(dtype=np.int64)
+    pos = np.minimum(np.searchsorted(movie_ids[order], ids), max(len(movie_ids) - 1, 0))
+    known = (movie_ids[order][pos] == ids) if len(movie_ids) else np.zeros(len(ids), dtype=bool)
+    matrix = sparse.csr_matrix(
+        (np.ones(int(known.sum()), dtype=np.float64), (order[pos[known]], genre_col[known])),
+        shape=(len(movie_ids), len(names)),
+    )
+    return matrix, names
+
+
+@dataclass
+class RatingAggregates:
+    n_ratings: int
+    n_users: int
+    movie_ids: np.ndarray
+    movie_counts: np.ndarray
+    movie_sums: np.ndarray
+    genre_names: np.ndarray
+    genre_counts: np.ndarray
+    genre_sums: np.ndarray
+    rating_values: np.ndarray
+    rating_counts: np.ndarray
+    source: str = ""
+
+    @classmethod
+    def compute(cls, ratings: RatingsIndex, movies: pd.DataFrame, source: str = "") -> "RatingAggregates":
+        movie_ids, counts = ratings.movie_counts()
+        _, sums = ratings.movie_sums()
+        # Only movies in the catalog carry genres, matching the old merge on movieId.
+        incidence, names = genre_incidence(movie_ids, movies)
+        genre_counts = incidence.T @ counts.astype(np.float64)
+        genre_sums = incidence.T @ sums
+        rated = genre_counts > 0
+        values, value_counts = np.unique(ratings.ratings, return_counts=True)
+        return cls(
+            n_ratings=ratings.n_ratings,
+            n_users=ratings.n_users,
+            movie_ids=movie_ids,
+            movie_counts=counts.astype(np.int64),
+            movie_sums=sums.astype(np.float64),
+            genre_names=names[rated],
+            genre_counts=genre_counts[rated].astype(np.int64),
+            genre_sums=genre_sums[rated],
+            rating_values=values.astype(np.float32),
+            rating_counts=value_counts.astype(np.int64),
+            source=source,
+        )
+
+    def top_movies(self, n: int = 10) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(movie ids, counts, mean ratings) of the ``n`` most-rated movies."""
+        top = np.argsort(-self.movie_counts, kind="stable")[:n]
+        return self.movie_ids[top], self.movie_counts[top], self.movie_sums[top] / self.movie_counts[top]
+
+    def genre_means(self) -> pd.Series:
+        """Mean rating per genre, highest first."""
+        means = pd.Series(self.genre_sums / self.genre_counts, index=self.genre_names)
+        return means.sort_values(ascending=False)
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp.npz"
+        np.savez(
+            tmp,
+            format_version=FORMAT_VERSION,
+            n_ratings=self.n_ratings,
+            n_users=self.n_users,
+            movie_ids=self.movie_ids,
+            movie_counts=self.movie_counts,
+            movie_sums=self.movie_sums,
+            genre_names=self.genre_names.astype(str),
+            genre_counts=self.genre_counts,
+            genre_sums=self.genre_sums,
+            rating_values=self.rating_values,
+            rating_counts=self.rating_counts,
+            source=self.source,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, source: Optional[str] = None) -> Optional["RatingAggregates"]:
+        """Read ``path``; None when it is missing, unreadable, outdated or built from another ``source``."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["format_version"]) != FORMAT_VERSION:
+                    return None
+                if source is not None and str(data["source"]) != source:
+                    return None
+                return cls(
+                    n_ratings=int(data["n_ratings"]),
+                    n_users=int(data["n_users"]),
+                    movie_ids=data["movie_ids"],
+                    movie_counts=data["movie_counts"],
+                    movie_sums=data["movie_sums"],
+                    genre_names=data["genre_names"],
+                    genre_counts=data["genre_counts"],
+                    genre_sums=data["genre_sums"],
+                    rating_values=data["rating_values"],
+                    rating_counts=data["rating_counts"],
+                    source=str(data["source"]),
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def main(argv=None) -> int:
+    from engine.loaders import ArtifactLoader, LoaderSettings
+
+    parser = argparse.ArgumentParser(description="Precompute the Analysis page aggregates.")
+    parser.add_argument("data_dir", help="local data directory; analytics.npz is written there")
+    args = parser.parse_args(argv)
+
+    # Same sources as the app (columnar export, model store, download cache), so the fingerprint matches its own.
+    settings = LoaderSettings.from_env()
+    settings.local_dir = args.data_dir
+    loader = ArtifactLoader(settings)
+    loader.sync_store()
+    ratings = loader.ratings_index()
+    # Stamped with the ratings' fingerprint so the app ignores the file once the ratings change.
+    source = loader.ratings_fingerprint()
+    aggregates = RatingAggregates.compute(ratings, loader.movies(["movieId", "genres"]), source=source or "")
+    out = os.path.join(args.data_dir, AGGREGATES_FILE)
+    aggregates.save(out)
+    print(f"{aggregates.n_ratings} ratings, {len(aggregates.movie_ids)} movies -> {out} ({os.path.getsize(out)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""Cosine nearest-neighbour indexes over the content feature matrix.
+
+Every index takes L2-normalised float32 row vectors (dense or scipy CSR) and
+answers ``search(queries, k) -> (distances, rows)`` with the same conventions
+as ``NearestNeighbors(metric="cosine").kneighbors``: cosine distances in
+ascending order and row numbers in the fitted matrix. An optional boolean
+``allowed`` mask over the rows (a facet filter) removes rows before the top
+``k`` are picked. Indexes pad with row -1 / distance inf when they find fewer
+than ``k`` candidates (approximate ones, or when few rows are allowed).
+
+Backends:
+
+- ``exact``: blocked dot products, the reference answer.
+- ``lsh``: random-hyperplane (SimHash) tables with optional one-bit multi-probe;
+  more tables / fewer bits raise recall at the cost of more candidates.
+- ``ivf``: spherical k-means coarse quantiser; ``n_probe`` lists are scanned per query.
+
+Run ``python -m engine.ann /path/to/data`` for a recall/latency report of each
+backend against the brute-force KNN in ``knn.joblib``.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from engine.instrument import timed
+
+SPARSE_DENSITY = 0.1
+
+
+def as_search_matrix(vectors, sparse_density: float = SPARSE_DENSITY):
+    """L2-normalise ``vectors`` into float32, as CSR when fewer than ``sparse_density`` are non-zero."""
+    if sparse.issparse(vectors):
+        matrix = sparse.csr_matrix(vectors, dtype=np.float32)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    else:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+    scale = (1.0 / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+    if sparse.issparse(matrix):
+        return sparse.csr_matrix(sparse.diags(scale) @ matrix)
+    matrix = matrix * scale[:, None]
+    if np.count_nonzero(matrix) < sparse_density * matrix.size:
+        return sparse.csr_matrix(matrix)
+    return matrix
+
+
+def _dense(matrix) -> np.ndarray:
+    return matrix.toarray() if sparse.issparse(matrix) else np.asarray(matrix)
+
+
+def _similarities(queries: np.ndarray, vectors) -> np.ndarray:
+    """(n_queries, n_rows) dot products for dense queries against dense or CSR rows."""
+    if sparse.issparse(vectors):
+        return np.asarray((vectors @ queries.T).T)
+    return queries @ vectors.T
+
+
+def _top_k(sims: np.ndarray, k: int, rows=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Best ``k`` columns per row of ``sims`` as (cosine distances, rows), padded with -1.
+
+    Columns at -inf (filtered out) are never returned.
+    """
+    n = sims.shape[1]
+    out_rows = np.full((sims.shape[0], k), -1, dtype=np.int64)
+    out_dist = np.full((sims.shape[0], k), np.inf)
+    take = min(k, n)
+    if take == 0:
+        return out_dist, out_rows
+    if take < n:
+        top = np.argpartition(-sims, take - 1, axis=1)[:, :take]
+    else:
+        top = np.tile(np.arange(n), (sims.shape[0], 1))
+    top_sims = np.take_along_axis(sims, top, axis=1)
+    order = np.lexsort((top, -top_sims), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    out_rows[:, :take] = top if rows is None else rows[top]
+    out_dist[:, :take] = 1.0 - np.take_along_axis(top_sims, order, axis=1)
+    out_rows[np.isinf(out_dist)] = -1
+    return out_dist, out_rows
+
+
+class ExactIndex:
+    """Brute-force cosine search in blocks of queries."""
+
+    def __init__(self, vectors, block_size: int = 256):
+        self.vectors = vectors
+        self.block_size = block_size
+
+    @timed("ann.exact")
+    def search(self, queries, k: int, allowed=None) -> Tuple[np.ndarray, np.ndarray]:
+        queries = _dense(queries).astype(np.float32)
+        blocked = None if allowed is None else ~np.asarray(allowed, dtype=bool)
+        distances, rows = [], []
+        for start in range(0, queries.shape[0], self.block_size):
+            sims = _similarities(queries[start : start + self.block_size], self.vectors)
+            if blocked is not None:
+                sims[:, blocked] = -np.inf
+            d, r = _top_k(sims, k)
+            distances.append(d)
+            rows.append(r)
+        if not rows:
+            return np.empty((0, k)), np.empty((0, k), dtype=np.int64)
+        return np.vstack(distances), np.vstack(rows)
+
+
+class _CandidateIndex:
+    """Shared exact re-ranking of a per-query candidate set."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    @timed("ann.candidates")
+    def search(self, queries, k: int, allowed=None) -> Tuple[np.ndarray, np.ndarray]:
+        queries = _dense(queries).astype(np.float32)
+        allowed = None if allowed is None else np.asarray(allowed, dtype=bool)
+        distances = np.full((queries.shape[0], k), np.inf)
+        rows = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        for i, query in enumerate(queries):
+            candidates = self._candidates(query)
+            if allowed is not None:
+                candidates = candidates[allowed[candidates]]
+            if candidates.size == 0:
+                continue
+            sims = _similarities(query[None, :], self.vectors[candidates])
+            distances[i], rows[i] = (a[0] for a in _top_k(sims, k, candidates))
+        return distances, rows
+
+
+class LSHIndex(_CandidateIndex):
+    """Random-hyperplane LSH: ``n_tables`` hash tables of ``n_bits``-bit signatures."""
+
+    def __init__(self, vectors, n_tables: int = 8, n_bits: int = 12, multi_probe: bool = True, seed: int = 0):
+        super().__init__(vectors)
+        self.multi_probe = multi_probe
+        rng = np.random.default_rng(seed)
+        dim = vectors.shape[1]
+        self.planes = rng.standard_normal((n_tables, dim, n_bits)).astype(np.float32)
+        self._weights = (1 << np.arange(n_bits, dtype=np.int64))
+        self._flips = self._weights if multi_probe else np.empty(0, dtype=np.int64)
+        self.tables = []
+        for planes in self.planes:
+            keys = self._hash(vectors, planes)
+            order = np.argsort(keys, kind="stable")
+            self.tables.append((keys[order], order))
+
+    def _hash(self, vectors, planes: np.ndarray) -> np.ndarray:
+        projected = vectors @ planes
+        return (np.asarray(projected) > 0) @ self._weights
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        found = []
+        for planes, (keys, order) in zip(self.planes, self.tables):
+            key = int(self._hash(query[None, :], planes)[0])
+            probes = np.concatenate([[key], key ^ self._flips])
+            starts = np.searchsorted(keys, probes, side="left")
+            stops = np.searchsorted(keys, probes, side="right")
+            found.extend(order[a:b] for a, b in zip(starts, stops) if b > a)
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+
+class IVFIndex(_CandidateIndex):
+    """Inverted-file index over ``n_lists`` spherical k-means cells; ``n_probe`` cells scanned per query."""
+
+    def __init__(self, vectors, n_lists: int = 256, n_probe: int = 8, iterations: int = 10, seed: int = 0):
+        super().__init__(vectors)
+        self.n_probe = n_probe
+        n = vectors.shape[0]
+        n_lists = max(1, min(n_lists, n))
+        rng = np.random.default_rng(seed)
+        centroids = _dense(vectors[rng.choice(n, n_lists, replace=False)]).astype(np.float32)
+        for _ in range(iterations):
+            assign = self._assign(vectors, centroids)
+            members = sparse.csr_matrix((np.ones(n, dtype=np.float32), (assign, np.arange(n))), shape=(n_lists, n))
+            sums = _dense(members @ vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Cells that lost all their members keep the previous centroid.
+            centroids = np.where(norms > 0, sums / np.where(norms == 0, 1, norms), centroids).astype(np.float32)
+        self.centroids = centroids
+        assign = self._assign(vectors, centroids)
+        self.order = np.argsort(assign, kind="stable")
+        self.offsets = np.searchsorted(assign[self.order], np.arange(n_lists + 1))
+
+    @staticmethod
+    def _assign(vectors, centroids: np.ndarray, block_size: int = 8192) -> np.ndarray:
+        out = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], block_size):
+            block = vectors[start : start + block_size]
+            out[start : start + block_size] = np.argmax(_similarities(centroids, block).T, axis=1)
+        return out
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        cells = np.argsort(-(self.centroids @ query))[: self.n_probe]
+        return np.concatenate([self.order[self.offsets[c] : self.offsets[c + 1]] for c in cells])
+
+
+INDEXES = {"exact": ExactIndex, "lsh": LSHIndex, "ivf": IVFIndex}
+
+
+def make_index(kind: str, vectors, **params):
+    try:
+        return INDEXES[kind](vectors, **params)
+    except KeyError:
+        raise ValueError(f"unknown index {kind!r}; choose one of {sorted(INDEXES)}") from None
+
+
+def recall_report(knn, vectors, configs: Dict[str, dict], n_queries: int = 200, k: int = 50, seed: int = 0) -> dict:
+    """Compare each index config with ``knn.kneighbors`` on random catalog rows.
+
+    Returns recall@k and per-query latency percentiles in milliseconds, plus
+    build time. Recall is tie-aware: a returned movie counts when it is at
+    least as close as the brute-force k-th neighbour, since one-hot features
+    produce many equal distances that either search may order differently.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(vectors.shape[0], min(n_queries, vectors.shape[0]), replace=False)
+    queries = _dense(vectors[picks])
+
+    def per_query(search):
+        latencies, results = [], []
+        for query in queries:
+            started = time.perf_counter()
+            results.append(search(query[None, :])[0][0])
+            latencies.append((time.perf_counter() - started) * 1000)
+        return np.array(results), np.array(latencies)
+
+    truth, base_latency = per_query(lambda q: knn.kneighbors(q, k))
+    radius = truth[:, -1:] + 1e-4
+    report = {"queries": int(len(picks)), "k": k, "indexes": {}}
+    report["indexes"]["sklearn-brute"] = {
+        "recall": 1.0,
+        "p50_ms": float(np.percentile(base_latency, 50)),
+        "p95_ms": float(np.percentile(base_latency, 95)),
+    }
+    for name, config in configs.items():
+        params = dict(config)
+        kind = params.pop("kind")
+        started = time.perf_counter()
+        index = make_index(kind, vectors, **params)
+        build = time.perf_counter() - started
+        found, latency = per_query(lambda q: index.search(q, k))
+        recall = np.mean(np.minimum((found <= radius).sum(axis=1), k) / k)
+        report["indexes"][name] = {
+            "recall": float(recall),
+            "p50_ms": float(np.percentile(latency, 50)),
+            "p95_ms": float(np.percentile(latency, 95)),
+            "build_s": build,
+            **config,
+        }
+    return report
+
+
+DEFAULT_CONFIGS = {
+    "exact": {"kind": "exact"},
+    "lsh-8x12": {"kind": "lsh", "n_tables": 8, "n_bits": 12},
+    "lsh-16x14": {"kind": "lsh", "n_tables": 16, "n_bits": 14},
+    "ivf-256/8": {"kind": "ivf", "n_lists": 256, "n_probe": 8},
+    "ivf-256/32": {"kind": "ivf", "n_lists": 256, "n_probe": 32},
+}
+
+
+def main(argv=None) -> int:
+    import joblib
+
+    from engine.neighbours import fitted_vectors
+
+    parser = argparse.ArgumentParser(description="Recall/latency of each ANN backend against brute-force KNN.")
+    parser.add_argument("data_dir", help="directory holding knn.joblib")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    knn_pl = joblib.load(os.path.join(args.data_dir, "knn.joblib"))
+    vectors = as_search_matrix(fitted_vectors(knn_pl))
+    report = recall_report(knn_pl.named_steps["KNN"], vectors, DEFAULT_CONFIGS, args.queries, args.k)
+    print(f"{'index':<14}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, row in report["indexes"].items():
+        print(f"{name:<14}{row['recall']:>8.3f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
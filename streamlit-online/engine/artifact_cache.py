@@ -0,0 +1,214 @@
+"""Content-addressed on-disk cache for the remote model/data artifacts.
+
+Layout under the cache root::
+
+    blobs/<sha256>          verified artifact bytes, named by their digest
+    refs/<name>.json        name -> {url, sha256, size, etag}
+    partial/<key>.part      in-progress download, resumed with an HTTP Range request
+    partial/<key>.json      the ETag / Last-Modified the partial download started from
+
+Downloads stream to ``partial/`` in chunks, are checked against the announced
+size (and an expected digest when one is pinned) and only then renamed into
+``blobs/``; a ref is written last, so a crash never leaves a ref to a bad blob.
+A resume sends the partial file's validator in ``If-Range``, so a remote file
+that changed in between comes back whole (200) instead of being spliced onto
+the old bytes; partial files without a validator are not resumed.
+"""
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking.
+    fcntl = None
+
+CHUNK_SIZE = 1 << 20
+HASH_BLOCK_SIZE = 8 << 20
+
+
+class IntegrityError(Exception):
+    """A downloaded or cached artifact does not match its expected size or digest."""
+
+
+def _sha256_file(path: str, digest=None):
+    digest = digest or hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest
+
+
+def _write_json(path: str, payload: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=1)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Serialize downloads of one URL across processes sharing the cache directory."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class ArtifactCache:
+    def __init__(self, root: str, timeout: float = 30, retries: int = 3, verify: bool = False):
+        self.root = root
+        self.timeout = timeout
+        self.retries = retries
+        # Re-hash blobs on every lookup instead of only checking their size.
+        self.verify = verify
+        for sub in ("blobs", "refs", "partial"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def _ref_path(self, name: str) -> str:
+        return os.path.join(self.root, "refs", f"{name}.json")
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "blobs", sha256)
+
+    def _partial_path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.root, "partial", f"{key}.part")
+
+    def _validator_path(self, url: str) -> str:
+        return f"{self._partial_path(url)[: -len('.part')]}.json"
+
+    def _read_validator(self, url: str) -> Optional[str]:
+        """The If-Range value for resuming ``url``: a strong ETag, else Last-Modified."""
+        try:
+            with open(self._validator_path(url), encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        etag = saved.get("etag")
+        # Weak ETags cannot be used in If-Range.
+        if etag and not etag.startswith("W/"):
+            return etag
+        return saved.get("last_modified")
+
+    def read_ref(self, name: str) -> Optional[dict]:
+        try:
+            with open(self._ref_path(name), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self, name: str, url: str, sha256: Optional[str] = None) -> Optional[str]:
+        """Return the cached blob path for ``name`` if it is present and intact."""
+        ref = self.read_ref(name)
+        if not ref or ref.get("url") != url or (sha256 and ref.get("sha256") != sha256):
+            return None
+        blob = self._blob_path(ref["sha256"])
+        try:
+            if os.path.getsize(blob) != ref["size"]:
+                raise IntegrityError(blob)
+            if self.verify and _sha256_file(blob).hexdigest() != ref["sha256"]:
+                raise IntegrityError(blob)
+        except (OSError, IntegrityError):
+            self._discard(blob)
+            return None
+        return blob
+
+    def fetch(self, name: str, url: str, sha256: Optional[str] = None) -> str:
+        """Download ``url`` into the cache (resuming a partial file) and return the blob path."""
+        last_error = None
+        for attempt in range(self.retries):
+            try:
+                return self._fetch_once(name, url, sha256)
+            except (requests.RequestException, IntegrityError) as exc:
+                last_error = exc
+                if attempt + 1 < self.retries:
+                    time.sleep(min(2**attempt, 10))
+        raise last_error
+
+    def _fetch_once(self, name: str, url: str, sha256: Optional[str]) -> str:
+        part, validator_path = self._partial_path(url), self._validator_path(url)
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        validator = self._read_validator(url) if offset else None
+        # Without a validator the partial bytes may belong to another version of the file.
+        offset = offset if validator else 0
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+        with requests.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+            if response.status_code == 416:
+                # The server cannot satisfy the resume; start over.
+                self._discard(part)
+                self._discard(validator_path)
+                raise IntegrityError(f"range not satisfiable for {name}")
+            response.raise_for_status()
+            if offset and (
+                response.status_code != 206
+                or not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+            ):
+                # A changed file (If-Range failed) or an unexpected range: take the full body.
+                offset = 0
+            if not offset:
+                # Old bytes go before the new validator is saved, so the two never mismatch.
+                self._discard(part)
+                _write_json(
+                    validator_path,
+                    {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")},
+                )
+            length = response.headers.get("Content-Length")
+            encoded = response.headers.get("Content-Encoding", "identity") != "identity"
+            expected_size = offset + int(length) if length is not None and not encoded else None
+            digest = _sha256_file(part) if offset else hashlib.sha256()
+            with open(part, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+                        digest.update(chunk)
+            etag = response.headers.get("ETag")
+
+        size = os.path.getsize(part)
+        if expected_size is not None and size != expected_size:
+            # Keep the partial file so the next attempt resumes from here.
+            raise IntegrityError(f"{name}: got {size} bytes, expected {expected_size}")
+        actual = digest.hexdigest()
+        if sha256 and actual != sha256:
+            self._discard(part)
+            self._discard(validator_path)
+            raise IntegrityError(f"{name}: sha256 {actual} does not match pinned {sha256}")
+
+        blob = self._blob_path(actual)
+        os.replace(part, blob)
+        self._discard(validator_path)
+        _write_json(
+            self._ref_path(name),
+            {"url": url, "sha256": actual, "size": size, "etag": etag, "fetched_at": time.time()},
+        )
+        return blob
+
+    def get(self, name: str, url: str, sha256: Optional[str] = None) -> Tuple[str, bool]:
+        """Return (blob path, cache hit) for ``name``, downloading it on a miss."""
+        cached = self.lookup(name, url, sha256)
+        if cached is not None:
+            return cached, True
+        with _file_lock(f"{self._partial_path(url)}.lock"):
+            # Another process may have finished the download while we waited.
+            cached = self.lookup(name, url, sha256)
+            if cached is not None:
+                return cached, True
+            return self.fetch(name, url, sha256), False
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
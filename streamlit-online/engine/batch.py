@@ -0,0 +1,287 @@
+"""Offline top-N recommendations for every user in the ratings.
+
+Usage::
+
+    python -m engine.batch OUT [--n 20] [--weighted] [--workers 4] [--max-block-mb 256]
+
+Loads the ratings index and an SVD model through ``ArtifactLoader`` (same
+``MOVIE_APP_*`` settings as the app; ``--data-dir`` overrides the local data
+directory) and scores users in blocks: one dense (users x catalog) product
+from the factors, already-rated movies masked to -inf through a sparse
+(users x catalog) matrix, and a per-row ``argpartition``. Blocks run in a
+process pool; each is sized so its score matrix and temporaries stay under
+``--max-block-mb``.
+
+Finished blocks are saved under ``OUT/parts`` as they complete, so an
+interrupted run picks up where it stopped when started again with the same
+arguments. The result is a columnar table (see ``engine.columnar``) at
+``OUT``: a ``userId`` column plus ``movie_ids`` (int32, -1 for empty slots)
+and ``scores`` (float32, NaN for empty slots) extras of shape (users, n),
+best first. ``load_top_n`` reads it back memory-mapped.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from engine.cf import SVDScorer, lookup_sorted, select_top_n
+from engine.columnar import ColumnarTable, has_table, write_table
+from engine.ratings_index import RatingsIndex
+
+PARTS_DIR = "parts"
+SCORER_DIR = "scorer"
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+DEFAULT_N = 20
+# Bytes held per (user, catalog item) while a block is scored: the factor product,
+# the clipped float64 estimates and argpartition's int64 output, plus one spare temporary.
+BYTES_PER_SCORE = 32
+
+_scorer: Optional[SVDScorer] = None
+
+
+def block_size_for(n_items: int, max_block_mb: float) -> int:
+    """Users per block so that scoring one block stays under ``max_block_mb``."""
+    return max(1, int(max_block_mb * 2**20) // max(1, n_items * BYTES_PER_SCORE))
+
+
+def rated_matrix(ratings: RatingsIndex, item_ids: np.ndarray) -> sparse.csr_matrix:
+    """(users x catalog) 0/1 matrix of rated movies, rows in ``ratings.user_ids`` order.
+
+    Ratings of movies missing from the catalog ``item_ids`` are dropped.
+    """
+    order = np.argsort(item_ids, kind="stable")
+    columns = lookup_sorted(item_ids[order], order, ratings.movie_ids)
+    known = columns >= 0
+    kept = np.zeros(known.size + 1, dtype=np.int64)
+    np.cumsum(known, out=kept[1:])
+    return sparse.csr_matrix(
+        (np.ones(int(kept[-1]), dtype=bool), columns[known].astype(np.int32), kept[ratings.indptr]),
+        shape=(ratings.n_users, item_ids.size),
+    )
+
+
+def score_block(
+    scorer: SVDScorer, user_ids: np.ndarray, rated: sparse.csr_matrix, n: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(movie ids, scores) of each user's top ``n`` unrated movies; empty slots are -1 / NaN."""
+    scores = scorer.score(user_ids)
+    rows, columns = rated.nonzero()
+    scores[rows, columns] = -np.inf
+    top, top_scores = select_top_n(scores, n)
+    empty = top < 0
+    movie_ids = scorer.item_ids[np.where(empty, 0, top)].astype(np.int32)
+    movie_ids[empty] = -1
+    top_scores = top_scores.astype(np.float32)
+    top_scores[empty] = np.nan
+    return movie_ids, top_scores
+
+
+def _part_path(work_dir: str, block: int) -> str:
+    return os.path.join(work_dir, f"block-{block:06d}.npz")
+
+
+def save_scorer(scorer: SVDScorer, path: str) -> None:
+    """Spill the scorer's arrays so pool workers can memory-map one shared copy."""
+    os.makedirs(path, exist_ok=True)
+    arrays, scalars = scorer.state()
+    arrays = dict(arrays, catalog=scorer.item_ids)
+    for name, values in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(values))
+    with open(os.path.join(path, "scalars.json"), "w", encoding="utf-8") as f:
+        json.dump(scalars, f)
+
+
+def load_scorer(path: str) -> SVDScorer:
+    """The scorer ``save_scorer`` wrote to ``path``, its arrays memory-mapped."""
+    arrays = {}
+    for filename in os.listdir(path):
+        if filename.endswith(".npy"):
+            arrays[filename[:-4]] = np.load(os.path.join(path, filename), mmap_mode="r", allow_pickle=False)
+    with open(os.path.join(path, "scalars.json"), encoding="utf-8") as f:
+        scalars = json.load(f)
+    return SVDScorer.from_state(arrays, scalars, arrays.pop("catalog"))
+
+
+def _init_worker(scorer_dir: str) -> None:
+    global _scorer
+    from threadpoolctl import threadpool_limits
+
+    # One BLAS thread per process; the pool provides the parallelism.
+    threadpool_limits(1)
+    _scorer = load_scorer(scorer_dir)
+
+
+def _run_block(work_dir: str, block: int, user_ids: np.ndarray, rated: sparse.csr_matrix, n: int) -> int:
+    movie_ids, scores = score_block(_scorer, user_ids, rated, n)
+    path = _part_path(work_dir, block)
+    tmp = f"{path}.tmp.npz"
+    np.savez(tmp, user_ids=user_ids, movie_ids=movie_ids, scores=scores)
+    os.replace(tmp, path)
+    return block
+
+
+def _prepare(work_dir: str, manifest: dict, restart: bool) -> None:
+    """Create the work directory, or check that the one left by an interrupted run can be resumed."""
+    path = os.path.join(work_dir, MANIFEST_FILE)
+    if restart and os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise ValueError(f"{work_dir} holds partial results of a different run; pass --restart to discard them")
+    else:
+        os.makedirs(work_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+
+
+def _merge(work_dir: str, out: str, n_users: int, n: int, n_blocks: int) -> None:
+    user_ids = np.empty(n_users, dtype=np.int32)
+    movie_ids = np.empty((n_users, n), dtype=np.int32)
+    scores = np.empty((n_users, n), dtype=np.float32)
+    start = 0
+    for block in range(n_blocks):
+        with np.load(_part_path(work_dir, block), allow_pickle=False) as part:
+            stop = start + part["user_ids"].size
+            user_ids[start:stop] = part["user_ids"]
+            movie_ids[start:stop] = part["movie_ids"]
+            scores[start:stop] = part["scores"]
+        start = stop
+    write_table(out, pd.DataFrame({"userId": user_ids}), extra={"movie_ids": movie_ids, "scores": scores})
+
+
+def run_batch(
+    ratings: RatingsIndex,
+    scorer: SVDScorer,
+    out: str,
+    n: int = DEFAULT_N,
+    workers: Optional[int] = None,
+    max_block_mb: float = 256,
+    inputs: Optional[dict] = None,
+    restart: bool = False,
+    progress=None,
+) -> dict:
+    """Write every user's top ``n`` to the columnar table ``out``; returns the run summary.
+
+    ``inputs`` identifies the models and ratings (e.g. their fingerprints); a resumed
+    run only reuses finished blocks when it matches along with ``n`` and the block size.
+    """
+    n = min(n, scorer.n_items)
+    block_size = block_size_for(scorer.n_items, max_block_mb)
+    n_blocks = -(-ratings.n_users // block_size)
+    manifest = {
+        "version": FORMAT_VERSION,
+        "n": n,
+        "block_size": block_size,
+        "n_users": ratings.n_users,
+        "n_items": scorer.n_items,
+        "inputs": inputs or {},
+    }
+    work_dir = os.path.join(out, PARTS_DIR)
+    _prepare(work_dir, manifest, restart)
+    pending = [block for block in range(n_blocks) if not os.path.exists(_part_path(work_dir, block))]
+    summary = dict(manifest, blocks=n_blocks, resumed=n_blocks - len(pending))
+
+    if pending:
+        rated = rated_matrix(ratings, scorer.item_ids)
+        scorer_dir = os.path.join(work_dir, SCORER_DIR)
+        save_scorer(scorer, scorer_dir)
+        workers = workers or min(4, os.cpu_count() or 1)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(scorer_dir,)) as pool:
+            # At most two blocks per worker in flight, so queued inputs do not pile up in memory.
+            running, finished = set(), summary["resumed"]
+
+            def collect(futures) -> None:
+                nonlocal finished
+                for future in futures:
+                    future.result()
+                    finished += 1
+                    if progress is not None:
+                        progress(finished, n_blocks)
+
+            for block in pending:
+                if len(running) >= 2 * workers:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    collect(done)
+                start = block * block_size
+                stop = min(start + block_size, ratings.n_users)
+                running.add(
+                    pool.submit(_run_block, work_dir, block, ratings.user_ids[start:stop], rated[start:stop], n)
+                )
+            collect(wait(running).done)
+        shutil.rmtree(scorer_dir)
+
+    _merge(work_dir, out, ratings.n_users, n, n_blocks)
+    shutil.rmtree(work_dir)
+    return summary
+
+
+def load_top_n(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(user ids, (users, n) movie ids, (users, n) scores) of a batch result, memory-mapped."""
+    table = ColumnarTable(path)
+    return table.column("userId"), table.extra("movie_ids"), table.extra("scores")
+
+
+def main(argv=None) -> int:
+    from engine.loaders import ArtifactLoader, LoaderSettings
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out", help="directory for the result table (and the resumable partial results)")
+    parser.add_argument("--n", type=int, default=DEFAULT_N, help="recommendations kept per user")
+    parser.add_argument("--weighted", action="store_true", help="score with the weighted SVD model")
+    parser.add_argument("--data-dir", default=None, help="local data directory (default: MOVIE_APP_LOCAL_DATA_DIR)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: up to 4)")
+    parser.add_argument("--max-block-mb", type=float, default=256, help="memory cap for scoring one block")
+    parser.add_argument("--restart", action="store_true", help="discard partial results from an earlier run")
+    args = parser.parse_args(argv)
+
+    settings = LoaderSettings.from_env()
+    if args.data_dir:
+        settings.local_dir = args.data_dir
+    loader = ArtifactLoader(settings)
+    loader.sync_store()
+    if has_table(args.out) and not os.path.isdir(os.path.join(args.out, PARTS_DIR)) and not args.restart:
+        print(f"{args.out} already holds a finished result; pass --restart to recompute it", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    ratings, scorer = loader.ratings_index(), loader.svd_scorer(args.weighted)
+    inputs = {
+        "model": "weighted_svd" if args.weighted else "svd",
+        "store": loader.store_version(),
+        "ratings": loader.ratings_fingerprint(),
+    }
+    print(f"{ratings.n_users} users x {scorer.n_items} movies loaded in {time.perf_counter() - started:.1f}s")
+
+    def progress(done: int, total: int) -> None:
+        print(f"\rblocks {done}/{total}", end="", flush=True)
+
+    try:
+        summary = run_batch(
+            ratings, scorer, args.out, args.n, args.workers, args.max_block_mb, inputs, args.restart, progress
+        )
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    print(
+        f"\r{summary['n_users']} users x top {summary['n']} -> {args.out} in {time.perf_counter() - started:.1f}s "
+        f"({summary['blocks']} blocks of {summary['block_size']}, {summary['resumed']} resumed)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+import copy
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from engine.instrument import timed
+
+
+def _sorted_id_map(raw_to_inner: dict) -> Tuple[np.ndarray, np.ndarray]:
+    raw = np.fromiter(raw_to_inner.keys(), dtype=np.int64, count=len(raw_to_inner))
+    inner = np.fromiter(raw_to_inner.values(), dtype=np.int64, count=len(raw_to_inner))
+    order = np.argsort(raw, kind="stable")
+    return raw[order], inner[order]
+
+
+def lookup_sorted(sorted_keys: np.ndarray, values: np.ndarray, ids) -> np.ndarray:
+    """Map ids through a sorted key array with binary search; unknown ids map to -1."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if sorted_keys.size == 0:
+        return np.full(ids.shape, -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sorted_keys, ids), sorted_keys.size - 1)
+    return np.where(sorted_keys[pos] == ids, values[pos], -1)
+
+
+def _first_tied_columns(scores: np.ndarray, top: np.ndarray, top_scores: np.ndarray) -> None:
+    """Make each row of ``top`` keep the lowest columns among those tied at its n-th score.
+
+    ``argpartition`` keeps an arbitrary subset of the tied columns; clipped SVD
+    estimates tie at the rating ceiling often. Updates ``top`` / ``top_scores`` in place.
+    """
+    n = top.shape[1]
+    kth = top_scores.min(axis=1)
+    # Rows cut off at -inf only drop masked entries, which never rank anyway.
+    tied = np.isfinite(kth) & (np.count_nonzero(scores >= kth[:, None], axis=1) > n)
+    rows = np.flatnonzero(tied)
+    if rows.size == 0:
+        return
+    block, kth = scores[rows], kth[rows, None]
+    # Rank by (above the cut, column) so the partition keeps every higher score and the first ties.
+    key = np.where(block == kth, np.arange(block.shape[1]), block.shape[1])
+    key[block > kth] = -1
+    columns = np.argpartition(key, n - 1, axis=1)[:, :n]
+    top[rows] = columns
+    top_scores[rows] = np.take_along_axis(block, columns, axis=1)
+
+
+def select_top_n(scores: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row (columns, scores) of the ``n`` highest scores, best first, ties by column.
+
+    Masked (-inf) entries never rank; slots they leave empty are -1 / -inf.
+    """
+    n = min(n, scores.shape[1])
+    if n <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    if n < scores.shape[1]:
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n].copy()
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        _first_tied_columns(scores, top, top_scores)
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+        top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.lexsort((top, -top_scores), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    top[np.isneginf(top_scores)] = -1
+    return top, top_scores
+
+
+class SVDScorer:
+    """Score the whole catalog for one or many users from fitted SVD factors.
+
+    Mirrors ``surprise.SVD.predict`` (bias terms, unknown user/item fallbacks and
+    clipping to the rating scale) with one matrix product per batch of users
+    instead of one Python call per (user, movie) pair.
+    """
+
+    def __init__(
+        self,
+        pu: np.ndarray,
+        qi: np.ndarray,
+        bu: np.ndarray,
+        bi: np.ndarray,
+        global_mean: float,
+        user_ids: np.ndarray,
+        user_inner: np.ndarray,
+        item_ids: np.ndarray,
+        item_inner: np.ndarray,
+        rating_scale: Tuple[float, float] = (0.5, 5.0),
+        biased: bool = True,
+        raw_items: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ):
+        self.pu = pu
+        self.qi = qi
+        self.bu = bu
+        self.bi = bi
+        self.global_mean = float(global_mean)
+        self.rating_scale = rating_scale
+        self.biased = biased
+        # Sorted raw user ids -> inner user row.
+        self._user_ids = user_ids
+        self._user_inner = user_inner
+        # Catalog order (the order of ``movies``) and each entry's inner item row.
+        self.item_ids = np.asarray(item_ids)
+        self._item_inner = item_inner
+        self._known_item = item_inner >= 0
+        self._item_rows = np.where(self._known_item, item_inner, 0)
+        self._catalog_order = np.argsort(self.item_ids, kind="stable")
+        self._catalog_sorted = self.item_ids[self._catalog_order]
+        # Sorted raw item ids -> inner item row, kept so the scorer can be re-bound or stored.
+        self.raw_items = raw_items
+        # (sorted user ids, pu rows, bu) of users folded in after training; they take
+        # precedence over ``pu``/``bu`` until ``compacted`` writes them into the arrays.
+        self._folded: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def from_surprise(cls, algo, item_ids) -> "SVDScorer":
+        """Pull the fitted arrays out of a Surprise ``SVD`` and bind them to ``item_ids``."""
+        trainset = algo.trainset
+        user_ids, user_inner = _sorted_id_map(trainset._raw2inner_id_users)
+        raw_items, inner_items = _sorted_id_map(trainset._raw2inner_id_items)
+        return cls.from_factors(
+            pu=algo.pu,
+            qi=algo.qi,
+            bu=algo.bu,
+            bi=algo.bi,
+            global_mean=trainset.global_mean,
+            user_ids=user_ids,
+            user_inner=user_inner,
+            raw_item_ids=raw_items,
+            raw_item_inner=inner_items,
+            item_ids=item_ids,
+            rating_scale=tuple(trainset.rating_scale),
+            biased=getattr(algo, "biased", True),
+        )
+
+    @classmethod
+    def from_factors(
+        cls,
+        pu: np.ndarray,
+        qi: np.ndarray,
+        bu: np.ndarray,
+        bi: np.ndarray,
+        global_mean: float,
+        user_ids: np.ndarray,
+        user_inner: np.ndarray,
+        raw_item_ids: np.ndarray,
+        raw_item_inner: np.ndarray,
+        item_ids,
+        rating_scale: Tuple[float, float] = (0.5, 5.0),
+        biased: bool = True,
+    ) -> "SVDScorer":
+        """Bind factor arrays and sorted raw -> inner id maps to the catalog order ``item_ids``."""
+        item_ids = np.asarray(item_ids)
+        return cls(
+            pu=pu,
+            qi=qi,
+            bu=bu,
+            bi=bi,
+            global_mean=global_mean,
+            user_ids=user_ids,
+            user_inner=user_inner,
+            item_ids=item_ids,
+            item_inner=lookup_sorted(raw_item_ids, raw_item_inner, item_ids),
+            rating_scale=rating_scale,
+            biased=biased,
+            raw_items=(raw_item_ids, raw_item_inner),
+        )
+
+    def state(self) -> Tuple[Dict[str, np.ndarray], dict]:
+        """(arrays, scalars) that ``from_state`` rebuilds this scorer from, minus the catalog binding.
+
+        Folded-in users are written into the arrays first.
+        """
+        if self.raw_items is None:
+            raise ValueError("scorer was built without its raw item id map")
+        scorer = self.compacted()
+        arrays = {
+            "pu": scorer.pu,
+            "qi": self.qi,
+            "bu": scorer.bu,
+            "bi": self.bi,
+            "user_ids": scorer._user_ids,
+            "user_inner": scorer._user_inner,
+            "item_ids": self.raw_items[0],
+            "item_inner": self.raw_items[1],
+        }
+        scalars = {
+            "global_mean": self.global_mean,
+            "rating_scale": [float(v) for v in self.rating_scale],
+            "biased": bool(self.biased),
+        }
+        return arrays, scalars
+
+    @classmethod
+    def from_state(cls, arrays: Dict[str, np.ndarray], scalars: dict, item_ids) -> "SVDScorer":
+        return cls.from_factors(
+            pu=arrays["pu"],
+            qi=arrays["qi"],
+            bu=arrays["bu"],
+            bi=arrays["bi"],
+            global_mean=scalars["global_mean"],
+            user_ids=arrays["user_ids"],
+            user_inner=arrays["user_inner"],
+            raw_item_ids=arrays["item_ids"],
+            raw_item_inner=arrays["item_inner"],
+            item_ids=item_ids,
+            rating_scale=tuple(scalars["rating_scale"]),
+            biased=scalars["biased"],
+        )
+
+    @property
+    def n_items(self) -> int:
+        return int(self.item_ids.size)
+
+    def knows_user(self, user_id) -> bool:
+        return bool(self.user_factors([user_id])[0][0])
+
+    def inner_users(self, user_ids) -> np.ndarray:
+        return lookup_sorted(self._user_ids, self._user_inner, np.atleast_1d(user_ids))
+
+    def user_factors(self, user_ids) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(known mask, pu rows, bu) per user, folded-in users included; unknown users get row 0."""
+        user_ids = np.atleast_1d(user_ids)
+        inner = self.inner_users(user_ids)
+        known = inner >= 0
+        rows = np.where(known, inner, 0)
+        pu, bu = self.pu[rows], self.bu[rows]
+        if self._folded is not None:
+            folded_ids, folded_pu, folded_bu = self._folded
+            hit = lookup_sorted(folded_ids, np.arange(folded_ids.size), user_ids)
+            found = hit >= 0
+            pu[found], bu[found] = folded_pu[hit[found]], folded_bu[hit[found]]
+            known |= found
+        return known, pu, bu
+
+    def item_factors(self, movie_ids) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(known mask, qi rows, bi) of the ``movie_ids`` the model was trained on."""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64).ravel()
+        pos = lookup_sorted(self._catalog_sorted, self._catalog_order, movie_ids)
+        known = pos >= 0
+        known[known] = self._known_item[pos[known]]
+        rows = self._item_rows[pos[known]]
+        return known, self.qi[rows], self.bi[rows]
+
+    def with_folded_users(self, user_ids, pu: np.ndarray, bu: np.ndarray) -> "SVDScorer":
+        """A new scorer sharing this one's arrays, with ``user_ids`` scored from ``pu``/``bu``.
+
+        Users folded in earlier are kept unless ``user_ids`` replaces them. A new object
+        rather than an update in place, so results cached against this scorer stay valid.
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        pu = np.asarray(pu, dtype=self.pu.dtype).reshape(user_ids.size, -1)
+        bu = np.asarray(bu, dtype=self.bu.dtype)
+        if self._folded is not None:
+            old_ids, old_pu, old_bu = self._folded
+            kept = ~np.isin(old_ids, user_ids)
+            user_ids = np.concatenate([old_ids[kept], user_ids])
+            pu = np.concatenate([old_pu[kept], pu])
+            bu = np.concatenate([old_bu[kept], bu])
+        order = np.argsort(user_ids, kind="stable")
+        scorer = copy.copy(self)
+        scorer._folded = (user_ids[order], pu[order], bu[order])
+        return scorer
+
+    @property
+    def n_folded_users(self) -> int:
+        return 0 if self._folded is None else int(self._folded[0].size)
+
+    def compacted(self) -> "SVDScorer":
+        """A scorer with the folded-in users written into ``pu``/``bu`` (new users appended)."""
+        if self._folded is None:
+            return self
+        folded_ids, folded_pu, folded_bu = self._folded
+        user_ids = self._user_ids
+        folded_ids = folded_ids.astype(user_ids.dtype)
+        user_inner = np.array(self._user_inner, dtype=np.int64)
+        if user_ids.size:
+            pos = np.minimum(np.searchsorted(user_ids, folded_ids), user_ids.size - 1)
+            present = user_ids[pos] == folded_ids
+            rows = np.where(present, user_inner[pos], -1)
+        else:
+            pos, present = np.zeros(folded_ids.size, dtype=np.int64), np.zeros(folded_ids.size, dtype=bool)
+            rows = np.full(folded_ids.size, -1, dtype=np.int64)
+        fresh = rows < 0
+        rows[fresh] = self.pu.shape[0] + np.arange(int(fresh.sum()))
+        pu = np.concatenate([self.pu, np.zeros((int(fresh.sum()), self.pu.shape[1]), dtype=self.pu.dtype)])
+        bu = np.concatenate([self.bu, np.zeros(int(fresh.sum()), dtype=self.bu.dtype)])
+        pu[rows], bu[rows] = folded_pu, folded_bu
+        user_inner[pos[present]] = rows[present]
+        user_ids = np.concatenate([user_ids, folded_ids[~present]])
+        user_inner = np.concatenate([user_inner, rows[~present]])
+        order = np.argsort(user_ids, kind="stable")
+        return SVDScorer(
+            pu=pu,
+            qi=self.qi,
+            bu=bu,
+            bi=self.bi,
+            global_mean=self.global_mean,
+            user_ids=user_ids[order],
+            user_inner=user_inner[order],
+            item_ids=self.item_ids,
+            item_inner=self._item_inner,
+            rating_scale=self.rating_scale,
+            biased=self.biased,
+            raw_items=self.raw_items,
+        )
+
+    def positions(self, movie_ids) -> np.ndarray:
+        """Catalog positions of ``movie_ids``; ids not in the catalog are dropped."""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64).ravel()
+        found = lookup_sorted(self._catalog_sorted, self._catalog_order, movie_ids)
+        return found[found >= 0]
+
+    @timed("cf.score")
+    def score(self, user_ids) -> np.ndarray:
+        """Return a (n_users, n_items) matrix of clipped estimates in catalog order."""
+        known_user, pu, bu = self.user_factors(user_ids)
+
+        dots = np.zeros((known_user.size, self.n_items), dtype=self.qi.dtype)
+        if known_user.any():
+            dots[known_user] = (pu[known_user] @ self.qi.T)[:, self._item_rows]
+        dots[:, ~self._known_item] = 0
+
+        if self.biased:
+            est = np.full((known_user.size, 1), self.global_mean, dtype=np.float64)
+            est = est + np.where(known_user, bu, 0.0)[:, None]
+            est = est + np.where(self._known_item, self.bi[self._item_rows], 0.0)[None, :]
+            est = est + dots
+        else:
+            both = known_user[:, None] & self._known_item[None, :]
+            est = np.where(both, dots, self.global_mean)
+
+        low, high = self.rating_scale
+        return np.clip(est, low, high, out=est)
+
+    @timed("cf.top_n")
+    def top_n(
+        self,
+        user_ids,
+        n: int = 10,
+        exclude: Optional[Sequence] = None,
+        allowed: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (positions, scores) of each user's top ``n`` catalog items.
+
+        ``exclude`` holds one array of already-rated movie ids per user;
+        ``allowed`` is a boolean mask over the catalog (e.g. a facet filter) of
+        the only items that may be returned. Rows are ordered by descending
+        score with ties broken by catalog position; slots left over when a user
+        has fewer than ``n`` candidates are -1 / -inf.
+        """
+        scores = self.score(user_ids)
+        if exclude is not None:
+            for row, movie_ids in enumerate(exclude):
+                scores[row, self.positions(movie_ids)] = -np.inf
+        if allowed is not None:
+            scores[:, ~np.asarray(allowed, dtype=bool)] = -np.inf
+        return select_top_n(scores, n)
+
+    def recommend(self, user_id, n: int = 10, exclude=None, allowed=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Single-user ``top_n``: catalog positions and scores with empty slots dropped."""
+        positions, scores = self.top_n([user_id], n, None if exclude is None else [exclude], allowed)
+        keep = positions[0] >= 0
+        return positions[0][keep], scores[0][keep]
@@ -0,0 +1,271 @@
+"""Pre-rendered Analysis page charts, cached as PNG bytes.
+
+Usage::
+
+    python -m engine.charts /path/to/data
+
+The word cloud, the ratings histogram (with its KDE) and the genre barplot
+only change when the data behind them does, yet the page used to redraw all
+three on every rerun, e.g. whenever the genre filter changed. Each chart here
+is keyed by a digest of exactly the values it plots, its drawing parameters
+and ``RENDER_VERSION``; the PNG is kept in memory and under
+``<cache_dir>/charts`` so it survives restarts. ``AnalysisCharts`` starts
+rendering the charts it has no bytes for in a background thread as soon as
+it is created, i.e. when the artifacts load or reload; the page only fetches
+bytes, waiting for a render in flight the first time after a change. The CLI
+renders them ahead of time into the download cache.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.aggregates import RatingAggregates
+from engine.instrument import metrics
+
+# Bump when the drawing code changes, so stored images are redrawn.
+RENDER_VERSION = 1
+# What ``st.pyplot`` passes to ``savefig``, so cached charts look the same.
+SAVEFIG_KWARGS = {"format": "png", "dpi": 200, "bbox_inches": "tight"}
+FIGSIZE = (10, 6)
+WORDCLOUD_PARAMS = {"width": 800, "height": 400, "background_color": "white"}
+MEMORY_ENTRIES = 16
+
+WORDCLOUD = "genre_wordcloud"
+RATINGS_HISTOGRAM = "ratings_histogram"
+GENRE_MEANS = "genre_means"
+
+# matplotlib and seaborn keep global state; one render at a time, off the page threads.
+_renderer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="charts")
+
+
+def _digest(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(str(part.dtype).encode("ascii"))
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def _figure():
+    from matplotlib.figure import Figure
+
+    # An unmanaged Figure instead of pyplot: nothing is registered globally or left open.
+    figure = Figure(figsize=FIGSIZE)
+    return figure, figure.subplots()
+
+
+def figure_png(figure) -> bytes:
+    out = io.BytesIO()
+    figure.savefig(out, **SAVEFIG_KWARGS)
+    return out.getvalue()
+
+
+def genre_text(genres: pd.Series) -> str:
+    """The word cloud's input: every genre of every movie, space separated."""
+    return " ".join(genres.str.split("|").explode().dropna())
+
+
+def render_wordcloud(text: str) -> bytes:
+    from wordcloud import WordCloud
+
+    wordcloud = WordCloud(**WORDCLOUD_PARAMS).generate(text)
+    figure, ax = _figure()
+    ax.imshow(wordcloud.to_image(), interpolation="bilinear")
+    ax.axis("off")
+    return figure_png(figure)
+
+
+def render_ratings_histogram(values: np.ndarray, counts: np.ndarray) -> bytes:
+    import seaborn as sns
+
+    figure, ax = _figure()
+    # One weighted point per distinct rating; bw_adjust restores the bandwidth the KDE
+    # would pick from the raw ratings (Scott's rule on n instead of the weights' n_eff).
+    weights = counts.astype(np.float64)
+    n_eff = weights.sum() ** 2 / (weights**2).sum()
+    sns.histplot(
+        x=values,
+        weights=weights,
+        bins=10,
+        kde=True,
+        kde_kws={"bw_adjust": (n_eff / weights.sum()) ** 0.2},
+        ax=ax,
+    )
+    ax.set_title("Distribution of Ratings")
+    ax.set_xlabel("Rating")
+    ax.set_ylabel("Frequency")
+    return figure_png(figure)
+
+
+def render_genre_means(means: pd.Series) -> bytes:
+    import seaborn as sns
+
+    figure, ax = _figure()
+    sns.barplot(x=means.values, y=means.index, ax=ax)
+    ax.set_title("Average Rating by Genre")
+    ax.set_xlabel("Average Rating")
+    ax.set_ylabel("Genre")
+    return figure_png(figure)
+
+
+class RenderCache:
+    """Chart bytes by key: a small in-memory LRU in front of ``root`` (None keeps them in memory only)."""
+
+    def __init__(self, root: Optional[str] = None, memory_entries: int = MEMORY_ENTRIES):
+        self.root = root
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.png")
+
+    def _remember(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        if not self.root:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self._remember(key, data)
+        if not self.root:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+
+class AnalysisCharts:
+    """The Analysis page charts for one movies table and (optionally) one set of rating aggregates.
+
+    Charts without stored bytes are rendered in the background from construction on;
+    ``png`` returns a chart's bytes, waiting for its render when it is still running.
+    """
+
+    def __init__(self, cache: RenderCache, genres: pd.Series, aggregates: Optional[RatingAggregates] = None):
+        self.cache = cache
+        text = genre_text(genres)
+        jobs: Dict[str, Tuple[Tuple, Callable[[], bytes]]] = {
+            WORDCLOUD: ((FIGSIZE, WORDCLOUD_PARAMS, text), lambda: render_wordcloud(text)),
+        }
+        if aggregates is not None:
+            values, counts = aggregates.rating_values, aggregates.rating_counts
+            means = aggregates.genre_means()
+            jobs[RATINGS_HISTOGRAM] = ((FIGSIZE, values, counts), lambda: render_ratings_histogram(values, counts))
+            jobs[GENRE_MEANS] = (
+                (FIGSIZE, means.to_numpy(), list(means.index)),
+                lambda: render_genre_means(means),
+            )
+        self._jobs = {
+            name: (f"{name}-{_digest(RENDER_VERSION, SAVEFIG_KWARGS, *inputs)}", render)
+            for name, (inputs, render) in jobs.items()
+        }
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self.prerender()
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._jobs)
+
+    def key(self, name: str) -> str:
+        return self._jobs[name][0]
+
+    def _render(self, name: str) -> bytes:
+        key, render = self._jobs[name]
+        # A second process sharing the cache may have stored it meanwhile.
+        data = self.cache.get(key)
+        if data is None:
+            with metrics.timer(f"charts.{name}"):
+                data = render()
+            self.cache.put(key, data)
+        return data
+
+    def _future(self, name: str) -> Future:
+        with self._lock:
+            future = self._futures.get(name)
+            if future is None or (future.done() and future.exception() is not None):
+                future = self._futures[name] = _renderer.submit(self._render, name)
+            return future
+
+    def prerender(self) -> None:
+        """Queue a background render of every chart that has no stored bytes."""
+        for name, (key, _) in self._jobs.items():
+            if self.cache.get(key) is None:
+                self._future(name)
+
+    def png(self, name: str, timeout: Optional[float] = None) -> bytes:
+        """The chart's PNG bytes; ``KeyError`` for a chart without its inputs (e.g. no aggregates)."""
+        key, _ = self._jobs[name]
+        data = self.cache.get(key)
+        if data is None:
+            data = self._future(name).result(timeout)
+        return data
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        for name in self._jobs:
+            self.png(name, timeout)
+
+
+def main(argv=None) -> int:
+    from engine.loaders import ArtifactLoader, LoaderSettings
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data_dir", help="directory holding movies.pkl and ratings.pkl (or their columnar export)")
+    args = parser.parse_args(argv)
+
+    settings = LoaderSettings.from_env()
+    settings.local_dir = args.data_dir
+    loader = ArtifactLoader(settings)
+    if loader.chart_cache().root is None:
+        print("the download cache is off (MOVIE_APP_CACHE_DIR); nothing to render into", file=sys.stderr)
+        return 1
+    charts = loader.analysis_charts(compute=True)
+    charts.wait()
+    for name in charts.names:
+        print(f"{name}: {charts.key(name)}.png")
+    print(f"-> {loader.chart_cache().root}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Columnar on-disk tables: one ``.npy`` file per column, opened memory-mapped.
+
+A table is a directory holding ``meta.json`` plus the column files. Numeric and
+datetime columns are stored with their final dtype so ``np.load(mmap_mode="r")``
+returns them without a conversion copy; string columns are stored as a UTF-8
+byte buffer plus int64 offsets; a "block" stores many same-dtype columns (the
+one-hot movie features) as one 2-D array.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+
+def _save(path: str, filename: str, values: np.ndarray) -> str:
+    np.save(os.path.join(path, filename), np.ascontiguousarray(values), allow_pickle=False)
+    return filename
+
+
+def _encode_strings(values) -> tuple:
+    series = pd.Series(values, dtype="object")
+    valid = series.notna().to_numpy()
+    encoded = [str(v).encode("utf-8") if ok else b"" for v, ok in zip(series, valid)]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return data, offsets, valid
+
+
+def _decode_strings(data: np.ndarray, offsets: np.ndarray, valid: Optional[np.ndarray]) -> np.ndarray:
+    raw = data.tobytes()
+    out = np.empty(offsets.size - 1, dtype=object)
+    for i in range(out.size):
+        out[i] = raw[offsets[i] : offsets[i + 1]].decode("utf-8")
+    if valid is not None:
+        out[~valid] = None
+    return out
+
+
+def write_table(
+    path: str,
+    frame: pd.DataFrame,
+    dtypes: Optional[Dict[str, str]] = None,
+    blocks: Optional[Dict[str, List[str]]] = None,
+    extra: Optional[Dict[str, np.ndarray]] = None,
+) -> dict:
+    """Write ``frame`` as a columnar table under ``path`` and return its metadata.
+
+    ``dtypes`` casts columns before saving, ``blocks`` groups columns into 2-D
+    arrays and ``extra`` stores arrays that are not rows of the frame (e.g. CSR
+    offsets) alongside it.
+    """
+    os.makedirs(path, exist_ok=True)
+    dtypes = dtypes or {}
+    blocks = blocks or {}
+    in_block = {col for cols in blocks.values() for col in cols}
+    meta = {"version": FORMAT_VERSION, "rows": int(len(frame)), "columns": [], "blocks": [], "extra": []}
+
+    for i, col in enumerate(frame.columns):
+        if col in in_block:
+            continue
+        series = frame[col]
+        entry = {"name": str(col)}
+        if col in dtypes:
+            series = series.astype(dtypes[col])
+        if pd.api.types.is_datetime64_any_dtype(series):
+            entry.update(kind="datetime", file=_save(path, f"c{i}.npy", series.to_numpy()))
+        elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            entry.update(kind="numeric", file=_save(path, f"c{i}.npy", series.to_numpy()))
+        else:
+            data, offsets, valid = _encode_strings(series.to_numpy())
+            entry.update(
+                kind="string",
+                file=_save(path, f"c{i}.data.npy", data),
+                offsets=_save(path, f"c{i}.offsets.npy", offsets),
+            )
+            if not valid.all():
+                entry["valid"] = _save(path, f"c{i}.valid.npy", valid)
+        meta["columns"].append(entry)
+
+    for j, (name, cols) in enumerate(blocks.items()):
+        values = frame[cols].to_numpy()
+        if np.isin(values, (0, 1)).all():
+            values = values.astype(np.uint8)
+        meta["blocks"].append(
+            {"name": name, "columns": [str(c) for c in cols], "file": _save(path, f"b{j}.npy", values)}
+        )
+
+    for k, (name, values) in enumerate((extra or {}).items()):
+        meta["extra"].append({"name": name, "file": _save(path, f"x{k}.npy", values)})
+
+    index = frame.index
+    if not isinstance(index, pd.RangeIndex) or index.start != 0 or index.step != 1:
+        meta["index"] = _save(path, "index.npy", index.to_numpy())
+
+    with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+
+def has_table(path: Optional[str]) -> bool:
+    return bool(path) and os.path.exists(os.path.join(path, META_FILE))
+
+
+def read_meta(path: str) -> dict:
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ColumnarTable:
+    """Read side of a columnar table. Arrays are memory-mapped and loaded on access."""
+
+    def __init__(self, path: str, mmap: bool = True):
+        self.path = path
+        self.meta = read_meta(path)
+        self._mode = "r" if mmap else None
+        self._columns = {c["name"]: c for c in self.meta["columns"]}
+        self._blocks = {b["name"]: b for b in self.meta["blocks"]}
+        self._extra = {x["name"]: x for x in self.meta["extra"]}
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def _load(self, filename: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, filename), mmap_mode=self._mode, allow_pickle=False)
+
+    def column(self, name: str) -> np.ndarray:
+        entry = self._columns[name]
+        if entry["kind"] != "string":
+            return self._load(entry["file"])
+        valid = self._load(entry["valid"]) if "valid" in entry else None
+        return _decode_strings(self._load(entry["file"]), self._load(entry["offsets"]), valid)
+
+    def block(self, name: str) -> np.ndarray:
+        return self._load(self._blocks[name]["file"])
+
+    def has_block(self, name: str) -> bool:
+        return name in self._blocks
+
+    def block_columns(self, name: str) -> List[str]:
+        return list(self._blocks[name]["columns"])
+
+    def extra(self, name: str) -> np.ndarray:
+        return self._load(self._extra[name]["file"])
+
+    def has_extra(self, name: str) -> bool:
+        return name in self._extra
+
+    def index(self) -> pd.Index:
+        if "index" in self.meta:
+            return pd.Index(self._load(self.meta["index"]))
+        return pd.RangeIndex(len(self))
+
+    def to_frame(self, columns: Optional[Iterable[str]] = None, blocks: Iterable[str] = ()) -> pd.DataFrame:
+        """Assemble a DataFrame from the selected columns and blocks (all columns by default)."""
+        names = self.columns if columns is None else list(columns)
+        frame = pd.DataFrame({name: self.column(name) for name in names}, index=self.index())
+        parts = [frame]
+        for name in blocks:
+            parts.append(pd.DataFrame(self.block(name), columns=self.block_columns(name), index=frame.index, copy=False))
+        return pd.concat(parts, axis="columns") if len(parts) > 1 else frame
@@ -0,0 +1,213 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.ann import as_search_matrix, make_index
+from engine.instrument import timed
+from engine.lookup import MovieLookup
+from engine.neighbours import NeighbourTable, fitted_vectors
+
+
+class ContentRecommender:
+    """Batched queries against the fitted KNN content pipeline.
+
+    ``knn_pl`` is the Normalizer + NearestNeighbors pipeline from ``knn.joblib``;
+    its rows are the movies table in its original (pre-sort) order, which is
+    what ``title_to_idx`` / ``idx_to_title`` index. Live queries run against
+    the pipeline's fitted matrix kept as L2-normalised float32 (CSR when
+    sparse) through a pluggable ``engine.ann`` index; with a precomputed
+    ``neighbour_table`` movie-to-movie queries are row lookups instead.
+    ``vectors`` passes that matrix in ready-made (e.g. mapped from the model
+    store), in which case ``knn_pl`` is not needed. ``lookup`` shares the
+    loader's id/title lookups over ``movies`` instead of building new ones.
+    Queries take an optional ``allowed`` mask over ``movies`` (a facet
+    filter, see ``engine.facets``); other movies are dropped before the top
+    ``k`` / ``n`` are picked.
+    """
+
+    def __init__(
+        self,
+        movies: pd.DataFrame,
+        features: pd.DataFrame,
+        knn_pl,
+        title_to_idx,
+        idx_to_title,
+        neighbour_table: Optional[NeighbourTable] = None,
+        index: str = "exact",
+        index_params: Optional[dict] = None,
+        vectors=None,
+        lookup: Optional[MovieLookup] = None,
+    ):
+        self.movies = movies
+        self.features = features
+        self.vectors = vectors if vectors is not None else as_search_matrix(fitted_vectors(knn_pl))
+        self.index = make_index(index, self.vectors, **(index_params or {}))
+        self.title_to_idx = title_to_idx
+        self.idx_to_title = idx_to_title
+        self.neighbour_table = neighbour_table
+        self.lookup = lookup if lookup is not None else MovieLookup.from_frame(movies)
+        self._pos_of_row = self._row_positions()
+        self._row_of_pos = np.full(len(movies), -1, dtype=np.int64)
+        known = self._pos_of_row >= 0
+        self._row_of_pos[self._pos_of_row[known]] = np.flatnonzero(known)
+
+    def _row_positions(self) -> np.ndarray:
+        """Map each KNN row to its position in ``movies`` (-1 when it has none)."""
+        n_rows = len(self.idx_to_title)
+        labels = self.movies.index.to_numpy()
+        if labels.dtype.kind in "iu" and len(labels) == n_rows and np.array_equal(np.sort(labels), np.arange(n_rows)):
+            # movies kept the index labels of the frame the pipeline was fitted on.
+            pos = np.empty(n_rows, dtype=np.int64)
+            pos[labels] = np.arange(n_rows)
+            return pos
+        return self.lookup.title_positions(self.idx_to_title.to_numpy())
+
+    def positions_of(self, movie_ids) -> np.ndarray:
+        """Positions in ``movies`` of ``movie_ids`` (-1 for ids not in the catalog)."""
+        return self.lookup.positions_of(movie_ids)
+
+    def _allowed_rows(self, allowed) -> np.ndarray:
+        """A mask over ``movies`` as a mask over the KNN rows (rows without a movie are never allowed)."""
+        allowed = np.asarray(allowed, dtype=bool)
+        return (self._pos_of_row >= 0) & allowed[np.maximum(self._pos_of_row, 0)]
+
+    @timed("content.neighbours")
+    def neighbours(self, positions, k: int, allowed=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (positions, similarities) of the ``k`` nearest movies to each seed.
+
+        Seeds are answered from the neighbour table when it is deep enough (with
+        ``allowed``, when every seed has ``k`` allowed movies among its table
+        entries); otherwise all of them go through one multi-row index search.
+        Seeds never appear in their own neighbour lists.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        seed_rows = self._row_of_pos[positions]
+        allowed_rows = None if allowed is None else self._allowed_rows(allowed)
+        table = self.neighbour_table
+        found = None
+        if table is not None and k <= table.k and np.all(seed_rows >= 0):
+            if allowed_rows is None:
+                found = table.query(seed_rows, k)
+            else:
+                found = self._filtered_table_neighbours(table, seed_rows, k, allowed_rows)
+        if found is None:
+            found = self._live_neighbours(positions, seed_rows, k, allowed_rows)
+        distances, rows = found
+        return self._positions(rows), 1.0 - distances
+
+    @staticmethod
+    def _filtered_table_neighbours(table, seed_rows: np.ndarray, k: int, allowed_rows: np.ndarray):
+        """The first ``k`` allowed table entries per seed, or None when a seed has fewer."""
+        distances, rows = table.query(seed_rows, table.k)
+        keep = allowed_rows[rows]
+        if np.any(keep.sum(axis=1) < k):
+            return None
+        keep &= np.cumsum(keep, axis=1) <= k
+        return distances[keep].reshape(len(seed_rows), k), rows[keep].reshape(len(seed_rows), k)
+
+    def _positions(self, rows: np.ndarray) -> np.ndarray:
+        """Map KNN rows to movies positions, keeping -1 padding from approximate indexes."""
+        return np.where(rows >= 0, self._pos_of_row[np.maximum(rows, 0)], -1)
+
+    def _live_neighbours(self, positions: np.ndarray, seed_rows: np.ndarray, k: int, allowed_rows=None):
+        queries = as_search_matrix(self.features.iloc[positions].to_numpy(dtype=np.float32))
+        distances, rows = self.index.search(queries, k + 1, allowed_rows)
+        keep = rows != seed_rows[:, None]
+        # Keep exactly k per seed: drop the self match, or the last one when the seed was not returned.
+        keep &= np.cumsum(keep, axis=1) <= k
+        return distances[keep].reshape(len(positions), k), rows[keep].reshape(len(positions), k)
+
+    def title_neighbours(self, title: str, n: int = 10, allowed=None) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, similarities) of the ``n`` movies closest to ``title``, nearest first."""
+        position = self._pos_of_row[self.title_to_idx[title]]
+        found, similarity = self.neighbours([position], n, allowed)
+        keep = found[0] >= 0
+        return found[0][keep], similarity[0][keep]
+
+    @timed("content.vector_neighbours")
+    def vector_neighbours(self, vector, n: int = 10, allowed=None) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, similarities) of the ``n`` movies closest to an ad-hoc feature vector."""
+        query = as_search_matrix(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        distances, rows = self.index.search(query, n, None if allowed is None else self._allowed_rows(allowed))
+        found = self._positions(rows[0])
+        keep = found >= 0
+        return found[keep], 1.0 - distances[0][keep]
+
+    def rows(self, positions, scores=None) -> pd.DataFrame:
+        """``movies`` rows at ``positions``, with a ``score`` column when ``scores`` is given."""
+        result = self.movies.iloc[np.asarray(positions, dtype=np.int64)]
+        if scores is not None:
+            result = result.copy()
+            result["score"] = np.asarray(scores, dtype=np.float32)
+        return result
+
+    def similar_to_title(self, title: str, n: int = 10, allowed=None) -> pd.DataFrame:
+        """The ``n`` movies closest to ``title``, nearest first."""
+        return self.rows(self.title_neighbours(title, n, allowed)[0])
+
+    def similar_to_vector(self, vector, n: int = 10, allowed=None) -> pd.DataFrame:
+        """The ``n`` movies closest to an ad-hoc feature vector (e.g. a genre profile)."""
+        return self.rows(self.vector_neighbours(vector, n, allowed)[0])
+
+    @timed("content.hybrid")
+    def hybrid_scores(
+        self,
+        seed_ids,
+        seed_scores,
+        exclude=None,
+        k: int = 10,
+        cf_weight: float = 0.5,
+        rating_scale: Tuple[float, float] = (0.5, 5.0),
+        limit: Optional[int] = None,
+        allowed=None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Rank CF seeds and their content neighbours in one pass; returns (positions, scores).
+
+        Each candidate scores ``cf_weight * cf + (1 - cf_weight) * similarity``,
+        where ``cf`` is the seed's estimate rescaled to [0, 1] and a seed has
+        similarity 1 to itself; a movie reached from several seeds keeps its best
+        score. Movies in ``exclude`` (already watched) are dropped, and so are
+        movies outside ``allowed``, neighbours before they are ranked.
+        """
+        seed_pos = self.positions_of(seed_ids)
+        valid = seed_pos >= 0
+        seed_pos = seed_pos[valid]
+        low, high = rating_scale
+        cf = np.clip((np.asarray(seed_scores, dtype=np.float64)[valid] - low) / (high - low), 0.0, 1.0)
+
+        if seed_pos.size:
+            found, similarity = self.neighbours(seed_pos, k, allowed)
+        else:
+            found, similarity = np.empty((0, k), dtype=np.int64), np.empty((0, k))
+        candidates = np.concatenate([seed_pos, found.ravel()])
+        scores = np.concatenate(
+            [
+                cf_weight * cf + (1.0 - cf_weight),
+                (cf_weight * cf[:, None] + (1.0 - cf_weight) * similarity).ravel(),
+            ]
+        )
+        keep = candidates >= 0
+        if exclude is not None and len(exclude):
+            # A position mask instead of a sorted isin over the candidates' ids.
+            excluded = np.zeros(len(self.movies), dtype=bool)
+            positions = self.lookup.positions_of(exclude)
+            excluded[positions[positions >= 0]] = True
+            keep &= ~excluded[np.where(keep, candidates, 0)]
+        if allowed is not None:
+            keep &= np.asarray(allowed, dtype=bool)[np.where(keep, candidates, 0)]
+        candidates, scores = candidates[keep], scores[keep]
+
+        # Best score per movie, then rank.
+        order = np.lexsort((candidates, -scores))
+        candidates, scores = candidates[order], scores[order]
+        _, first = np.unique(candidates, return_index=True)
+        first.sort()
+        candidates, scores = candidates[first], scores[first]
+        if limit is not None:
+            candidates, scores = candidates[:limit], scores[:limit]
+        return candidates, scores.astype(np.float32)
+
+    def hybrid(self, seed_ids, seed_scores, exclude=None, **kwargs) -> pd.DataFrame:
+        """``hybrid_scores`` as ``movies`` rows with a ``score`` column."""
+        return self.rows(*self.hybrid_scores(seed_ids, seed_scores, exclude, **kwargs))
@@ -0,0 +1,308 @@
+"""Time-decayed ratings for the weighted SVD model.
+
+Usage::
+
+    python -m engine.decay run /path/to/data [--kind exponential --param 0.1] [--reference TS] [--full]
+    python -m engine.decay bench /path/to/data [--rows 200000]
+
+The EDA notebook weights every rating by how old it is relative to the newest
+one, ``weightedRating = rating * exp(-0.1 * age in days)``, with a row-wise
+``progress_apply``. ``decay_ratings`` computes the same column with chunked
+NumPy over the int32 timestamps and float32 ratings. The decay is a
+``TimeDecay``: a function of the age in days (``exponential`` with a rate per
+day, ``half_life`` in days, or a ``linear`` ramp to zero over a window in days)
+and a fixed reference time. Ratings newer than the reference are not decayed.
+
+``run`` writes ``<data>/weighted_ratings``: a ``manifest.json`` plus one
+columnar table (see ``engine.columnar``) per run, each holding ``userId``,
+``movieId``, ``timestamp`` and ``weightedRating``. A later ``run`` with the
+same decay only processes ratings it has not weighted yet: pairs of
+``userId`` and ``movieId`` not stored, or stored with an older timestamp (a
+newest-timestamp watermark would miss ratings imported late or within the
+same second).
+``load_weighted_ratings`` reads them back for training
+(``Dataset.load_from_df(frame, reader)``). The app folds new ratings into the
+weighted model with the manifest's decay (see ``engine.incremental``).
+``bench`` times the notebook's pandas code against ``decay_ratings``.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from engine.columnar import ColumnarTable, write_table
+
+WEIGHTS_DIR = "weighted_ratings"
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+SECONDS_PER_DAY = 60 * 60 * 24
+CHUNK_ROWS = 1 << 22
+
+# Age in days (float32, >= 0) and the kind's parameter -> weight.
+DECAY_KINDS: Dict[str, Callable[[np.ndarray, float], np.ndarray]] = {
+    "exponential": lambda age, rate: np.exp(-np.float32(rate) * age),
+    "half_life": lambda age, days: np.exp2(-age / np.float32(days)),
+    "linear": lambda age, days: np.clip(1 - age / np.float32(days), 0, 1),
+}
+
+
+@dataclass(frozen=True)
+class TimeDecay:
+    """A decay function of rating age; the default is the notebook's ``exp(-0.1 * days)``.
+
+    ``reference`` is the time ages are measured from; None means the newest rating
+    when the weights are first computed.
+    """
+
+    kind: str = "exponential"
+    param: float = 0.1
+    reference: Optional[int] = None
+
+    def __post_init__(self):
+        if self.kind not in DECAY_KINDS:
+            raise ValueError(f"unknown decay {self.kind!r}; expected one of {', '.join(DECAY_KINDS)}")
+
+    def with_reference(self, reference: int) -> "TimeDecay":
+        return TimeDecay(self.kind, self.param, int(reference))
+
+    def weights(self, timestamps: np.ndarray) -> np.ndarray:
+        """float32 weight per timestamp (Unix seconds)."""
+        if self.reference is None:
+            raise ValueError("decay has no reference time")
+        age = np.maximum(np.int64(self.reference) - np.asarray(timestamps, dtype=np.int64), 0)
+        return DECAY_KINDS[self.kind](age.astype(np.float32) / np.float32(SECONDS_PER_DAY), self.param)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "TimeDecay":
+        return cls(values["kind"], float(values["param"]), values.get("reference"))
+
+
+def decay_ratings(
+    ratings: np.ndarray,
+    timestamps: np.ndarray,
+    decay: TimeDecay,
+    chunk_rows: int = CHUNK_ROWS,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """``ratings * decay.weights(timestamps)`` as float32, ``chunk_rows`` at a time.
+
+    Chunking bounds the temporaries (ages, weights) to a few MB however long the
+    columns are, and works on memory-mapped columns without reading them whole.
+    """
+    if out is None:
+        out = np.empty(len(ratings), dtype=np.float32)
+    for start in range(0, len(ratings), chunk_rows):
+        stop = min(start + chunk_rows, len(ratings))
+        np.multiply(ratings[start:stop], decay.weights(timestamps[start:stop]), out=out[start:stop])
+    return out
+
+
+def read_manifest(path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == FORMAT_VERSION else None
+
+
+def manifest_decay(path: str) -> Optional[TimeDecay]:
+    """The decay (with its reference) the weights under ``path`` were computed with, if any."""
+    manifest = read_manifest(path)
+    return TimeDecay.from_dict(manifest["decay"]) if manifest else None
+
+
+def _pair_keys(user_ids: np.ndarray, movie_ids: np.ndarray) -> np.ndarray:
+    return (np.asarray(user_ids, dtype=np.int64) << 32) | np.asarray(movie_ids, dtype=np.int64)
+
+
+def _unweighted_rows(path: str, parts, user_ids, movie_ids, timestamps) -> np.ndarray:
+    """Rows whose (userId, movieId) the stored ``parts`` lack, or hold only with an older timestamp."""
+    pairs = _pair_keys(user_ids, movie_ids)
+    tables = [ColumnarTable(os.path.join(path, part)) for part in parts]
+    stored = np.concatenate([_pair_keys(t.column("userId"), t.column("movieId")) for t in tables])
+    stored_timestamps = np.concatenate([t.column("timestamp") for t in tables])
+    if stored.size == 0:
+        return np.arange(pairs.size)
+    # Parts follow the ratings' user order, which the stable sort keeps cheap; lexsort was ~10x slower.
+    order = np.argsort(stored, kind="stable")
+    stored = stored[order]
+    starts = np.flatnonzero(np.append(True, stored[1:] != stored[:-1]))
+    # The newest stored timestamp per pair, the one ``load_weighted_ratings`` keeps.
+    newest = np.maximum.reduceat(stored_timestamps[order], starts)
+    stored = stored[starts]
+    at = np.minimum(np.searchsorted(stored, pairs), stored.size - 1)
+    done = (stored[at] == pairs) & (newest[at] >= np.asarray(timestamps))
+    return np.flatnonzero(~done)
+
+
+def update_weights(
+    path: str,
+    user_ids: np.ndarray,
+    movie_ids: np.ndarray,
+    ratings: np.ndarray,
+    timestamps: np.ndarray,
+    decay: TimeDecay = TimeDecay(),
+    full: bool = False,
+    chunk_rows: int = CHUNK_ROWS,
+) -> dict:
+    """Add the weights of ratings not weighted by an earlier run under ``path``; returns the manifest.
+
+    Everything is recomputed when ``full`` is set, nothing was computed yet, or ``decay``
+    differs from the stored one (a ``decay`` without reference keeps the stored reference).
+    """
+    manifest = None if full else read_manifest(path)
+    if manifest is not None:
+        stored = TimeDecay.from_dict(manifest["decay"])
+        if decay.reference is None:
+            decay = decay.with_reference(stored.reference)
+        if decay != stored:
+            manifest = None
+    if manifest is None:
+        shutil.rmtree(path, ignore_errors=True)
+        if decay.reference is None:
+            decay = decay.with_reference(int(timestamps.max()) if len(timestamps) else 0)
+        manifest = {"version": FORMAT_VERSION, "decay": decay.to_dict(), "newest": None, "rows": 0, "parts": []}
+    manifest["last_run_rows"] = 0
+
+    if manifest["parts"]:
+        rows = _unweighted_rows(path, manifest["parts"], user_ids, movie_ids, timestamps)
+    else:
+        rows = slice(None)
+    timestamps = np.asarray(timestamps[rows])
+    if timestamps.size:
+        part = f"part-{len(manifest['parts']):04d}"
+        frame = pd.DataFrame(
+            {
+                "userId": np.asarray(user_ids[rows], dtype=np.int32),
+                "movieId": np.asarray(movie_ids[rows], dtype=np.int32),
+                "timestamp": timestamps.astype(np.int32),
+                "weightedRating": decay_ratings(np.asarray(ratings[rows]), timestamps, decay, chunk_rows),
+            }
+        )
+        write_table(os.path.join(path, part), frame)
+        manifest["parts"].append(part)
+        manifest["rows"] += int(timestamps.size)
+        manifest["last_run_rows"] = int(timestamps.size)
+        manifest["newest"] = max(int(timestamps.max()), manifest["newest"] or 0)
+    os.makedirs(path, exist_ok=True)
+    tmp = os.path.join(path, f"{MANIFEST_FILE}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(path, MANIFEST_FILE))
+    return manifest
+
+
+def load_weighted_ratings(path: str) -> pd.DataFrame:
+    """``userId``, ``movieId``, ``weightedRating`` of every run under ``path``, newest rating per pair."""
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"no weighted ratings under {path}")
+    columns = ["userId", "movieId", "timestamp", "weightedRating"]
+    parts = [ColumnarTable(os.path.join(path, part)).to_frame(columns) for part in manifest["parts"]]
+    frame = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    if len(parts) > 1:
+        # A movie re-rated after the first run shows up in a later part too.
+        frame = frame.sort_values("timestamp", kind="stable").drop_duplicates(["userId", "movieId"], keep="last")
+    return frame[["userId", "movieId", "weightedRating"]].reset_index(drop=True)
+
+
+def _notebook_weights(frame: pd.DataFrame) -> pd.Series:
+    """The EDA notebook's cell, minus the tqdm progress bar."""
+    mx = frame.timestamp.max()
+    divisor = 60 * 60 * 24
+    return frame[["rating", "timestamp"]].apply(
+        lambda row: row.rating * (np.exp(-0.1 * (mx - row.timestamp) / divisor)), axis=1
+    )
+
+
+def benchmark(ratings: np.ndarray, timestamps: np.ndarray, sample_rows: int) -> dict:
+    """Seconds and rows/s of the notebook's pandas ``apply`` (on a sample) and of ``decay_ratings``."""
+    sample = pd.DataFrame({"rating": ratings[:sample_rows], "timestamp": timestamps[:sample_rows]})
+    started = time.perf_counter()
+    expected = _notebook_weights(sample).to_numpy()
+    pandas_s = time.perf_counter() - started
+
+    decay = TimeDecay().with_reference(int(sample["timestamp"].max()))
+    started = time.perf_counter()
+    sample_out = decay_ratings(sample["rating"].to_numpy(), sample["timestamp"].to_numpy(), decay)
+    sample_s = time.perf_counter() - started
+
+    decay = TimeDecay().with_reference(int(np.max(timestamps)))
+    started = time.perf_counter()
+    decay_ratings(ratings, timestamps, decay)
+    full_s = time.perf_counter() - started
+    return {
+        "pandas_rows": len(sample),
+        "pandas_s": pandas_s,
+        "pandas_rows_per_s": len(sample) / pandas_s,
+        "numpy_sample_s": sample_s,
+        "numpy_rows": len(ratings),
+        "numpy_s": full_s,
+        "numpy_rows_per_s": len(ratings) / full_s,
+        "max_abs_diff": float(np.max(np.abs(sample_out - expected))) if len(sample) else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    from engine.loaders import ArtifactLoader, LoaderSettings
+
+    parser = argparse.ArgumentParser(description="Compute or benchmark the time-decayed ratings.")
+    parser.add_argument("command", choices=["run", "bench"])
+    parser.add_argument("data_dir", help="directory holding ratings.pkl (or its columnar export)")
+    parser.add_argument("--kind", choices=list(DECAY_KINDS), default="exponential")
+    parser.add_argument("--param", type=float, default=0.1, help="rate per day, or half-life / window in days")
+    parser.add_argument("--reference", type=int, default=None, help="Unix time ages are measured from")
+    parser.add_argument("--full", action="store_true", help="recompute every rating")
+    parser.add_argument("--rows", type=int, default=200_000, help="bench: rows timed with pandas")
+    args = parser.parse_args(argv)
+
+    loader = ArtifactLoader(LoaderSettings(local_dir=args.data_dir, cache_dir=None))
+    index = loader.ratings_index()
+    if index.timestamps is None:
+        print("the ratings have no timestamp column", file=sys.stderr)
+        return 1
+
+    if args.command == "bench":
+        report = benchmark(index.ratings, index.timestamps, args.rows)
+        print(
+            f"pandas apply   {report['pandas_rows']:>11} rows {report['pandas_s']:>8.2f}s "
+            f"{report['pandas_rows_per_s']:>14,.0f} rows/s\n"
+            f"decay_ratings  {report['numpy_rows']:>11} rows {report['numpy_s']:>8.2f}s "
+            f"{report['numpy_rows_per_s']:>14,.0f} rows/s\n"
+            f"speedup x{report['pandas_s'] / max(report['numpy_sample_s'], 1e-9):,.0f} on the sample, "
+            f"max abs difference {report['max_abs_diff']:.2e}"
+        )
+        return 0
+
+    started = time.perf_counter()
+    path = os.path.join(args.data_dir, WEIGHTS_DIR)
+    manifest = update_weights(
+        path,
+        np.repeat(index.user_ids, index.user_counts()),
+        index.movie_ids,
+        index.ratings,
+        index.timestamps,
+        TimeDecay(args.kind, args.param, args.reference),
+        full=args.full,
+    )
+    print(
+        f"{manifest['last_run_rows']} ratings weighted ({manifest['rows']} total, {len(manifest['parts'])} parts) -> {path} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,634 @@
+"""Offline top-K ranking evaluation of the recommenders on a time-based holdout.
+
+Usage::
+
+    python -m engine.evaluate OUT.json [--k 10] [--models svd,weighted_svd,content,hybrid]
+        [--split user] [--test-fraction 0.2] [--threshold 4.0] [--refit users]
+        [--max-users N] [--workers 4] [--max-block-mb 256] [--data-dir DIR]
+    python -m engine.evaluate compare before.json after.json
+
+``Model.ipynb`` only reports Surprise's RMSE / MAE / FCP, one prediction at a
+time; this scores the top-K lists the app shows. Ratings are split by time:
+``--split user`` holds out each user's latest ``--test-fraction`` of ratings,
+``global`` every rating after that quantile of all timestamps. Held-out
+ratings of at least ``--threshold`` are a user's relevant movies; users with
+a training rating and a relevant held-out movie are evaluated (``--max-users``
+samples them). Each model ranks the catalog minus the user's training
+ratings:
+
+    svd, weighted_svd  the SVD scorers
+    content            the content neighbours of the user's best training ratings
+    hybrid             the Model page's hybrid: the top SVD picks fused with their content neighbours
+
+``--refit users`` (the default) refits every evaluated user's factors from
+their training ratings with the item factors fixed (``engine.incremental``),
+so held-out ratings do not shape the user's own factors; the item factors
+were still trained on them, which flatters the CF models somewhat.
+``--refit full`` trains new Surprise SVDs (default parameters, as in the
+notebook) on the training ratings: leak-free, but as slow as the notebook.
+``--refit none`` scores the models as loaded.
+
+Users are scored in blocks sized like ``engine.batch`` and spread over a
+process pool: each block gets one (users x catalog) score matrix, a vectorised
+top-K, and NumPy precision@K, recall@K, NDCG@K and AP@K over its hit matrix.
+Blocks return metric sums and how often each movie was recommended, from
+which catalog coverage and novelty (the mean self-information ``-log2`` of
+the share of training users who rated a recommended movie) follow. The JSON
+report holds the parameters, the split and one row of metrics per model;
+``compare`` prints two reports side by side.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.batch import block_size_for, load_scorer, save_scorer
+from engine.cf import SVDScorer, lookup_sorted, select_top_n
+from engine.decay import TimeDecay, decay_ratings
+from engine.incremental import DEFAULT_REG, fold_in
+from engine.ratings_index import RatingsIndex
+
+REPORT_VERSION = 1
+DEFAULT_K = 10
+MODELS = ("svd", "weighted_svd", "content", "hybrid")
+SPLITS = ("user", "global")
+REFITS = ("users", "full", "none")
+METRICS = ("precision", "recall", "ndcg", "map")
+# As on the Model page: the hybrid fuses the top 10 SVD picks with 10 content neighbours each.
+HYBRID_SEEDS = 10
+HYBRID_NEIGHBOURS = 10
+CF_WEIGHT = 0.5
+# Training ratings (best first, then newest) whose neighbours make up a content list.
+CONTENT_SEEDS = 10
+NEIGHBOURS_FILE = "neighbours.npy"
+SIMILARITIES_FILE = "similarities.npy"
+CONFIG_FILE = "config.json"
+
+_context: dict = {}
+
+
+def _subset(ratings: RatingsIndex, keep: np.ndarray) -> RatingsIndex:
+    """The ratings where ``keep`` is True; users left without any are dropped."""
+    kept = np.zeros(keep.size + 1, dtype=np.int64)
+    np.cumsum(keep, out=kept[1:])
+    indptr = kept[ratings.indptr]
+    users = np.diff(indptr) > 0
+    return RatingsIndex(
+        user_ids=ratings.user_ids[users],
+        indptr=np.append(indptr[:-1][users], indptr[-1]),
+        movie_ids=ratings.movie_ids[keep],
+        ratings=ratings.ratings[keep],
+        timestamps=None if ratings.timestamps is None else ratings.timestamps[keep],
+    )
+
+
+def _user_rows(ratings: RatingsIndex) -> np.ndarray:
+    """Row of ``user_ids`` each rating belongs to."""
+    return np.repeat(np.arange(ratings.n_users), ratings.user_counts())
+
+
+def time_split(
+    ratings: RatingsIndex, test_fraction: float = 0.2, by: str = "user"
+) -> Tuple[RatingsIndex, RatingsIndex]:
+    """(train, test) by rating time.
+
+    ``by="user"`` holds out each user's latest ``test_fraction`` of ratings (rounded down, so
+    users with few ratings stay in training); ``by="global"`` every rating after that quantile
+    of all timestamps.
+    """
+    if ratings.timestamps is None:
+        raise ValueError("the ratings have no timestamps to split on")
+    if not 0 < test_fraction < 1:
+        raise ValueError("test_fraction must be between 0 and 1")
+    timestamps = ratings.timestamps
+    if by == "global":
+        test = timestamps > np.quantile(timestamps, 1 - test_fraction)
+    elif by == "user":
+        rows = _user_rows(ratings)
+        order = np.lexsort((timestamps, rows))
+        rank = np.empty(rows.size, dtype=np.int64)
+        rank[order] = np.arange(rows.size) - ratings.indptr[rows[order]]
+        counts = ratings.user_counts()
+        held_out = np.floor(counts * test_fraction).astype(np.int64)
+        test = rank >= (counts - held_out)[rows]
+    else:
+        raise ValueError(f"unknown split {by!r}; expected one of {', '.join(SPLITS)}")
+    return _subset(ratings, ~test), _subset(ratings, test)
+
+
+def _catalog_positions(catalog: np.ndarray, movie_ids: np.ndarray) -> np.ndarray:
+    """Positions of ``movie_ids`` in ``catalog`` (-1 for movies outside it)."""
+    order = np.argsort(catalog, kind="stable")
+    return lookup_sorted(catalog[order], order, movie_ids)
+
+
+class EvalUsers(NamedTuple):
+    """Evaluated users with their training ratings and relevant held-out movies, as catalog positions."""
+
+    user_ids: np.ndarray
+    indptr: np.ndarray
+    items: np.ndarray
+    ratings: np.ndarray
+    timestamps: np.ndarray
+    relevant_indptr: np.ndarray
+    relevant_items: np.ndarray
+
+    @property
+    def n_users(self) -> int:
+        return int(self.user_ids.size)
+
+    def block(self, start: int, stop: int) -> "EvalUsers":
+        lo, hi = self.indptr[start], self.indptr[stop]
+        r_lo, r_hi = self.relevant_indptr[start], self.relevant_indptr[stop]
+        return EvalUsers(
+            self.user_ids[start:stop],
+            self.indptr[start : stop + 1] - lo,
+            self.items[lo:hi],
+            self.ratings[lo:hi],
+            self.timestamps[lo:hi],
+            self.relevant_indptr[start : stop + 1] - r_lo,
+            self.relevant_items[r_lo:r_hi],
+        )
+
+
+def eval_users(
+    train: RatingsIndex,
+    test: RatingsIndex,
+    catalog: np.ndarray,
+    threshold: float = 4.0,
+    max_users: Optional[int] = None,
+    seed: int = 0,
+) -> EvalUsers:
+    """Users with a training rating and a held-out rating >= ``threshold`` of a ``catalog`` movie.
+
+    Ratings of movies outside ``catalog`` (movie ids in catalog order) are dropped: no model
+    can recommend them.
+    """
+    train_pos = _catalog_positions(catalog, train.movie_ids)
+    train = _subset(train, train_pos >= 0)
+    train_pos = train_pos[train_pos >= 0]
+    test_pos = _catalog_positions(catalog, test.movie_ids)
+    relevant = (test_pos >= 0) & (test.ratings >= threshold)
+    test = _subset(test, relevant)
+    test_pos = test_pos[relevant]
+
+    users = np.intersect1d(train.user_ids, test.user_ids)
+    if max_users is not None and users.size > max_users:
+        users = np.sort(np.random.default_rng(seed).choice(users, max_users, replace=False))
+    in_train = np.isin(train.user_ids, users)
+    in_test = np.isin(test.user_ids, users)
+    train_keep = np.repeat(in_train, train.user_counts())
+    test_keep = np.repeat(in_test, test.user_counts())
+    train = _subset(train, train_keep)
+    test = _subset(test, test_keep)
+    return EvalUsers(
+        user_ids=train.user_ids,
+        indptr=train.indptr.astype(np.int64),
+        items=train_pos[train_keep],
+        ratings=train.ratings,
+        timestamps=train.timestamps,
+        relevant_indptr=test.indptr.astype(np.int64),
+        relevant_items=test_pos[test_keep],
+    )
+
+
+def _keys(indptr: np.ndarray, items: np.ndarray, n_items: int) -> np.ndarray:
+    """Sorted ``row * n_items + item`` keys of a block's (row, item) pairs, for membership tests."""
+    rows = np.repeat(np.arange(indptr.size - 1, dtype=np.int64), np.diff(indptr))
+    return np.sort(rows * n_items + items)
+
+
+def _member(keys: np.ndarray, sorted_keys: np.ndarray) -> np.ndarray:
+    if not sorted_keys.size:
+        return np.zeros(keys.shape, dtype=bool)
+    found = np.minimum(np.searchsorted(sorted_keys, keys), sorted_keys.size - 1)
+    return sorted_keys[found] == keys
+
+
+def ranking_metrics(top: np.ndarray, relevant_indptr: np.ndarray, relevant_items: np.ndarray, n_items: int):
+    """Per-user precision@K, recall@K, NDCG@K and AP@K of (users, K) item lists (-1 for empty slots).
+
+    ``relevant_indptr`` / ``relevant_items`` hold each user's relevant items CSR-style; users need
+    at least one. AP@K divides by ``min(relevant, K)``, so a perfect list scores 1.
+    """
+    n_users, k = top.shape
+    rows = np.arange(n_users, dtype=np.int64)[:, None]
+    hits = (top >= 0) & _member(rows * n_items + top, _keys(relevant_indptr, relevant_items, n_items))
+    n_relevant = np.diff(relevant_indptr)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    n_hits = hits.sum(axis=1)
+    ideal = np.cumsum(discounts)[np.minimum(n_relevant, k) - 1]
+    precision_at = np.cumsum(hits, axis=1) / np.arange(1, k + 1)
+    return {
+        "precision": n_hits / k,
+        "recall": n_hits / n_relevant,
+        "ndcg": (hits @ discounts) / ideal,
+        "map": (precision_at * hits).sum(axis=1) / np.minimum(n_relevant, k),
+    }
+
+
+def rank_candidates(
+    users: np.ndarray, items: np.ndarray, scores: np.ndarray, exclude: np.ndarray, n_users: int, k: int, n_items: int
+) -> np.ndarray:
+    """(n_users, k) best distinct items per user from flat (user, item, score) candidates.
+
+    A candidate reached several times keeps its best score; items whose ``user * n_items + item``
+    key is in the sorted ``exclude`` keys, and items < 0, are dropped. Ties go to the lower item,
+    as in ``ContentRecommender.hybrid_scores``; rows are padded with -1.
+    """
+    keys = users.astype(np.int64) * n_items + items
+    keep = (items >= 0) & ~_member(keys, exclude)
+    users, items, scores, keys = users[keep], items[keep], scores[keep], keys[keep]
+    order = np.lexsort((items, -scores, users))
+    users, items, keys = users[order], items[order], keys[order]
+    _, first = np.unique(keys, return_index=True)
+    first.sort()
+    users, items = users[first], items[first]
+    rank = np.arange(users.size) - np.searchsorted(users, users, side="left")
+    top = np.full((n_users, k), -1, dtype=np.int64)
+    kept = rank < k
+    top[users[kept], rank[kept]] = items[kept]
+    return top
+
+
+def fit_svd(train: RatingsIndex, catalog: np.ndarray, decay: Optional[TimeDecay] = None, seed: int = 0) -> SVDScorer:
+    """A Surprise ``SVD`` with default parameters fitted on ``train`` (time-decayed with ``decay``), as a scorer."""
+    from surprise import SVD, Dataset, Reader
+
+    values = train.ratings if decay is None else decay_ratings(train.ratings, train.timestamps, decay)
+    frame = pd.DataFrame(
+        {"userId": np.repeat(train.user_ids, train.user_counts()), "movieId": train.movie_ids, "rating": values}
+    )
+    data = Dataset.load_from_df(frame, Reader(rating_scale=(0.5, 5.0)))
+    algo = SVD(random_state=seed)
+    algo.fit(data.build_full_trainset())
+    return SVDScorer.from_surprise(algo, catalog)
+
+
+def content_neighbours(engine, depth: int, block_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """(positions, similarities) of every catalog movie's ``depth`` nearest movies, from a ``ContentRecommender``."""
+    n = len(engine.movies)
+    positions = np.empty((n, depth), dtype=np.int32)
+    similarities = np.empty((n, depth), dtype=np.float64)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        found, similarity = engine.neighbours(np.arange(start, stop), depth)
+        positions[start:stop] = found
+        similarities[start:stop] = similarity
+    return positions, similarities
+
+
+# Pool worker side: models and neighbours memory-mapped from the work directory.
+def _init_worker(work_dir: str) -> None:
+    from threadpoolctl import threadpool_limits
+
+    # One BLAS thread per process; the pool provides the parallelism.
+    threadpool_limits(1)
+    with open(os.path.join(work_dir, CONFIG_FILE), encoding="utf-8") as f:
+        config = json.load(f)
+    _context.clear()
+    _context.update(config)
+    _context["decay"] = TimeDecay.from_dict(config["decay"]) if config["decay"] else None
+    for name in ("svd", "weighted_svd"):
+        if os.path.isdir(os.path.join(work_dir, name)):
+            _context[name] = load_scorer(os.path.join(work_dir, name))
+    if os.path.exists(os.path.join(work_dir, NEIGHBOURS_FILE)):
+        _context["neighbours"] = np.load(os.path.join(work_dir, NEIGHBOURS_FILE), mmap_mode="r")
+        _context["similarities"] = np.load(os.path.join(work_dir, SIMILARITIES_FILE), mmap_mode="r")
+
+
+def _scorer(name: str, block: EvalUsers) -> SVDScorer:
+    """The block's users scored by ``name``, refitted from their training ratings with ``--refit users``."""
+    scorer = _context[name]
+    if _context["refit"] != "users":
+        return scorer
+    decay = _context["decay"] if name == "weighted_svd" else None
+    users, factors, biases = [], [], []
+    for row, user_id in enumerate(block.user_ids):
+        rows = slice(block.indptr[row], block.indptr[row + 1])
+        values = block.ratings[rows]
+        if decay is not None:
+            values = decay_ratings(values, block.timestamps[rows], decay)
+        fitted = fold_in(scorer, scorer.item_ids[block.items[rows]], values, _context["reg"])
+        if fitted is not None:
+            users.append(user_id)
+            factors.append(fitted[0])
+            biases.append(fitted[1])
+    return scorer.with_folded_users(users, np.vstack(factors), np.asarray(biases)) if users else scorer
+
+
+def _cf_top(name: str, block: EvalUsers, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    scorer = _scorer(name, block)
+    scores = scorer.score(block.user_ids)
+    scores[np.repeat(np.arange(block.n_users), np.diff(block.indptr)), block.items] = -np.inf
+    return select_top_n(scores, n)
+
+
+def _content_top(block: EvalUsers, k: int, n_items: int, exclude: np.ndarray) -> np.ndarray:
+    rows = np.repeat(np.arange(block.n_users), np.diff(block.indptr))
+    order = np.lexsort((-block.timestamps.astype(np.int64), -block.ratings, rows))
+    rank = np.arange(order.size) - block.indptr[rows[order]]
+    seeds = order[rank < CONTENT_SEEDS]
+    neighbours = np.asarray(_context["neighbours"][block.items[seeds]], dtype=np.int64)
+    similarities = np.asarray(_context["similarities"][block.items[seeds]])
+    users = np.repeat(rows[seeds], neighbours.shape[1])
+    return rank_candidates(users, neighbours.ravel(), similarities.ravel(), exclude, block.n_users, k, n_items)
+
+
+def _hybrid_top(block: EvalUsers, k: int, n_items: int, exclude: np.ndarray) -> np.ndarray:
+    """``ContentRecommender.hybrid_scores`` for every user of the block at once."""
+    seeds, seed_scores = _cf_top("svd", block, HYBRID_SEEDS)
+    low, high = _context["svd"].rating_scale
+    cf = np.clip((seed_scores - low) / (high - low), 0.0, 1.0)
+    neighbours = np.asarray(_context["neighbours"][np.maximum(seeds, 0), :HYBRID_NEIGHBOURS], dtype=np.int64)
+    similarities = np.asarray(_context["similarities"][np.maximum(seeds, 0), :HYBRID_NEIGHBOURS])
+    neighbours[seeds < 0] = -1
+    users = np.repeat(np.arange(block.n_users), seeds.shape[1] * (1 + HYBRID_NEIGHBOURS))
+    items = np.concatenate([seeds[:, :, None], neighbours], axis=2).ravel()
+    scores = np.concatenate(
+        [
+            (CF_WEIGHT * cf + (1.0 - CF_WEIGHT))[:, :, None],
+            CF_WEIGHT * cf[:, :, None] + (1.0 - CF_WEIGHT) * similarities,
+        ],
+        axis=2,
+    ).ravel()
+    return rank_candidates(users, items, scores, exclude, block.n_users, k, n_items)
+
+
+def _evaluate_block(model: str, block: EvalUsers) -> dict:
+    started = time.perf_counter()
+    k, n_items = _context["k"], _context["n_items"]
+    exclude = _keys(block.indptr, block.items, n_items)
+    if model in ("svd", "weighted_svd"):
+        top = _cf_top(model, block, k)[0]
+    elif model == "content":
+        top = _content_top(block, k, n_items, exclude)
+    else:
+        top = _hybrid_top(block, k, n_items, exclude)
+    metrics = ranking_metrics(top, block.relevant_indptr, block.relevant_items, n_items)
+    sums = {name: float(values.sum()) for name, values in metrics.items()}
+    counts = np.bincount(top[top >= 0], minlength=n_items)
+    return dict(sums, users=block.n_users, counts=counts, seconds=time.perf_counter() - started)
+
+
+def _summarise(sums: dict, counts: np.ndarray, information: np.ndarray, k: int) -> dict:
+    users = max(sums["users"], 1)
+    summary = {f"{name}@{k}": sums[name] / users for name in METRICS}
+    recommended = counts.sum()
+    summary["coverage"] = float(np.count_nonzero(counts) / counts.size) if counts.size else 0.0
+    summary["novelty"] = float(counts @ information / recommended) if recommended else 0.0
+    summary["users"] = int(sums["users"])
+    return summary
+
+
+def evaluate(
+    ratings: RatingsIndex,
+    catalog: np.ndarray,
+    scorers: Optional[Dict[str, SVDScorer]] = None,
+    neighbours: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    models: Sequence[str] = MODELS,
+    k: int = DEFAULT_K,
+    split: str = "user",
+    test_fraction: float = 0.2,
+    threshold: float = 4.0,
+    refit: str = "users",
+    decay: TimeDecay = TimeDecay(),
+    max_users: Optional[int] = None,
+    workers: Optional[int] = None,
+    max_block_mb: float = 256,
+    seed: int = 0,
+    progress=None,
+) -> dict:
+    """Split ``ratings``, score every model's top ``k`` for the evaluated users and return the report.
+
+    ``catalog`` is the movie ids the models rank, in catalog order. ``scorers`` maps
+    ``svd`` / ``weighted_svd`` to the loaded models (fitted on the training ratings
+    instead with ``refit="full"``); ``neighbours`` is ``content_neighbours`` of the
+    content model, needed for ``content`` and ``hybrid``. ``decay`` is the weighted
+    model's; ages count from the newest training rating.
+    """
+    unknown = set(models) - set(MODELS)
+    if unknown:
+        raise ValueError(f"unknown models: {', '.join(sorted(unknown))}")
+    if refit not in REFITS:
+        raise ValueError(f"unknown refit {refit!r}; expected one of {', '.join(REFITS)}")
+    if neighbours is None and {"content", "hybrid"} & set(models):
+        raise ValueError("the content and hybrid models need the content neighbours")
+
+    started = time.perf_counter()
+    train, test = time_split(ratings, test_fraction, split)
+    decay = decay.with_reference(int(train.timestamps.max()))
+    users = eval_users(train, test, catalog, threshold, max_users, seed)
+    report = {
+        "version": REPORT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "params": {
+            "k": k,
+            "split": split,
+            "test_fraction": test_fraction,
+            "threshold": threshold,
+            "refit": refit,
+            "decay": decay.to_dict(),
+            "max_users": max_users,
+            "seed": seed,
+        },
+        "split": {
+            "train_ratings": train.n_ratings,
+            "test_ratings": test.n_ratings,
+            "relevant": int(users.relevant_items.size),
+            "users": users.n_users,
+            "seconds": time.perf_counter() - started,
+        },
+        "models": {},
+    }
+    if not users.n_users:
+        return report
+
+    needed = {"svd", "weighted_svd"} & set(models)
+    if "hybrid" in models:
+        needed.add("svd")
+    if refit == "full":
+        fit_started = time.perf_counter()
+        scorers = {name: fit_svd(train, catalog, decay if name == "weighted_svd" else None, seed) for name in needed}
+        report["split"]["fit_seconds"] = time.perf_counter() - fit_started
+    missing = needed - set(scorers or {})
+    if missing:
+        raise ValueError(f"no scorer for {', '.join(sorted(missing))}")
+
+    # Self-information of each catalog movie: movies nobody rated in training count as rated once.
+    train_positions = _catalog_positions(catalog, train.movie_ids)
+    rated = np.bincount(train_positions[train_positions >= 0], minlength=catalog.size)
+    information = -np.log2(np.maximum(rated, 1) / train.n_users)
+
+    n_items = int(catalog.size)
+    block_size = block_size_for(n_items, max_block_mb)
+    blocks = [(start, min(start + block_size, users.n_users)) for start in range(0, users.n_users, block_size)]
+    work_dir = tempfile.mkdtemp(prefix="evaluate-")
+    try:
+        for name in needed:
+            save_scorer(scorers[name], os.path.join(work_dir, name))
+        if neighbours is not None:
+            np.save(os.path.join(work_dir, NEIGHBOURS_FILE), neighbours[0])
+            np.save(os.path.join(work_dir, SIMILARITIES_FILE), neighbours[1])
+        config = {
+            "k": k,
+            "n_items": n_items,
+            "refit": refit,
+            "reg": DEFAULT_REG,
+            "decay": decay.to_dict() if "weighted_svd" in needed else None,
+        }
+        with open(os.path.join(work_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+            json.dump(config, f)
+
+        sums = {model: dict.fromkeys((*METRICS, "users"), 0.0) for model in models}
+        counts = {model: np.zeros(n_items, dtype=np.int64) for model in models}
+        seconds = dict.fromkeys(models, 0.0)
+        workers = workers or min(4, os.cpu_count() or 1)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(work_dir,)) as pool:
+            running, finished, total = {}, 0, len(models) * len(blocks)
+
+            def collect(futures) -> None:
+                nonlocal finished
+                for future in futures:
+                    model = running.pop(future)
+                    result = future.result()
+                    for name in (*METRICS, "users"):
+                        sums[model][name] += result[name]
+                    counts[model] += result["counts"]
+                    seconds[model] += result["seconds"]
+                    finished += 1
+                    if progress is not None:
+                        progress(finished, total)
+
+            for model in models:
+                for start, stop in blocks:
+                    # At most two blocks per worker in flight, as in ``engine.batch``.
+                    if len(running) >= 2 * workers:
+                        collect(wait(running, return_when=FIRST_COMPLETED).done)
+                    future = pool.submit(_evaluate_block, model, users.block(start, stop))
+                    running[future] = model
+            collect(wait(running).done)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for model in models:
+        summary = _summarise(sums[model], counts[model], information, k)
+        report["models"][model] = dict(summary, worker_seconds=seconds[model])
+    report["blocks"] = {"count": len(blocks), "users": block_size, "workers": workers}
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def compare(before: dict, after: dict) -> str:
+    """Both reports' metrics per model side by side."""
+    lines = [f"{'model.metric':<28}{'before':>12}{'after':>12}{'change':>10}"]
+    for model in sorted(set(before["models"]) & set(after["models"])):
+        a, b = before["models"][model], after["models"][model]
+        for name in sorted(set(a) & set(b)):
+            change = (b[name] - a[name]) / a[name] * 100 if a[name] else float("nan")
+            lines.append(f"{f'{model}.{name}':<28}{a[name]:>12.4f}{b[name]:>12.4f}{change:>9.1f}%")
+    if before["params"] != after["params"]:
+        lines.append("note: the runs used different parameters")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    from engine.loaders import ArtifactLoader, LoaderSettings
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compare"]:
+        parser = argparse.ArgumentParser(description="Compare two evaluation reports.")
+        parser.add_argument("before")
+        parser.add_argument("after")
+        args = parser.parse_args(argv[1:])
+        with open(args.before, encoding="utf-8") as f, open(args.after, encoding="utf-8") as g:
+            print(compare(json.load(f), json.load(g)))
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out", help="write the JSON report here")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="list length scored")
+    parser.add_argument("--models", default=",".join(MODELS), help=f"comma-separated subset of {','.join(MODELS)}")
+    parser.add_argument("--split", choices=SPLITS, default="user", help="hold out per user or after a global time")
+    parser.add_argument("--test-fraction", type=float, default=0.2, help="share of ratings held out")
+    parser.add_argument("--threshold", type=float, default=4.0, help="held-out ratings this high are relevant")
+    parser.add_argument("--refit", choices=REFITS, default="users", help="what is refitted on the training ratings")
+    parser.add_argument("--max-users", type=int, default=None, help="evaluate a sample of this many users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=None, help="local data directory (default: MOVIE_APP_LOCAL_DATA_DIR)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: up to 4)")
+    parser.add_argument("--max-block-mb", type=float, default=256, help="memory cap for scoring one block")
+    args = parser.parse_args(argv)
+    models = [m for m in args.models.split(",") if m]
+
+    settings = LoaderSettings.from_env()
+    if args.data_dir:
+        settings.local_dir = args.data_dir
+    loader = ArtifactLoader(settings)
+    loader.sync_store()
+
+    started = time.perf_counter()
+    ratings = loader.ratings_index()
+    catalog = loader.movies(["movieId"])["movieId"].to_numpy()
+    scorers = None
+    if args.refit != "full":
+        scorers = {"svd": loader.svd_scorer()}
+        if "weighted_svd" in models:
+            scorers["weighted_svd"] = loader.svd_scorer(weighted=True)
+    neighbours = None
+    if {"content", "hybrid"} & set(models):
+        neighbours = content_neighbours(loader.content_engine(), max(args.k, HYBRID_NEIGHBOURS))
+    print(f"{ratings.n_ratings} ratings x {catalog.size} movies loaded in {time.perf_counter() - started:.1f}s")
+
+    def progress(done: int, total: int) -> None:
+        print(f"\rblocks {done}/{total}", end="", flush=True)
+
+    try:
+        report = evaluate(
+            ratings,
+            catalog,
+            scorers,
+            neighbours,
+            models,
+            k=args.k,
+            split=args.split,
+            test_fraction=args.test_fraction,
+            threshold=args.threshold,
+            refit=args.refit,
+            decay=loader.incremental_cf().decay,
+            max_users=args.max_users,
+            workers=args.workers,
+            max_block_mb=args.max_block_mb,
+            seed=args.seed,
+            progress=progress,
+        )
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    report["inputs"] = {"store": loader.store_version(), "ratings": loader.ratings_fingerprint()}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+
+    print(f"\r{report['split']['users']} users, {report['split']['relevant']} relevant held-out ratings")
+    header = "".join(f"{name:>13}" for name in (*(f"{m}@{args.k}" for m in METRICS), "coverage", "novelty"))
+    print(f"{'model':<14}{header}")
+    for model, row in report["models"].items():
+        values = (*(row[f"{m}@{args.k}"] for m in METRICS), row["coverage"], row["novelty"])
+        print(f"{model:<14}" + "".join(f"{value:>13.4f}" for value in values))
+    print(f"-> {args.out} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
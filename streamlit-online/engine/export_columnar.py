@@ -0,0 +1,80 @@
+"""Convert movies.pkl / ratings.pkl into memory-mappable columnar tables.
+
+Usage::
+
+    python -m engine.export_columnar /path/to/data [/path/to/data/columnar]
+
+The tables are written to ``<data>/columnar`` by default, which is where
+``data_loader`` looks for them when ``MOVIE_APP_LOCAL_DATA_DIR`` points at
+``<data>``. Ratings are stored sorted by (userId, movieId) together with the
+per-user CSR offsets, so the app maps the ratings index instead of building it.
+"""
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from engine.columnar import write_table
+from engine.ratings_index import RatingsIndex
+from engine.schema import (
+    COLUMNAR_DIR,
+    FEATURES_BLOCK,
+    MOVIE_DTYPES,
+    MOVIES_TABLE,
+    RATING_DTYPES,
+    RATINGS_TABLE,
+    SORT_ORDER,
+    coerce_movies,
+    coerce_ratings,
+    feature_columns,
+    sort_order,
+)
+
+
+def export_movies(src: str, dst: str) -> dict:
+    movies = coerce_movies(pd.read_pickle(src))
+    return write_table(
+        dst,
+        movies,
+        dtypes=MOVIE_DTYPES,
+        blocks={FEATURES_BLOCK: feature_columns(movies)},
+        extra={SORT_ORDER: sort_order(movies)},
+    )
+
+
+def export_ratings(src: str, dst: str) -> dict:
+    ratings = coerce_ratings(pd.read_pickle(src))
+    ratings = ratings.sort_values(["userId", "movieId"], kind="stable", ignore_index=True)
+    index = RatingsIndex.from_frame(ratings)
+    return write_table(
+        dst,
+        ratings,
+        dtypes={k: v for k, v in RATING_DTYPES.items() if k in ratings},
+        extra={"user_ids": index.user_ids, "indptr": index.indptr},
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data_dir", help="directory holding movies.pkl and ratings.pkl")
+    parser.add_argument("out_dir", nargs="?", help="output directory (default: <data_dir>/columnar)")
+    args = parser.parse_args(argv)
+    out_dir = args.out_dir or os.path.join(args.data_dir, COLUMNAR_DIR)
+
+    for filename, table, export in (
+        ("movies.pkl", MOVIES_TABLE, export_movies),
+        ("ratings.pkl", RATINGS_TABLE, export_ratings),
+    ):
+        src = os.path.join(args.data_dir, filename)
+        if not os.path.exists(src):
+            print(f"skipping {filename}: not found in {args.data_dir}", file=sys.stderr)
+            continue
+        meta = export(src, os.path.join(out_dir, table))
+        print(f"{filename} -> {os.path.join(out_dir, table)} ({meta['rows']} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
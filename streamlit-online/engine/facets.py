@@ -0,0 +1,175 @@
+"""Faceted movie filters: genres, release year, runtime and original language.
+
+``FacetIndex`` is built once per movies table, in display order. Each movie's
+genres (the ``|``-separated ``genres`` column, matched by exact name) become
+one bitmask (uint32, or uint64 past 32 genres); years and runtimes are kept
+sorted with their positions, so a range is two binary searches; languages
+are category codes. ``FacetFilter`` combines facets with AND: a movie must
+have one of ``genres_any`` and all of ``genres_all``, a year and runtime in
+their (inclusive) ranges and one of ``languages``. ``FacetIndex.mask``
+resolves a filter to a boolean row mask with vectorised bit operations; the
+recommenders take that mask and drop the movies outside it before they pick
+their top N, so a filtered list is still N long when enough movies match.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAX_CACHED_MASKS = 64
+Range = Optional[Tuple[Optional[float], Optional[float]]]
+
+
+def _names(values) -> Tuple[str, ...]:
+    if values is None:
+        return ()
+    if isinstance(values, str):
+        values = values.split(",")
+    return tuple(sorted({str(v).strip() for v in values if str(v).strip()}))
+
+
+def _range(low, high) -> Range:
+    if low in (None, "") and high in (None, ""):
+        return None
+    bounds = tuple(None if v in (None, "") else float(v) for v in (low, high))
+    if None not in bounds and bounds[0] > bounds[1]:
+        raise ValueError(f"empty range {bounds[0]} .. {bounds[1]}")
+    return bounds
+
+
+@dataclass(frozen=True)
+class FacetFilter:
+    genres_any: Tuple[str, ...] = ()
+    genres_all: Tuple[str, ...] = ()
+    years: Range = None
+    runtime: Range = None
+    languages: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        # Canonical form, so equal filters share cache entries.
+        for name in ("genres_any", "genres_all", "languages"):
+            object.__setattr__(self, name, _names(getattr(self, name)))
+        for name in ("years", "runtime"):
+            value = getattr(self, name)
+            object.__setattr__(self, name, None if value is None else _range(*value))
+
+    @property
+    def active(self) -> bool:
+        return any((self.genres_any, self.genres_all, self.years, self.runtime, self.languages))
+
+    def key(self) -> tuple:
+        return (self.genres_any, self.genres_all, self.years, self.runtime, self.languages)
+
+    @classmethod
+    def from_params(cls, params: Mapping) -> Optional["FacetFilter"]:
+        """Filter from query parameters (``genres_any``, ``genres_all`` and ``languages`` as lists or
+        comma-separated strings, ``year_min`` / ``year_max`` / ``runtime_min`` / ``runtime_max``);
+        None when none is set. Malformed values raise ``ValueError``."""
+        facets = cls(
+            genres_any=params.get("genres_any"),
+            genres_all=params.get("genres_all"),
+            years=_range(params.get("year_min"), params.get("year_max")),
+            runtime=_range(params.get("runtime_min"), params.get("runtime_max")),
+            languages=params.get("languages"),
+        )
+        return facets if facets.active else None
+
+
+class _SortedColumn:
+    """A numeric column's non-NaN values sorted, with their row positions, for range lookups."""
+
+    def __init__(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        valid = np.flatnonzero(~np.isnan(values))
+        order = np.argsort(values[valid], kind="stable")
+        self.n_rows = values.size
+        self.values = values[valid][order]
+        self.positions = valid[order]
+
+    @property
+    def bounds(self) -> Tuple[Optional[float], Optional[float]]:
+        if not self.values.size:
+            return None, None
+        return float(self.values[0]), float(self.values[-1])
+
+    def mask(self, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        start = 0 if low is None else np.searchsorted(self.values, low, side="left")
+        stop = self.values.size if high is None else np.searchsorted(self.values, high, side="right")
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.positions[start:stop]] = True
+        return mask
+
+
+class FacetIndex:
+    def __init__(self, genres: Sequence, release_dates: Sequence, runtimes: Sequence, languages: Sequence):
+        genres = pd.Series(np.asarray(genres, dtype=object))
+        self.n_movies = len(genres)
+        exploded = genres.str.split("|").explode()
+        exploded = exploded[exploded.notna() & (exploded != "")]
+        self.genre_names, codes = np.unique(exploded.to_numpy(dtype=str), return_inverse=True)
+        if self.genre_names.size > 64:
+            raise ValueError(f"{self.genre_names.size} genres do not fit a 64-bit mask")
+        dtype = np.uint32 if self.genre_names.size <= 32 else np.uint64
+        self._genre_bits = (np.ones(1, dtype=dtype) << np.arange(self.genre_names.size, dtype=dtype)).astype(dtype)
+        self.genre_masks = np.zeros(self.n_movies, dtype=dtype)
+        np.bitwise_or.at(self.genre_masks, exploded.index.to_numpy(), self._genre_bits[codes])
+
+        years = pd.DatetimeIndex(pd.to_datetime(np.asarray(release_dates), errors="coerce")).year
+        self._years = _SortedColumn(np.asarray(years, dtype=np.float64))
+        self._runtime = _SortedColumn(np.asarray(runtimes, dtype=np.float64))
+        codes, self.language_names = pd.factorize(pd.Series(np.asarray(languages, dtype=object)), sort=True)
+        self._language_codes = codes.astype(np.int32)
+        self._masks: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+
+    @classmethod
+    def from_columns(cls, columns) -> "FacetIndex":
+        """From a ``MovieColumns`` (or anything with ``column(name)``), reading only the four columns."""
+        return cls(*(columns.column(name) for name in ("genres", "release_date", "runtime", "original_language")))
+
+    @property
+    def languages(self) -> List[str]:
+        return [str(name) for name in self.language_names]
+
+    @property
+    def year_bounds(self) -> Tuple[Optional[float], Optional[float]]:
+        return self._years.bounds
+
+    @property
+    def runtime_bounds(self) -> Tuple[Optional[float], Optional[float]]:
+        return self._runtime.bounds
+
+    def genre_bits(self, names: Sequence[str]):
+        """OR of the bits of ``names``; ``KeyError`` for genres no movie has."""
+        found = pd.Index(self.genre_names).get_indexer(list(names))
+        if (found < 0).any():
+            raise KeyError(f"unknown genres: {', '.join(np.asarray(names)[found < 0])}")
+        return np.bitwise_or.reduce(self._genre_bits[found], dtype=self.genre_masks.dtype)
+
+    def mask(self, facets: FacetFilter) -> np.ndarray:
+        """Boolean mask over the movies (display order) of those matching ``facets``; read-only, cached."""
+        key = facets.key()
+        cached = self._masks.get(key)
+        if cached is not None:
+            return cached
+        mask = np.ones(self.n_movies, dtype=bool)
+        if facets.genres_any:
+            mask &= (self.genre_masks & self.genre_bits(facets.genres_any)) != 0
+        if facets.genres_all:
+            bits = self.genre_bits(facets.genres_all)
+            mask &= (self.genre_masks & bits) == bits
+        if facets.years is not None:
+            mask &= self._years.mask(*facets.years)
+        if facets.runtime is not None:
+            mask &= self._runtime.mask(*facets.runtime)
+        if facets.languages:
+            wanted = np.isin(np.asarray(self.language_names, dtype=object), facets.languages)
+            mask &= np.append(wanted, False)[self._language_codes]
+        mask.flags.writeable = False
+        # Dicts tolerate concurrent readers; a lost insert only means one recomputation.
+        self._masks[key] = mask
+        while len(self._masks) > MAX_CACHED_MASKS:
+            self._masks.popitem(last=False)
+        return mask
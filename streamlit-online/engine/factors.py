@@ -0,0 +1,194 @@
+"""Compact factor-matrix artifact for the SVD models.
+
+Usage::
+
+    python -m engine.factors export /path/to/data [OUT]
+    python -m engine.factors bench /path/to/data
+
+``export`` reduces ``svd.joblib`` and ``weighted_svd.joblib`` to what
+prediction needs and writes them to ``<data>/svd_factors`` (or ``OUT``):
+
+    meta.json              per-model global mean, rating scale, biased flag
+    user_ids.npy           sorted int32 raw user ids, shared by every model
+    item_ids.npy           sorted int32 raw movie ids, shared by every model
+    <model>.pu.npy / .bu.npy   float32 rows aligned with user_ids
+    <model>.qi.npy / .bi.npy   float32 rows aligned with item_ids
+    <model>.user_known.npy / .item_known.npy   only when a model lacks some ids
+
+Rows are re-ordered to the shared id arrays, so an id's row is its binary-search
+position and no raw -> inner dicts (or the trainset) are stored. ``bench``
+loads each format in a fresh process and reports load time and peak RSS.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from engine.cf import SVDScorer, _sorted_id_map, lookup_sorted
+
+FACTORS_DIR = "svd_factors"
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+MODEL_FILES = {"svd": "svd.joblib", "weighted_svd": "weighted_svd.joblib"}
+
+
+def _aligned(values: np.ndarray, raw_ids: np.ndarray, inner: np.ndarray, shared: np.ndarray):
+    """Rows of ``values`` re-ordered to ``shared`` ids; missing ids get zero rows and known=False."""
+    rows = lookup_sorted(raw_ids, inner, shared)
+    known = rows >= 0
+    out = np.zeros((shared.size,) + values.shape[1:], dtype=np.float32)
+    out[known] = values[rows[known]]
+    return out, known
+
+
+def export_factors(models: Dict[str, object], out_dir: str) -> dict:
+    """Write fitted Surprise ``SVD`` models as one compact factor directory."""
+    os.makedirs(out_dir, exist_ok=True)
+    maps = {}
+    for name, algo in models.items():
+        trainset = algo.trainset
+        maps[name] = (_sorted_id_map(trainset._raw2inner_id_users), _sorted_id_map(trainset._raw2inner_id_items))
+    user_ids = np.unique(np.concatenate([users[0] for users, _ in maps.values()])).astype(np.int32)
+    item_ids = np.unique(np.concatenate([items[0] for _, items in maps.values()])).astype(np.int32)
+    np.save(os.path.join(out_dir, "user_ids.npy"), user_ids)
+    np.save(os.path.join(out_dir, "item_ids.npy"), item_ids)
+
+    meta = {"version": FORMAT_VERSION, "models": {}}
+    for name, algo in models.items():
+        (raw_users, inner_users), (raw_items, inner_items) = maps[name]
+        arrays = {}
+        arrays["pu"], user_known = _aligned(algo.pu, raw_users, inner_users, user_ids)
+        arrays["bu"], _ = _aligned(algo.bu, raw_users, inner_users, user_ids)
+        arrays["qi"], item_known = _aligned(algo.qi, raw_items, inner_items, item_ids)
+        arrays["bi"], _ = _aligned(algo.bi, raw_items, inner_items, item_ids)
+        if not user_known.all():
+            arrays["user_known"] = user_known
+        if not item_known.all():
+            arrays["item_known"] = item_known
+        for key, values in arrays.items():
+            np.save(os.path.join(out_dir, f"{name}.{key}.npy"), values)
+        meta["models"][name] = {
+            "global_mean": float(algo.trainset.global_mean),
+            "rating_scale": [float(v) for v in algo.trainset.rating_scale],
+            "biased": bool(getattr(algo, "biased", True)),
+            "n_factors": int(algo.pu.shape[1]),
+        }
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+
+def has_factors(path: str, name: Optional[str] = None) -> bool:
+    try:
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            models = json.load(f)["models"]
+    except (OSError, ValueError, KeyError):
+        return False
+    return name is None or name in models
+
+
+def load_factors(path: str, name: str, item_ids, mmap: bool = True) -> SVDScorer:
+    """Drop-in replacement for ``SVDScorer.from_surprise(joblib.load(...), item_ids)``."""
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)["models"][name]
+    mode = "r" if mmap else None
+
+    def load(key: str) -> np.ndarray:
+        return np.load(os.path.join(path, key), mmap_mode=mode, allow_pickle=False)
+
+    def rows(ids: np.ndarray, known_file: str) -> np.ndarray:
+        inner = np.arange(ids.size, dtype=np.int32)
+        if os.path.exists(os.path.join(path, known_file)):
+            inner[~load(known_file)] = -1
+        return inner
+
+    user_ids, item_ids_raw = load("user_ids.npy"), load("item_ids.npy")
+    return SVDScorer.from_factors(
+        pu=load(f"{name}.pu.npy"),
+        qi=load(f"{name}.qi.npy"),
+        bu=load(f"{name}.bu.npy"),
+        bi=load(f"{name}.bi.npy"),
+        global_mean=meta["global_mean"],
+        user_ids=user_ids,
+        user_inner=rows(user_ids, f"{name}.user_known.npy"),
+        raw_item_ids=item_ids_raw,
+        raw_item_inner=rows(item_ids_raw, f"{name}.item_known.npy"),
+        item_ids=item_ids,
+        rating_scale=tuple(meta["rating_scale"]),
+        biased=meta["biased"],
+    )
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _bench_child(kind: str, data_dir: str, name: str, item_ids: np.ndarray, queue) -> None:
+    import joblib
+
+    baseline = _peak_rss_mb()
+    started = time.perf_counter()
+    if kind == "joblib":
+        scorer = SVDScorer.from_surprise(joblib.load(os.path.join(data_dir, MODEL_FILES[name])), item_ids)
+    else:
+        scorer = load_factors(os.path.join(data_dir, FACTORS_DIR), name, item_ids, mmap=kind == "factors-mmap")
+    loaded = time.perf_counter() - started
+    scorer.score([int(scorer._user_ids[0])])
+    queue.put({"load_s": loaded, "peak_rss_mb": _peak_rss_mb() - baseline})
+
+
+def benchmark(data_dir: str, item_ids: np.ndarray) -> Dict[str, dict]:
+    """Load each model per format in a fresh process; report load seconds and peak RSS growth."""
+    ctx = multiprocessing.get_context("spawn")
+    report = {}
+    for name in MODEL_FILES:
+        for kind in ("joblib", "factors", "factors-mmap"):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_bench_child, args=(kind, data_dir, name, item_ids, queue))
+            proc.start()
+            report[f"{name}/{kind}"] = queue.get()
+            proc.join()
+    return report
+
+
+def main(argv=None) -> int:
+    import joblib
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Export or benchmark the compact SVD factor artifact.")
+    parser.add_argument("command", choices=["export", "bench"])
+    parser.add_argument("data_dir", help="directory holding svd.joblib / weighted_svd.joblib")
+    parser.add_argument("out_dir", nargs="?", help=f"export target (default: <data_dir>/{FACTORS_DIR})")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        out_dir = args.out_dir or os.path.join(args.data_dir, FACTORS_DIR)
+        models = {
+            name: joblib.load(os.path.join(args.data_dir, filename))
+            for name, filename in MODEL_FILES.items()
+            if os.path.exists(os.path.join(args.data_dir, filename))
+        }
+        meta = export_factors(models, out_dir)
+        size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+        print(f"{', '.join(meta['models'])} -> {out_dir} ({size / (1 << 20):.1f} MB)")
+        return 0
+
+    item_ids = pd.read_pickle(os.path.join(args.data_dir, "movies.pkl"))["movieId"].to_numpy()
+    print(f"{'model/format':<28}{'load s':>9}{'peak RSS MB':>13}")
+    for key, row in benchmark(args.data_dir, item_ids).items():
+        print(f"{key:<28}{row['load_s']:>9.2f}{row['peak_rss_mb']:>13.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""Incremental CF updates between full SVD retrainings.
+
+New ratings are appended to an in-memory delta log on top of the base
+``RatingsIndex``. Each user they touch is folded into both SVD models with
+the item factors held fixed: the user's ``pu``/``bu`` become the ridge
+least-squares fit of their ratings. The plain model uses the raw ratings;
+the weighted model uses time-decayed ratings (``engine.decay``, by default the
+EDA notebook's ``weightedRating``), recomputed only for the touched users' rows. Readers get immutable
+snapshots from ``bundle``, so results cached against an older snapshot are
+never served for a newer one.
+
+``compact``, meant to run periodically in the background (the HTTP server
+does), merges the log into a new base index and writes the folded users into
+the factor arrays. Item factors only change when the models are retrained.
+"""
+
+import threading
+import time
+from functools import cached_property
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from engine.cf import SVDScorer
+from engine.decay import TimeDecay, decay_ratings
+from engine.instrument import metrics
+from engine.ratings_index import RatingsIndex
+
+# Surprise's default ``reg_all``, applied per rating as in its SGD updates.
+DEFAULT_REG = 0.02
+
+
+def fold_in(scorer: SVDScorer, movie_ids, ratings, reg: float = DEFAULT_REG) -> Optional[Tuple[np.ndarray, float]]:
+    """(pu, bu) fitting one user's ratings with the item factors fixed; None when no movie is known.
+
+    Solves ``min sum (r - mean - bi - bu - qi.pu)^2 + reg * n * (|pu|^2 + bu^2)`` over the
+    rated movies the model was trained on (no bias terms for an unbiased model).
+    """
+    known, qi, bi = scorer.item_factors(movie_ids)
+    if not known.any():
+        return None
+    target = np.asarray(ratings, dtype=np.float64)[known]
+    design = np.asarray(qi, dtype=np.float64)
+    if scorer.biased:
+        target = target - scorer.global_mean - bi
+        design = np.hstack([design, np.ones((design.shape[0], 1))])
+    gram = design.T @ design + reg * target.size * np.eye(design.shape[1])
+    solution = np.linalg.solve(gram, design.T @ target)
+    if scorer.biased:
+        return solution[:-1], float(solution[-1])
+    return solution, 0.0
+
+
+class UserDelta(NamedTuple):
+    """A user's ratings from the delta log, one (the newest) per movie, sorted by movie id."""
+
+    movie_ids: np.ndarray
+    ratings: np.ndarray
+    timestamps: np.ndarray
+
+
+def _merge_user(previous: Optional[UserDelta], rows: pd.DataFrame) -> UserDelta:
+    movie_ids, ratings, timestamps = (rows[c].to_numpy() for c in ("movieId", "rating", "timestamp"))
+    if previous is not None:
+        movie_ids = np.concatenate([previous.movie_ids, movie_ids])
+        ratings = np.concatenate([previous.ratings, ratings])
+        timestamps = np.concatenate([previous.timestamps, timestamps])
+    # Reversed stable unique keeps the last occurrence of each movie.
+    _, last = np.unique(movie_ids[::-1], return_index=True)
+    keep = movie_ids.size - 1 - last
+    return UserDelta(movie_ids[keep], ratings[keep], timestamps[keep])
+
+
+class LiveRatings:
+    """The base ``RatingsIndex`` with the delta log applied, for per-user reads.
+
+    Offers what the pages and the service use (``user_ids``, ``user_movies``,
+    ``has_rated``, ``user_history``); bulk readers use ``base``, which the next
+    compaction brings up to date.
+    """
+
+    def __init__(self, base: RatingsIndex, users: Dict[int, UserDelta]):
+        self.base = base
+        self._users = users
+
+    @cached_property
+    def user_ids(self) -> np.ndarray:
+        delta = np.fromiter(self._users, dtype=np.int64, count=len(self._users))
+        return np.union1d(self.base.user_ids, delta).astype(self.base.user_ids.dtype)
+
+    @property
+    def n_users(self) -> int:
+        return int(self.user_ids.size)
+
+    @property
+    def n_delta_users(self) -> int:
+        return len(self._users)
+
+    def user_ratings(self, user_id, missing_timestamp: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(movie ids, ratings, timestamps) of the user, delta ratings replacing base ones."""
+        rows = self.base.user_slice(user_id)
+        movie_ids, ratings = self.base.movie_ids[rows], self.base.ratings[rows]
+        if self.base.timestamps is not None:
+            timestamps = self.base.timestamps[rows]
+        else:
+            timestamps = np.full(movie_ids.size, missing_timestamp, dtype=np.int32)
+        delta = self._users.get(int(user_id))
+        if delta is None:
+            return movie_ids, ratings, timestamps
+        kept = ~np.isin(movie_ids, delta.movie_ids)
+        movie_ids = np.concatenate([movie_ids[kept], delta.movie_ids])
+        order = np.argsort(movie_ids, kind="stable")
+        return (
+            movie_ids[order],
+            np.concatenate([ratings[kept], delta.ratings])[order],
+            np.concatenate([timestamps[kept], delta.timestamps])[order],
+        )
+
+    def user_movies(self, user_id) -> np.ndarray:
+        delta = self._users.get(int(user_id))
+        if delta is None:
+            return self.base.user_movies(user_id)
+        return np.union1d(self.base.user_movies(user_id), delta.movie_ids)
+
+    def has_rated(self, user_id, movie_ids) -> np.ndarray:
+        return np.isin(np.asarray(movie_ids), self.user_movies(user_id))
+
+    def user_history(self, user_id) -> pd.DataFrame:
+        if int(user_id) not in self._users:
+            return self.base.user_history(user_id)
+        movie_ids, ratings, timestamps = self.user_ratings(user_id)
+        history = {
+            "userId": np.full(movie_ids.size, user_id, dtype=np.int32),
+            "movieId": movie_ids,
+            "rating": ratings,
+        }
+        if self.base.timestamps is not None:
+            history["timestamp"] = timestamps
+        return pd.DataFrame(history)
+
+
+Ratings = Union[RatingsIndex, LiveRatings]
+
+
+class IncrementalCF:
+    """Fold new ratings into the CF models as they arrive; see the module docstring."""
+
+    def __init__(
+        self,
+        ratings: RatingsIndex,
+        algo: SVDScorer,
+        weighted_algo: SVDScorer,
+        decay: TimeDecay = TimeDecay(),
+        reg: float = DEFAULT_REG,
+    ):
+        if decay.reference is None and ratings.timestamps is not None and ratings.n_ratings:
+            decay = decay.with_reference(int(ratings.timestamps.max()))
+        # The weighted model's decay; its reference is kept across compactions since the item factors do not move.
+        self.decay = decay
+        self.reg = reg
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._base_ratings = ratings
+        self._log = []
+        self._users: Dict[int, UserDelta] = {}
+        self._bundle: Tuple[Ratings, SVDScorer, SVDScorer] = (ratings, algo, weighted_algo)
+        self.compactions = 0
+
+    def bundle(self) -> Tuple[Ratings, SVDScorer, SVDScorer]:
+        """The current (ratings, SVD scorer, weighted SVD scorer) snapshot."""
+        return self._bundle
+
+    @property
+    def pending_rows(self) -> int:
+        with self._lock:
+            return sum(len(batch) for batch in self._log)
+
+    def add_ratings(self, user_ids, movie_ids, ratings, timestamps=None) -> np.ndarray:
+        """Record new or changed ratings and refit the users they belong to; returns those user ids.
+
+        ``timestamps`` (Unix seconds) default to now. Ratings outside the models' rating
+        scale raise ``ValueError``.
+        """
+        batch = pd.DataFrame(
+            {
+                "userId": np.atleast_1d(np.asarray(user_ids, dtype=np.int32)),
+                "movieId": np.atleast_1d(np.asarray(movie_ids, dtype=np.int32)),
+                "rating": np.atleast_1d(np.asarray(ratings, dtype=np.float32)),
+            }
+        )
+        if timestamps is None:
+            timestamps = np.full(len(batch), int(time.time()))
+        batch["timestamp"] = np.broadcast_to(np.asarray(timestamps, dtype=np.int32), len(batch))
+        if batch.empty:
+            return np.empty(0, dtype=np.int64)
+        low, high = self._bundle[1].rating_scale
+        if not batch["rating"].between(low, high).all():
+            raise ValueError(f"ratings must be between {low} and {high}")
+        with self._lock:
+            if self.decay.reference is None:
+                self.decay = self.decay.with_reference(int(batch["timestamp"].max()))
+            self._log.append(batch)
+            touched = self._apply(batch)
+            self._publish(touched)
+        return touched
+
+    def _apply(self, batch: pd.DataFrame) -> np.ndarray:
+        for user_id, rows in batch.groupby("userId", sort=False):
+            self._users[int(user_id)] = _merge_user(self._users.get(int(user_id)), rows)
+        return batch["userId"].unique().astype(np.int64)
+
+    def _publish(self, touched: np.ndarray) -> None:
+        """Refit ``touched`` against the current log and swap in a new snapshot (lock held)."""
+        _, algo, weighted_algo = self._bundle
+        live = LiveRatings(self._base_ratings, dict(self._users))
+        scorers = []
+        for scorer, weighted in ((algo, False), (weighted_algo, True)):
+            users, factors, biases = [], [], []
+            for user_id in touched:
+                movie_ids, ratings, timestamps = live.user_ratings(user_id, self.decay.reference or 0)
+                if weighted:
+                    ratings = decay_ratings(ratings, timestamps, self.decay)
+                fitted = fold_in(scorer, movie_ids, ratings, self.reg)
+                if fitted is not None:
+                    users.append(user_id)
+                    factors.append(fitted[0])
+                    biases.append(fitted[1])
+            if users:
+                scorer = scorer.with_folded_users(users, np.vstack(factors), np.asarray(biases))
+            scorers.append(scorer)
+        ratings = live if self._users else self._base_ratings
+        self._bundle = (ratings, scorers[0], scorers[1])
+
+    def compact(self) -> int:
+        """Merge the delta log into a new base; returns the number of ratings merged.
+
+        Ratings added while the new base is built stay in the log and are refitted against it.
+        """
+        with self._compact_lock:
+            with self._lock:
+                merged = len(self._log)
+                if not merged:
+                    return 0
+                delta = pd.concat(self._log, ignore_index=True)
+                base_ratings = self._base_ratings
+                _, algo, weighted_algo = self._bundle
+            with metrics.timer("incremental.compact"):
+                ratings = base_ratings.merged(delta)
+                algo, weighted_algo = algo.compacted(), weighted_algo.compacted()
+            with self._lock:
+                rest = self._log[merged:]
+                self._base_ratings = ratings
+                self._log = rest
+                self._users = {}
+                self._bundle = (ratings, algo, weighted_algo)
+                touched = [self._apply(batch) for batch in rest]
+                if touched:
+                    self._publish(np.unique(np.concatenate(touched)))
+                self.compactions += 1
+            return len(delta)
+
+    def stats(self) -> dict:
+        ratings, algo, _ = self._bundle
+        return {
+            "pending_rows": self.pending_rows,
+            "delta_users": ratings.n_delta_users if isinstance(ratings, LiveRatings) else 0,
+            "folded_users": algo.n_folded_users,
+            "compactions": self.compactions,
+        }
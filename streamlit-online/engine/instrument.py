@@ -0,0 +1,237 @@
+"""Lightweight timing and memory instrumentation for loaders and recommenders.
+
+``metrics`` is the process-wide registry. Wrap code with ``metrics.timer(name)``
+or decorate functions with ``@timed(name)``; each stage keeps a bounded window
+of recent durations for p50/p95/p99. ``metrics.artifact(name)`` additionally
+records how much RSS the process grew while an artifact loaded (approximate
+when several artifacts load concurrently). Profiling is off by default:
+``metrics.configure(profile=True)`` runs each timed call under cProfile and
+keeps the hottest functions per stage, ``tracemalloc=True`` records Python
+allocation peaks per artifact. ``metrics.snapshot()`` is JSON-serialisable.
+"""
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+WINDOW = 1024
+PROFILE_LINES = 25
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, or None when it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class _Stage:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self.recent = deque(maxlen=WINDOW)
+        self.profile: Optional[str] = None
+
+    def add(self, seconds: float, failed: bool) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.errors += failed
+        self.recent.append(seconds)
+
+    def summary(self) -> dict:
+        recent = np.fromiter(self.recent, dtype=np.float64) * 1000
+        p50, p95, p99 = np.percentile(recent, [50, 95, 99]) if recent.size else (0.0, 0.0, 0.0)
+        out = {
+            "count": self.count,
+            "errors": self.errors,
+            "total_s": self.total,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": self.max * 1000,
+        }
+        if self.profile:
+            out["profile"] = self.profile
+        return out
+
+
+class Instrumentation:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, _Stage] = {}
+        self._artifacts: Dict[str, dict] = {}
+        self._sources: Dict[str, Callable[[], dict]] = {}
+        self.profile = False
+        self.started = time.time()
+        # cProfile supports one active profiler per thread.
+        self._profiling = threading.local()
+
+    def configure(self, profile: Optional[bool] = None, tracemalloc: Optional[bool] = None) -> None:
+        if profile is not None:
+            self.profile = profile
+        if tracemalloc is not None:
+            _toggle_tracemalloc(tracemalloc)
+
+    def register(self, name: str, provider: Callable[[], dict]) -> None:
+        """Include ``provider()`` under ``name`` in every snapshot (e.g. cache counters)."""
+        with self._lock:
+            self._sources[name] = provider
+
+    def _stage(self, name: str) -> _Stage:
+        stage = self._stages.get(name)
+        if stage is None:
+            with self._lock:
+                stage = self._stages.setdefault(name, _Stage())
+        return stage
+
+    @contextmanager
+    def timer(self, name: str):
+        profiler = None
+        if self.profile and not getattr(self._profiling, "active", False):
+            profiler = cProfile.Profile()
+            self._profiling.active = True
+            profiler.enable()
+        failed = True
+        started = time.perf_counter()
+        try:
+            yield
+            failed = False
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+                self._profiling.active = False
+            stage = self._stage(name)
+            with self._lock:
+                stage.add(elapsed, failed)
+                if profiler is not None:
+                    stage.profile = _format_profile(profiler)
+
+    @contextmanager
+    def artifact(self, name: str):
+        """Time an artifact load and record the RSS (and traced Python heap) it added."""
+        rss_before = rss_bytes()
+        traced = tracemalloc.is_tracing()
+        if traced:
+            tracemalloc.reset_peak()
+            heap_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        with self.timer(f"load.{name}"):
+            yield
+        entry = {"loaded_at": time.time(), "seconds": time.perf_counter() - started}
+        rss_after = rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            entry["rss_delta_mb"] = (rss_after - rss_before) / (1 << 20)
+        if traced:
+            entry["py_heap_peak_mb"] = (tracemalloc.get_traced_memory()[1] - heap_before) / (1 << 20)
+        with self._lock:
+            self._artifacts[name] = entry
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._artifacts.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {name: stage.summary() for name, stage in sorted(self._stages.items())}
+            artifacts = {name: dict(entry) for name, entry in sorted(self._artifacts.items())}
+            sources = dict(self._sources)
+        rss = rss_bytes()
+        snapshot = {
+            "pid": os.getpid(),
+            "since": self.started,
+            "taken_at": time.time(),
+            "rss_mb": None if rss is None else rss / (1 << 20),
+            "profile": self.profile,
+            "tracemalloc": tracemalloc.is_tracing(),
+            "stages": stages,
+            "artifacts": artifacts,
+        }
+        for name, provider in sources.items():
+            try:
+                snapshot[name] = provider()
+            except Exception as exc:
+                snapshot[name] = {"error": f"{type(exc).__name__}: {exc}"}
+        if tracemalloc.is_tracing():
+            top = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_LINES]
+            snapshot["top_allocations"] = [str(stat) for stat in top]
+        return snapshot
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def write_json(self, path: str) -> None:
+        """Atomically write the snapshot to ``path`` for an external scraper."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_json(indent=1))
+        os.replace(tmp, path)
+
+
+def _toggle_tracemalloc(enabled: bool) -> None:
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _format_profile(profiler: cProfile.Profile) -> str:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return out.getvalue()
+
+
+metrics = Instrumentation()
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Decorator recording every call of the function under ``name`` (default: module.qualname)."""
+
+    def decorate(func: Callable) -> Callable:
+        stage = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.timer(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def tracked_artifact(name: str) -> Callable:
+    """Decorator wrapping every call in ``metrics.artifact(name)``."""
+
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.artifact(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
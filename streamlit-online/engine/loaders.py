@@ -0,0 +1,626 @@
+"""Streamlit-free artifact loading shared by the app, the HTTP server and the benchmarks.
+
+``ArtifactLoader`` resolves every artifact the same way the app always has (model
+store, then the local data directory, then the download cache / Google Drive),
+loads each one at most once per process and remembers where it came from.
+Concurrent callers asking for the same artifact wait for the one load in flight.
+Configuration comes from ``LoaderSettings``, normally read from the
+``MOVIE_APP_*`` environment variables (the app adds its Streamlit secrets).
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, Mapping, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import requests
+
+from engine.aggregates import AGGREGATES_FILE, RatingAggregates
+from engine.artifact_cache import ArtifactCache
+from engine.cf import SVDScorer
+from engine.charts import AnalysisCharts, RenderCache
+from engine.columnar import ColumnarTable, has_table
+from engine.content import ContentRecommender
+from engine.decay import WEIGHTS_DIR, TimeDecay, manifest_decay
+from engine.factors import FACTORS_DIR, has_factors, load_factors
+from engine.facets import FacetIndex
+from engine.incremental import IncrementalCF, Ratings
+from engine.instrument import metrics, timed, tracked_artifact
+from engine.lookup import MovieLookup
+from engine.model_store import (
+    CONTENT_GROUP,
+    IDX_TO_TITLE_TABLE,
+    SVD_GROUP,
+    TITLE_TO_IDX_TABLE,
+    WEIGHTED_SVD_GROUP,
+    ModelStore,
+    StoreSnapshot,
+    matrix_from_arrays,
+)
+from engine.movies import MovieColumns
+from engine.neighbours import NeighbourTable
+from engine.posters import PosterCache
+from engine.ratings_index import RatingsIndex
+from engine.result_cache import ResultCache
+from engine.schema import (
+    COLUMNAR_DIR,
+    MOVIE_METADATA_COLUMNS,
+    MOVIES_TABLE,
+    RATINGS_TABLE,
+    coerce_movies,
+    coerce_ratings,
+)
+from engine.title_search import TitleIndex
+
+MOVIES_URL = "https://drive.usercontent.google.com/u/0/uc?id=1-SJ8oASjn4Ubbm5VlLGJXju_HfYe_HJp&export=download"
+RATINGS_URL = "https://drive.usercontent.google.com/download?id=1I5OyLwZs26RZtbG0QUpi9H0ntZv9Ov7C&export=download&authuser=0&confirm=t&uuid=9da5ac1b-c3c3-410f-8d00-2f001585b64d&at=APvzH3ootqPTp4kiQ44Ew8EDit-R%3A1735991866003"
+SVD_URL = "https://drive.usercontent.google.com/download?id=1-EZ3pUuoKn_C8RXuM-n8W8coo-20q4nB&export=download&authuser=0&confirm=t&uuid=f4f15388-b689-4fe7-aebe-b5ca56adda7f&at=APvzH3pCgFqBQ8ISNTL5zHrTIu5u%3A1735951544081"
+WEIGHTED_SVD_URL = "https://drive.usercontent.google.com/download?id=1-9F142ZpJTyJCyP46NVwkButsVc7PfHC&export=download&authuser=0&confirm=t&uuid=7856b7f9-e65a-4c70-a719-8362fe70a431&at=APvzH3qxH32v9fKo2ASzcH4avHni%3A1735951432618"
+KNN_URL = "https://drive.usercontent.google.com/u/0/uc?id=1-2j6yK1ajE37xifio-Eo1YLpbHsjLyLr&export=download"
+TITLE_TO_IDX_URL = "https://drive.usercontent.google.com/u/0/uc?id=1-AoCFwt2MZ2ExVR1wt-LiT8IDehnvjUP&export=download"
+IDX_TO_TITLE_URL = "https://drive.usercontent.google.com/u/0/uc?id=1-5kmSUkujuIKGAGHI76mRMZme6miXDCp&export=download"
+LOCAL_DATA_DIR_ENV = "MOVIE_APP_LOCAL_DATA_DIR"
+LOCAL_DATA_DIR_SECRET = "local_data_dir"
+CACHE_DIR_ENV = "MOVIE_APP_CACHE_DIR"
+CACHE_DIR_SECRET = "cache_dir"
+VERIFY_CACHE_ENV = "MOVIE_APP_VERIFY_CACHE"
+ANN_INDEX_ENV = "MOVIE_APP_ANN_INDEX"
+ANN_PARAMS_ENV = "MOVIE_APP_ANN_PARAMS"
+MODEL_STORE_ENV = "MOVIE_APP_MODEL_STORE"
+MODEL_STORE_SECRET = "model_store"
+RESULT_CACHE_MB_ENV = "MOVIE_APP_RESULT_CACHE_MB"
+RESULT_CACHE_TTL_ENV = "MOVIE_APP_RESULT_CACHE_TTL"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "movie-recommendation")
+# Poster thumbnails live next to the artifact cache (see ``engine.posters``).
+POSTERS_DIR = "posters"
+# Rendered Analysis page charts (see ``engine.charts``).
+CHARTS_DIR = "charts"
+
+MOVIES_FILE = "movies.pkl"
+RATINGS_FILE = "ratings.pkl"
+SVD_FILE = "svd.joblib"
+WEIGHTED_SVD_FILE = "weighted_svd.joblib"
+KNN_FILE = "knn.joblib"
+TITLE_TO_IDX_FILE = "title_to_idx.pkl"
+IDX_TO_TITLE_FILE = "idx_to_title.pkl"
+
+# Optional sha256 pins per artifact; downloads that do not match are rejected.
+ARTIFACT_SHA256 = {}
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+FALSE_VALUES = {"0", "false", "no", "off"}
+
+
+def parse_flag(value: Optional[object]) -> Optional[bool]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return value
+    lowered = str(value).strip().lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    return None
+
+
+@dataclass
+class LoaderSettings:
+    local_dir: Optional[str] = None
+    # None disables the download cache.
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR
+    verify_cache: bool = False
+    store_root: Optional[str] = None
+    ann_index: str = "exact"
+    ann_params: dict = field(default_factory=dict)
+    result_cache_mb: float = 8
+    result_cache_ttl: Optional[float] = None
+
+    @classmethod
+    def from_env(cls, secrets: Optional[Mapping] = None) -> "LoaderSettings":
+        """Settings from the environment; ``secrets`` entries take precedence where the app reads them."""
+        secrets = secrets or {}
+        cache_dir = secrets.get(CACHE_DIR_SECRET) or os.getenv(CACHE_DIR_ENV)
+        ttl = os.getenv(RESULT_CACHE_TTL_ENV)
+        return cls(
+            local_dir=secrets.get(LOCAL_DATA_DIR_SECRET) or os.getenv(LOCAL_DATA_DIR_ENV),
+            # Set it to 0/off/false to disable caching.
+            cache_dir=None if parse_flag(cache_dir) is False else cache_dir or DEFAULT_CACHE_DIR,
+            verify_cache=bool(parse_flag(os.getenv(VERIFY_CACHE_ENV))),
+            store_root=secrets.get(MODEL_STORE_SECRET) or os.getenv(MODEL_STORE_ENV),
+            # Backend for live content queries: exact (default), lsh or ivf, tuned with JSON params,
+            # e.g. MOVIE_APP_ANN_INDEX=ivf MOVIE_APP_ANN_PARAMS='{"n_lists": 256, "n_probe": 16}'.
+            ann_index=os.getenv(ANN_INDEX_ENV, "exact"),
+            ann_params=json.loads(os.getenv(ANN_PARAMS_ENV) or "{}"),
+            result_cache_mb=float(os.getenv(RESULT_CACHE_MB_ENV) or 8),
+            result_cache_ttl=float(ttl) if ttl else None,
+        )
+
+
+@timed("download")
+def _download_bytes(url: str) -> io.BytesIO:
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return io.BytesIO(response.content)
+
+
+@timed("read_pickle")
+def _read_pickle(f: BinaryIO):
+    return pd.read_pickle(f)
+
+
+@timed("joblib_load")
+def _joblib_load(f: BinaryIO):
+    return joblib.load(f)
+
+
+_UNSYNCED = object()
+
+
+class ArtifactLoader:
+    def __init__(self, settings: Optional[LoaderSettings] = None):
+        self.settings = settings or LoaderSettings.from_env()
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        # Bumped by clear(); loads that started before it are not kept.
+        self._generation = 0
+        self._sources: Dict[str, str] = {}
+        self._store: Optional[Tuple[str, StoreSnapshot]] = None
+        self._synced_version: object = _UNSYNCED
+        self._result_cache = ResultCache(
+            max_bytes=int(self.settings.result_cache_mb * (1 << 20)),
+            ttl=self.settings.result_cache_ttl,
+        )
+
+    def _memo(self, key: Tuple, compute: Callable[[], object]):
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+            generation = self._generation
+        with key_lock:
+            with self._lock:
+                if key in self._values:
+                    return self._values[key]
+            value = compute()
+            with self._lock:
+                if generation == self._generation:
+                    self._values[key] = value
+            return value
+
+    def clear(self) -> None:
+        """Forget every loaded artifact; the next call of each loader loads it again."""
+        with self._lock:
+            self._values.clear()
+            self._generation += 1
+
+    def is_loaded(self, name: str) -> bool:
+        with self._lock:
+            return any(key[0] == name for key in self._values)
+
+    def _record_source(self, filename: str, source: str) -> None:
+        with self._lock:
+            self._sources[filename] = source
+
+    @property
+    def sources(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._sources)
+
+    def source_label(self) -> str:
+        """Return 'store', 'local', 'remote', 'cache', 'mixed', or 'unknown' based on the loads so far.
+
+        'cache' means every artifact was a download-cache hit; 'remote' means each one was
+        fetched over the network (and stored in the cache for the next start). 'mixed' is any
+        combination of sources.
+        """
+        sources = set(self.sources.values())
+        if not sources:
+            return "unknown"
+        if len(sources) > 1:
+            return "mixed"
+        return sources.pop()
+
+    def _artifact_cache(self) -> Optional[ArtifactCache]:
+        root = self.settings.cache_dir
+        if not root:
+            return None
+        try:
+            return ArtifactCache(root, verify=self.settings.verify_cache)
+        except OSError:
+            # Read-only or missing home directory: fall back to in-memory downloads.
+            return None
+
+    def _maybe_local_file(self, filename: str) -> Optional[BinaryIO]:
+        base = self.settings.local_dir
+        if not base:
+            return None
+        candidate = os.path.join(base, filename)
+        if os.path.exists(candidate):
+            # Hand the open file to the unpickler instead of copying it into memory first.
+            return open(candidate, "rb")
+        return None
+
+    def _open_bytes(self, filename: str, url: str) -> BinaryIO:
+        local = self._maybe_local_file(filename)
+        if local is not None:
+            self._record_source(filename, "local")
+            return local
+        cache = self._artifact_cache()
+        if cache is not None:
+            with metrics.timer("download.cached"):
+                path, hit = cache.get(filename, url, ARTIFACT_SHA256.get(filename))
+            self._record_source(filename, "cache" if hit else "remote")
+            return open(path, "rb")
+        self._record_source(filename, "remote")
+        return _download_bytes(url)
+
+    def store_version(self) -> Optional[str]:
+        root = self.settings.store_root
+        return ModelStore(root).current_version() if root else None
+
+    def store_snapshot(self) -> Optional[StoreSnapshot]:
+        """The current version published by ``python -m engine.model_store``, if a store is configured."""
+        version = self.store_version()
+        if not version:
+            return None
+        with self._lock:
+            if self._store is not None and self._store[0] == version:
+                return self._store[1]
+        snapshot = ModelStore(self.settings.store_root).attach(version)
+        with self._lock:
+            # One attachment: replacing it drops (and un-leases) the previous version.
+            self._store = (version, snapshot)
+        return snapshot
+
+    def sync_store(self) -> bool:
+        """Hand off to a newly published store version; returns True when loaded artifacts were dropped.
+
+        Arrays already handed out keep their mappings, which stay valid even after
+        the old version is garbage-collected from the store.
+        """
+        version = self.store_version()
+        with self._lock:
+            changed = self._synced_version is not _UNSYNCED and version != self._synced_version
+            self._synced_version = version
+        if changed:
+            self.clear()
+            self.result_cache().invalidate()
+        return changed
+
+    def _columnar_table(self, name: str) -> Optional[ColumnarTable]:
+        """Return the memory-mapped table from the model store or ``engine.export_columnar``, if present."""
+        snapshot = self.store_snapshot()
+        if snapshot is not None and snapshot.has_table(name):
+            self._record_source(name, "store")
+            return snapshot.table(name)
+        base = self.settings.local_dir
+        if not base:
+            return None
+        path = os.path.join(base, COLUMNAR_DIR, name)
+        if not has_table(path):
+            return None
+        self._record_source(name, "local")
+        return ColumnarTable(path)
+
+    def movie_columns(self) -> MovieColumns:
+        return self._memo(("movie_columns",), self._load_movie_columns)
+
+    @tracked_artifact("movies")
+    def _load_movie_columns(self) -> MovieColumns:
+        table = self._columnar_table(MOVIES_TABLE)
+        if table is not None:
+            return MovieColumns.from_table(table)
+        with self._open_bytes(MOVIES_FILE, MOVIES_URL) as f:
+            return MovieColumns.from_frame(coerce_movies(_read_pickle(f)))
+
+    def movies(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """The movies table in display order: only ``columns``, or everything including the feature block.
+
+        Every caller asking for the same columns shares one frame.
+        """
+        key = None if columns is None else tuple(columns)
+        return self._memo(("movies", key), lambda: self.movie_columns().frame(columns, features=columns is None))
+
+    def movie_lookup(self) -> MovieLookup:
+        """movieId / title -> display position, built once from the two columns."""
+        return self._memo(("movie_lookup",), self._load_movie_lookup)
+
+    def _load_movie_lookup(self) -> MovieLookup:
+        columns = self.movie_columns()
+        return MovieLookup(columns.column("movieId"), columns.column("title"))
+
+    def facet_index(self) -> FacetIndex:
+        """Genre bitmasks and sorted year / runtime / language columns for facet filters, in display order."""
+        return self._memo(("facet_index",), lambda: FacetIndex.from_columns(self.movie_columns()))
+
+    def take_movies(self, positions, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Rows at display ``positions``, in that order; every column except the feature block by default."""
+        return self.movie_columns().take(positions, columns)
+
+    def movies_by_id(self, movie_ids, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Rows of ``movie_ids`` in their order, indexed by movieId; ids not in the table are left out."""
+        positions = self.movie_lookup().positions_of(movie_ids)
+        known = positions >= 0
+        rows = self.take_movies(positions[known], columns)
+        rows.index = pd.Index(np.asarray(movie_ids)[known], name="movieId")
+        return rows
+
+    def title_index(self) -> TitleIndex:
+        return self._memo(("title_index",), self._load_title_index)
+
+    @tracked_artifact("title_index")
+    def _load_title_index(self) -> TitleIndex:
+        return TitleIndex.from_movies(self.movies(["title", "popularity"]))
+
+    def movie_metadata(self) -> pd.DataFrame:
+        """Every movies column except the feature block, in display order."""
+        return self.movies(self.movie_columns().columns)
+
+    def search_titles(self, query: str, limit: int = 30, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Movies whose title matches ``query`` (prefix first, then substring/typo matches), most popular first.
+
+        Rows carry ``columns``, or every column except the feature block.
+        """
+        movies = self.movie_metadata() if columns is None else self.movies(columns)
+        return movies.iloc[self.title_index().search(query, limit)]
+
+    def knn_pipeline(self) -> object:
+        return self._memo(("knn",), self._load_knn_pipeline)
+
+    @tracked_artifact("knn")
+    def _load_knn_pipeline(self) -> object:
+        with self._open_bytes(KNN_FILE, KNN_URL) as f:
+            return _joblib_load(f)
+
+    def title_to_idx(self) -> pd.Series:
+        return self._memo(("title_to_idx",), self._load_title_to_idx)
+
+    @tracked_artifact("title_to_idx")
+    def _load_title_to_idx(self) -> pd.Series:
+        table = self._columnar_table(TITLE_TO_IDX_TABLE)
+        if table is not None:
+            return pd.Series(table.column("row"), index=table.column("title"))
+        with self._open_bytes(TITLE_TO_IDX_FILE, TITLE_TO_IDX_URL) as f:
+            return _read_pickle(f)
+
+    def idx_to_title(self) -> pd.Series:
+        return self._memo(("idx_to_title",), self._load_idx_to_title)
+
+    @tracked_artifact("idx_to_title")
+    def _load_idx_to_title(self) -> pd.Series:
+        table = self._columnar_table(IDX_TO_TITLE_TABLE)
+        if table is not None:
+            return pd.Series(table.column("title"), index=table.column("row"))
+        with self._open_bytes(IDX_TO_TITLE_FILE, IDX_TO_TITLE_URL) as f:
+            return _read_pickle(f)
+
+    def content_bundle(self) -> Tuple[pd.DataFrame, pd.DataFrame, object, pd.Series, pd.Series]:
+        return self._memo(("content_bundle",), self._load_content_bundle)
+
+    def _load_content_bundle(self):
+        movies = self.movies()
+        features = movies.drop(MOVIE_METADATA_COLUMNS, axis="columns", errors="ignore")
+        # The store already holds the fitted search matrix; the pipeline is only needed without it.
+        snapshot = self.store_snapshot()
+        knn_pl = None if snapshot is not None and snapshot.has_group(CONTENT_GROUP) else self.knn_pipeline()
+        return movies, features, knn_pl, self.title_to_idx(), self.idx_to_title()
+
+    def neighbour_table(self) -> Optional[NeighbourTable]:
+        return self._memo(("neighbour_table",), self._load_neighbour_table)
+
+    @tracked_artifact("neighbour_table")
+    def _load_neighbour_table(self) -> Optional[NeighbourTable]:
+        """Memory-map the table built by ``python -m engine.neighbours`` from the local data dir."""
+        base = self.settings.local_dir
+        table = NeighbourTable.load(base) if base else None
+        if table is not None:
+            self._record_source("knn_neighbours", "local")
+        return table
+
+    def content_engine(self) -> ContentRecommender:
+        return self._memo(("content_engine",), self._load_content_engine)
+
+    @tracked_artifact("content_engine")
+    def _load_content_engine(self) -> ContentRecommender:
+        bundle = self.content_bundle()
+        snapshot = self.store_snapshot()
+        vectors = None
+        if snapshot is not None and snapshot.has_group(CONTENT_GROUP):
+            self._record_source(CONTENT_GROUP, "store")
+            vectors = matrix_from_arrays(snapshot.arrays(CONTENT_GROUP))
+        return ContentRecommender(
+            *bundle,
+            neighbour_table=self.neighbour_table(),
+            vectors=vectors,
+            index=self.settings.ann_index,
+            index_params=self.settings.ann_params,
+            lookup=self.movie_lookup(),
+        )
+
+    def ratings(self) -> pd.DataFrame:
+        return self._memo(("ratings",), self._load_ratings)
+
+    @tracked_artifact("ratings")
+    def _load_ratings(self) -> pd.DataFrame:
+        table = self._columnar_table(RATINGS_TABLE)
+        if table is not None:
+            return table.to_frame()
+        with self._open_bytes(RATINGS_FILE, RATINGS_URL) as f:
+            return coerce_ratings(_read_pickle(f))
+
+    def ratings_index(self) -> RatingsIndex:
+        return self._memo(("ratings_index",), self._load_ratings_index)
+
+    @tracked_artifact("ratings_index")
+    def _load_ratings_index(self) -> RatingsIndex:
+        """Build the userId -> ratings CSR index once; pages slice it instead of masking ratings."""
+        table = self._columnar_table(RATINGS_TABLE)
+        if table is not None and table.has_extra("indptr"):
+            # Exported tables are already sorted with their offsets; map them as-is.
+            return RatingsIndex(
+                user_ids=table.extra("user_ids"),
+                indptr=table.extra("indptr"),
+                movie_ids=table.column("movieId"),
+                ratings=table.column("rating"),
+                timestamps=table.column("timestamp") if "timestamp" in table.columns else None,
+            )
+        return RatingsIndex.from_frame(self.ratings())
+
+    def ratings_fingerprint(self) -> Optional[str]:
+        """Identify the ratings artifact that would be loaded, without reading it."""
+        snapshot = self.store_snapshot()
+        if snapshot is not None and snapshot.has_table(RATINGS_TABLE):
+            return f"store:{snapshot.version}"
+        base = self.settings.local_dir
+        if base:
+            for kind, path in (
+                ("columnar", os.path.join(base, COLUMNAR_DIR, RATINGS_TABLE, "meta.json")),
+                ("local", os.path.join(base, RATINGS_FILE)),
+            ):
+                if os.path.exists(path):
+                    stat = os.stat(path)
+                    return f"{kind}:{stat.st_size}:{stat.st_mtime_ns}"
+        cache = self._artifact_cache()
+        ref = cache.read_ref(RATINGS_FILE) if cache is not None else None
+        if ref and ref.get("url") == RATINGS_URL:
+            return f"sha256:{ref['sha256']}"
+        return None
+
+    def _aggregates_cache_path(self, fingerprint: Optional[str]) -> Optional[str]:
+        root = self.settings.cache_dir
+        if not root or not fingerprint:
+            return None
+        key = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(root, "analytics", f"{key}.npz")
+
+    def rating_aggregates(self, compute: bool = False) -> Optional[RatingAggregates]:
+        return self._memo(("rating_aggregates", compute), lambda: self._load_rating_aggregates(compute))
+
+    @tracked_artifact("rating_aggregates")
+    def _load_rating_aggregates(self, compute: bool) -> Optional[RatingAggregates]:
+        """Analysis page aggregates, read from ``analytics.npz`` when one matches the ratings.
+
+        With ``compute`` they are built from the ratings index on a miss and saved under the
+        cache directory, keyed by the ratings artifact, so later starts skip the ratings.
+        """
+        base = self.settings.local_dir
+        fingerprint = self.ratings_fingerprint()
+        if base:
+            # Only a file built from the ratings that would be loaded; with no ratings to check against
+            # (e.g. a light-mode deploy shipping just the aggregates) it is taken as is.
+            aggregates = RatingAggregates.load(os.path.join(base, AGGREGATES_FILE), source=fingerprint)
+            if aggregates is not None:
+                self._record_source(AGGREGATES_FILE, "local")
+                return aggregates
+        cache_path = self._aggregates_cache_path(fingerprint)
+        if cache_path:
+            aggregates = RatingAggregates.load(cache_path, source=fingerprint)
+            if aggregates is not None:
+                self._record_source(AGGREGATES_FILE, "cache")
+                return aggregates
+        if not compute:
+            return None
+
+        movies, ratings = self.movies(["movieId", "genres"]), self.ratings_index()
+        # The ratings are on disk now, so the fingerprint is known even on a first download.
+        fingerprint = self.ratings_fingerprint()
+        aggregates = RatingAggregates.compute(ratings, movies, source=fingerprint or "")
+        cache_path = self._aggregates_cache_path(fingerprint)
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                aggregates.save(cache_path)
+            except OSError:
+                pass
+        return aggregates
+
+    def chart_cache(self) -> RenderCache:
+        """Rendered chart bytes, kept under the download cache when it is on."""
+        return self._memo(("chart_cache",), self._load_chart_cache)
+
+    def _load_chart_cache(self) -> RenderCache:
+        root = self.settings.cache_dir
+        if root:
+            try:
+                return RenderCache(os.path.join(root, CHARTS_DIR))
+            except OSError:
+                pass
+        return RenderCache()
+
+    def analysis_charts(self, compute: bool = False) -> AnalysisCharts:
+        """The Analysis page charts for the loaded movies and aggregates; missing ones start rendering now."""
+        return self._memo(
+            ("analysis_charts", compute),
+            lambda: AnalysisCharts(
+                self.chart_cache(), self.movies(["genres"])["genres"], self.rating_aggregates(compute)
+            ),
+        )
+
+    def svd_scorer(self, weighted: bool = False) -> SVDScorer:
+        return self._memo(("svd", weighted), lambda: self._load_svd_scorer(weighted))
+
+    def _load_svd_scorer(self, weighted: bool) -> SVDScorer:
+        movies = self.movies(["movieId"])
+        group = WEIGHTED_SVD_GROUP if weighted else SVD_GROUP
+        with metrics.artifact(group):
+            filename, url = (WEIGHTED_SVD_FILE, WEIGHTED_SVD_URL) if weighted else (SVD_FILE, SVD_URL)
+            snapshot = self.store_snapshot()
+            if snapshot is not None and snapshot.has_group(group):
+                self._record_source(group, "store")
+                return SVDScorer.from_state(
+                    snapshot.arrays(group), snapshot.scalars(group), movies["movieId"].to_numpy()
+                )
+            base = self.settings.local_dir
+            factors = os.path.join(base, FACTORS_DIR) if base else None
+            if factors and has_factors(factors, group):
+                # Compact float32 factors from ``python -m engine.factors export``, memory-mapped.
+                self._record_source(filename, "local")
+                return load_factors(factors, group, movies["movieId"].to_numpy())
+            # Keep only the fitted factor arrays; the Surprise trainset is dropped with the model.
+            with self._open_bytes(filename, url) as f:
+                return SVDScorer.from_surprise(_joblib_load(f), movies["movieId"].to_numpy())
+
+    def incremental_cf(self) -> IncrementalCF:
+        """The base ratings and SVD models plus the ratings added since; see ``engine.incremental``."""
+        return self._memo(("incremental_cf",), self._load_incremental_cf)
+
+    def _load_incremental_cf(self) -> IncrementalCF:
+        base = self.settings.local_dir
+        # Fold ratings into the weighted model with the decay it was trained on, when ``engine.decay`` recorded it.
+        decay = manifest_decay(os.path.join(base, WEIGHTS_DIR)) if base else None
+        live = IncrementalCF(
+            self.ratings_index(), self.svd_scorer(), self.svd_scorer(weighted=True), decay=decay or TimeDecay()
+        )
+        metrics.register("incremental", live.stats)
+        return live
+
+    def cf_bundle(self) -> Tuple[Ratings, SVDScorer, SVDScorer]:
+        """The current (ratings, SVD scorer, weighted SVD scorer) snapshot, added ratings included."""
+        return self.incremental_cf().bundle()
+
+    def poster_cache(self) -> Optional[PosterCache]:
+        """Shared poster thumbnail cache under the download cache; None when that cache is off or unwritable."""
+        return self._memo(("posters",), self._load_poster_cache)
+
+    def _load_poster_cache(self) -> Optional[PosterCache]:
+        root = self.settings.cache_dir
+        if not root:
+            return None
+        try:
+            posters = PosterCache(os.path.join(root, POSTERS_DIR))
+        except OSError:
+            return None
+        metrics.register("posters", posters.stats)
+        return posters
+
+    def result_cache(self) -> ResultCache:
+        """Cache of recommendation results (ids + scores), shared by every caller of this loader."""
+        return self._result_cache
@@ -0,0 +1,71 @@
+"""Movie id and title -> position lookups over the movies table in display order.
+
+Built once per loaded table, so single-movie and top-k lookups are O(k)
+gathers instead of a boolean scan of a whole column per call. Movie ids map
+through a dense int32 array indexed by id (a sorted-array binary search when
+the ids are too sparse for one); titles through a hashed ``pd.Index``. A
+duplicated id or title maps to its first position, as
+``movies[movies["title"] == title].iloc[0]`` did.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from engine.cf import lookup_sorted
+
+# A dense id array is used while it has at most this many slots per movie.
+DENSE_SLOTS_PER_MOVIE = 16
+DENSE_MIN_SLOTS = 1 << 20
+
+
+def _first_positions(values: np.ndarray) -> np.ndarray:
+    """Position of the first occurrence of each distinct value, in position order."""
+    _, first = np.unique(values, return_index=True)
+    first.sort()
+    return first
+
+
+class MovieLookup:
+    def __init__(self, movie_ids, titles):
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.n_movies = int(movie_ids.size)
+        self._dense: Optional[np.ndarray] = None
+        first = _first_positions(movie_ids)
+        ids = movie_ids[first]
+        if ids.size and ids.min() >= 0 and ids.max() < max(DENSE_MIN_SLOTS, DENSE_SLOTS_PER_MOVIE * ids.size):
+            self._dense = np.full(int(ids.max()) + 1, -1, dtype=np.int32)
+            self._dense[ids] = first
+        else:
+            order = np.argsort(ids)
+            self._ids_sorted = ids[order]
+            self._ids_order = first[order]
+        titles = pd.Index(titles)
+        first = np.flatnonzero(~titles.duplicated(keep="first"))
+        self._titles = titles[first]
+        self._title_pos = first
+
+    @classmethod
+    def from_frame(cls, movies: pd.DataFrame) -> "MovieLookup":
+        return cls(movies["movieId"].to_numpy(), movies["title"].to_numpy())
+
+    def positions_of(self, movie_ids) -> np.ndarray:
+        """Positions of ``movie_ids``, in their order (-1 for ids not in the table)."""
+        if self._dense is not None:
+            movie_ids = np.asarray(movie_ids, dtype=np.int64)
+            inside = (movie_ids >= 0) & (movie_ids < self._dense.size)
+            return np.where(inside, self._dense[np.where(inside, movie_ids, 0)], -1).astype(np.int64)
+        return lookup_sorted(self._ids_sorted, self._ids_order, movie_ids)
+
+    def title_positions(self, titles) -> np.ndarray:
+        """Positions of ``titles``, in their order (-1 for unknown titles, the first row for duplicated ones)."""
+        found = self._titles.get_indexer(pd.Index(titles))
+        return np.where(found >= 0, self._title_pos[found], -1)
+
+    def position_of_title(self, title: str) -> int:
+        """Position of ``title``: the first (display-order) row when several movies share it.
+
+        Raises ``KeyError`` when no movie has it.
+        """
+        return int(self._title_pos[self._titles.get_loc(title)])
@@ -0,0 +1,271 @@
+"""Versioned, memory-mapped model store shared by every app process on a host.
+
+Usage::
+
+    python -m engine.model_store publish /path/to/data --store /path/to/store
+    python -m engine.model_store status --store /path/to/store
+    python -m engine.model_store gc --store /path/to/store [--keep 2]
+
+One loader process publishes the numeric state of every artifact (movies and
+ratings as columnar tables, SVD factors with their id maps, the content
+search matrix, the title maps) under ``versions/<id>/`` and then points
+``CURRENT`` at it with an atomic rename. App processes attach to the current
+version with ``np.load(mmap_mode="r")``, so the arrays are views of the shared
+page cache and N replicas hold one copy. Every attached process keeps a
+shared ``flock`` on its version; ``gc`` only deletes versions nobody holds.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from scipy import sparse
+
+from engine.columnar import ColumnarTable, has_table
+
+try:
+    import fcntl
+except ImportError:  # Windows: versions are never considered in use.
+    fcntl = None
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+FORMAT_VERSION = 1
+
+# Array groups and tables the app looks for.
+SVD_GROUP = "svd"
+WEIGHTED_SVD_GROUP = "weighted_svd"
+CONTENT_GROUP = "content"
+RATINGS_TABLE = "ratings"
+MOVIES_TABLE = "movies"
+TITLE_TO_IDX_TABLE = "title_to_idx"
+IDX_TO_TITLE_TABLE = "idx_to_title"
+
+
+def matrix_arrays(matrix) -> Dict[str, np.ndarray]:
+    """Split a dense or CSR matrix into plain arrays for ``put_arrays``."""
+    if sparse.issparse(matrix):
+        matrix = sparse.csr_matrix(matrix)
+        return {
+            "data": matrix.data,
+            "indices": matrix.indices,
+            "indptr": matrix.indptr,
+            "shape": np.asarray(matrix.shape, dtype=np.int64),
+        }
+    return {"dense": np.asarray(matrix)}
+
+
+def matrix_from_arrays(arrays: Dict[str, np.ndarray]):
+    """Inverse of ``matrix_arrays``; mapped arrays are wrapped without copying."""
+    if "dense" in arrays:
+        return arrays["dense"]
+    shape = tuple(int(v) for v in arrays["shape"])
+    return sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+
+
+class VersionWriter:
+    """Collects the arrays and tables of one version while it is being published."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest = {"format": FORMAT_VERSION, "groups": {}, "tables": []}
+
+    def put_arrays(self, group: str, arrays: Dict[str, np.ndarray], **scalars) -> None:
+        directory = os.path.join(self.path, group)
+        os.makedirs(directory, exist_ok=True)
+        for key, values in arrays.items():
+            np.save(os.path.join(directory, f"{key}.npy"), np.ascontiguousarray(values), allow_pickle=False)
+        self.manifest["groups"][group] = {"arrays": sorted(arrays), "scalars": scalars}
+
+    def table_path(self, name: str) -> str:
+        """Directory to write a columnar table ``name`` into (see ``engine.columnar.write_table``)."""
+        self.manifest["tables"].append(name)
+        return os.path.join(self.path, name)
+
+
+class StoreSnapshot:
+    """One attached, read-only version; arrays are memory-mapped on demand."""
+
+    def __init__(self, path: str, version: str):
+        self.path = path
+        self.version = version
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self._lock = open(os.path.join(path, LOCK_FILE), "a")
+        if fcntl is not None:
+            fcntl.flock(self._lock, fcntl.LOCK_SH)
+        # Release the lease when the snapshot is closed or garbage collected.
+        self._finalizer = weakref.finalize(self, self._lock.close)
+
+    def has_group(self, group: str) -> bool:
+        return group in self.manifest["groups"]
+
+    def has_table(self, name: str) -> bool:
+        return name in self.manifest["tables"] and has_table(os.path.join(self.path, name))
+
+    def arrays(self, group: str) -> Dict[str, np.ndarray]:
+        entry = self.manifest["groups"][group]
+        directory = os.path.join(self.path, group)
+        return {key: np.load(os.path.join(directory, f"{key}.npy"), mmap_mode="r") for key in entry["arrays"]}
+
+    def scalars(self, group: str) -> dict:
+        return dict(self.manifest["groups"][group]["scalars"])
+
+    def table(self, name: str) -> ColumnarTable:
+        return ColumnarTable(os.path.join(self.path, name))
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+class ModelStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _versions_dir(self) -> str:
+        return os.path.join(self.root, "versions")
+
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as f:
+                version = json.load(f)["version"]
+        except (OSError, ValueError, KeyError):
+            return None
+        return version if os.path.isdir(os.path.join(self._versions_dir(), version)) else None
+
+    def versions(self) -> List[str]:
+        try:
+            return sorted(os.listdir(self._versions_dir()))
+        except OSError:
+            return []
+
+    @contextmanager
+    def publish(self, label: str = "") -> Iterator[VersionWriter]:
+        """Stage a new version, then make it current once the block completes.
+
+        Readers keep using the previous version until they re-attach; a failed
+        publish leaves nothing behind.
+        """
+        version = time.strftime("%Y%m%dT%H%M%S") + "-" + os.urandom(3).hex()
+        staging = os.path.join(self.root, "staging", version)
+        os.makedirs(staging)
+        writer = VersionWriter(staging)
+        try:
+            yield writer
+            writer.manifest.update(version=version, label=label, created=time.time())
+            with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(writer.manifest, f, indent=1)
+            os.makedirs(self._versions_dir(), exist_ok=True)
+            os.rename(staging, os.path.join(self._versions_dir(), version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        tmp = os.path.join(self.root, f"{CURRENT_FILE}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version}, f)
+        os.replace(tmp, os.path.join(self.root, CURRENT_FILE))
+
+    def attach(self, version: Optional[str] = None) -> Optional[StoreSnapshot]:
+        version = version or self.current_version()
+        if version is None:
+            return None
+        return StoreSnapshot(os.path.join(self._versions_dir(), version), version)
+
+    def collect(self, keep: int = 1) -> List[str]:
+        """Delete all but the ``keep`` newest versions (always keeping the current one) that no process holds."""
+        current = self.current_version()
+        old = [v for v in self.versions() if v != current]
+        old = old[: max(0, len(old) - (keep - 1))]
+        removed = []
+        for version in old:
+            path = os.path.join(self._versions_dir(), version)
+            with open(os.path.join(path, LOCK_FILE), "a") as lock:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue
+                shutil.rmtree(path, ignore_errors=True)
+            removed.append(version)
+        return removed
+
+
+def publish_data_dir(store: ModelStore, data_dir: str, label: str = "") -> str:
+    """Publish every artifact found in ``data_dir`` as a new store version."""
+    import joblib
+    import pandas as pd
+
+    from engine.ann import as_search_matrix
+    from engine.cf import SVDScorer
+    from engine.columnar import write_table
+    from engine.export_columnar import export_movies, export_ratings
+    from engine.neighbours import fitted_vectors
+
+    def source(filename: str) -> Optional[str]:
+        path = os.path.join(data_dir, filename)
+        if os.path.exists(path):
+            return path
+        print(f"skipping {filename}: not found in {data_dir}", file=sys.stderr)
+        return None
+
+    with store.publish(label) as writer:
+        if source("movies.pkl"):
+            export_movies(os.path.join(data_dir, "movies.pkl"), writer.table_path(MOVIES_TABLE))
+        if source("ratings.pkl"):
+            export_ratings(os.path.join(data_dir, "ratings.pkl"), writer.table_path(RATINGS_TABLE))
+        if source("title_to_idx.pkl"):
+            series = pd.read_pickle(os.path.join(data_dir, "title_to_idx.pkl"))
+            frame = pd.DataFrame({"title": series.index.to_numpy(), "row": series.to_numpy(dtype=np.int64)})
+            write_table(writer.table_path(TITLE_TO_IDX_TABLE), frame)
+        if source("idx_to_title.pkl"):
+            series = pd.read_pickle(os.path.join(data_dir, "idx_to_title.pkl"))
+            frame = pd.DataFrame({"row": series.index.to_numpy(dtype=np.int64), "title": series.to_numpy()})
+            write_table(writer.table_path(IDX_TO_TITLE_TABLE), frame)
+        if source("knn.joblib"):
+            vectors = as_search_matrix(fitted_vectors(joblib.load(os.path.join(data_dir, "knn.joblib"))))
+            writer.put_arrays(CONTENT_GROUP, matrix_arrays(vectors))
+        for group, filename in ((SVD_GROUP, "svd.joblib"), (WEIGHTED_SVD_GROUP, "weighted_svd.joblib")):
+            if source(filename):
+                # Bind to no catalog: the app re-binds the raw item map to its movies order.
+                scorer = SVDScorer.from_surprise(joblib.load(os.path.join(data_dir, filename)), [])
+                arrays, scalars = scorer.state()
+                writer.put_arrays(group, arrays, **scalars)
+    return store.current_version()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["publish", "status", "gc"])
+    parser.add_argument("data_dir", nargs="?", help="artifact directory to publish")
+    parser.add_argument("--store", required=True, help="store root (MOVIE_APP_MODEL_STORE for the app)")
+    parser.add_argument("--label", default="", help="free-form note saved in the manifest")
+    parser.add_argument("--keep", type=int, default=1, help="versions kept by gc, including the current one")
+    args = parser.parse_args(argv)
+    store = ModelStore(args.store)
+
+    if args.command == "publish":
+        if not args.data_dir:
+            parser.error("publish needs a data_dir")
+        started = time.perf_counter()
+        version = publish_data_dir(store, args.data_dir, args.label)
+        print(f"published {version} in {time.perf_counter() - started:.1f}s")
+    elif args.command == "status":
+        current = store.current_version()
+        for version in store.versions():
+            print(("* " if version == current else "  ") + version)
+    else:
+        for version in store.collect(args.keep):
+            print(f"removed {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
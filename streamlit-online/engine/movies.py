@@ -0,0 +1,109 @@
+"""Lazy, column-projected access to the movies table.
+
+``MovieColumns`` presents the table in display order (``MOVIE_SORT_COLUMNS``
+descending) without sorting the table itself: the order is the permutation
+``engine.export_columnar`` stores next to the table, or one computed from the
+three sort columns for older exports and the pickle. Each column, and the
+one-hot feature block, is read and put in that order the first time a caller
+asks for it, then shared. A page that only shows titles and posters never
+decodes the feature block or the other string columns.
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from engine.columnar import ColumnarTable
+from engine.schema import FEATURES_BLOCK, MOVIE_SORT_COLUMNS, SORT_ORDER, feature_columns, sort_order
+
+
+class MovieColumns:
+    def __init__(
+        self,
+        columns: List[str],
+        features: List[str],
+        index: pd.Index,
+        read_column: Callable[[str], np.ndarray],
+        read_features: Callable[[], np.ndarray],
+        order: Optional[np.ndarray],
+    ):
+        self.columns = columns
+        self.feature_names = features
+        self._read_column = read_column
+        self._read_features = read_features
+        # None when the source is already in display order.
+        self._order = order
+        self.index = index if order is None else index[order]
+        self._lock = threading.Lock()
+        self._cache: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_table(cls, table: ColumnarTable) -> "MovieColumns":
+        if table.has_extra(SORT_ORDER):
+            order = np.asarray(table.extra(SORT_ORDER))
+        else:
+            order = sort_order(pd.DataFrame({name: table.column(name) for name in MOVIE_SORT_COLUMNS}))
+        has_features = table.has_block(FEATURES_BLOCK)
+        return cls(
+            columns=table.columns,
+            features=table.block_columns(FEATURES_BLOCK) if has_features else [],
+            index=table.index(),
+            read_column=table.column,
+            read_features=lambda: table.block(FEATURES_BLOCK),
+            order=order,
+        )
+
+    @classmethod
+    def from_frame(cls, movies: pd.DataFrame) -> "MovieColumns":
+        """Wrap an in-memory (unpickled) table; it is reordered once, columns are views of it."""
+        movies = movies.iloc[sort_order(movies)]
+        features = feature_columns(movies)
+        return cls(
+            columns=[c for c in movies.columns if c not in set(features)],
+            features=features,
+            index=movies.index,
+            read_column=lambda name: movies[name].to_numpy(),
+            read_features=lambda: movies[features].to_numpy(),
+            order=None,
+        )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _get(self, key: str, read: Callable[[], np.ndarray]) -> np.ndarray:
+        with self._lock:
+            values = self._cache.get(key)
+        if values is None:
+            values = read()
+            if self._order is not None:
+                values = np.asarray(values)[self._order]
+            with self._lock:
+                values = self._cache.setdefault(key, values)
+        return values
+
+    def column(self, name: str) -> np.ndarray:
+        """One column in display order."""
+        if name not in self.columns:
+            raise KeyError(name)
+        return self._get(name, lambda: self._read_column(name))
+
+    def features(self) -> np.ndarray:
+        """The (movies x features) one-hot block in display order."""
+        return self._get(FEATURES_BLOCK, self._read_features)
+
+    def take(self, positions, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Rows at ``positions`` in that order (all but the features by default); gathers k values per column."""
+        positions = np.asarray(positions, dtype=np.int64)
+        names = self.columns if columns is None else list(columns)
+        return pd.DataFrame({name: self.column(name)[positions] for name in names}, index=self.index[positions])
+
+    def frame(self, columns: Optional[Sequence[str]] = None, features: bool = False) -> pd.DataFrame:
+        """The selected columns (all but the features by default) and, optionally, the feature block."""
+        names = self.columns if columns is None else list(columns)
+        frame = pd.DataFrame({name: self.column(name) for name in names}, index=self.index, copy=False)
+        if features and self.feature_names:
+            block = pd.DataFrame(self.features(), columns=self.feature_names, index=self.index, copy=False)
+            frame = pd.concat([frame, block], axis="columns")
+        return frame
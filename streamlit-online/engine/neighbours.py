@@ -0,0 +1,119 @@
+"""Precomputed item-item nearest-neighbour table for the content recommender.
+
+Usage::
+
+    python -m engine.neighbours /path/to/data [--k 50] [--block-size 512] [--workers 4]
+
+Reads ``knn.joblib`` from the data directory, computes every movie's top-K
+cosine neighbours with blocked matrix products, and writes
+``knn_neighbours.npy`` (int32 KNN rows) and ``knn_distances.npy`` (float16
+cosine distances) next to it. Rows are in the pipeline's fit order, the same
+space ``kneighbors`` returns; a movie is never listed as its own neighbour.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import joblib
+import numpy as np
+
+NEIGHBOURS_FILE = "knn_neighbours.npy"
+DISTANCES_FILE = "knn_distances.npy"
+DEFAULT_K = 50
+
+
+def fitted_vectors(knn_pl) -> np.ndarray:
+    """The L2-normalised float32 matrix the pipeline's NearestNeighbors was fitted on."""
+    vectors = np.asarray(knn_pl.named_steps["KNN"]._fit_X, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def build_neighbour_table(
+    vectors: np.ndarray,
+    k: int = DEFAULT_K,
+    block_size: int = 512,
+    workers: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (indices, distances) of each row's ``k`` most cosine-similar other rows.
+
+    ``vectors`` must already be L2-normalised. Blocks of rows are scored against
+    the whole matrix in a thread pool (NumPy releases the GIL inside the matrix
+    product and the partition), so peak memory is ``block_size * n`` floats per worker.
+    """
+    n = vectors.shape[0]
+    k = min(k, n - 1)
+    indices = np.empty((n, k), dtype=np.int32)
+    distances = np.empty((n, k), dtype=np.float16)
+
+    def run(start: int) -> None:
+        stop = min(start + block_size, n)
+        sims = vectors[start:stop] @ vectors.T
+        sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.lexsort((top, -top_sims), axis=1)
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        distances[start:stop] = 1.0 - np.take_along_axis(top_sims, order, axis=1)
+
+    with ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1)) as executor:
+        list(executor.map(run, range(0, n, block_size)))
+    return indices, distances
+
+
+class NeighbourTable:
+    """Row lookups into a precomputed (n_rows, K) neighbour table."""
+
+    def __init__(self, indices: np.ndarray, distances: np.ndarray):
+        self.indices = indices
+        self.distances = distances
+
+    @property
+    def k(self) -> int:
+        return int(self.indices.shape[1])
+
+    def __len__(self) -> int:
+        return int(self.indices.shape[0])
+
+    def query(self, rows, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (distances, rows) like ``kneighbors``, without the query rows themselves."""
+        rows = np.asarray(rows)
+        return self.distances[rows, :k].astype(np.float64), self.indices[rows, :k].astype(np.int64)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["NeighbourTable"]:
+        paths = [os.path.join(directory, name) for name in (NEIGHBOURS_FILE, DISTANCES_FILE)]
+        if not all(os.path.exists(p) for p in paths):
+            return None
+        return cls(*(np.load(p, mmap_mode="r") for p in paths))
+
+    def save(self, directory: str) -> None:
+        np.save(os.path.join(directory, NEIGHBOURS_FILE), self.indices)
+        np.save(os.path.join(directory, DISTANCES_FILE), self.distances)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data_dir", help="directory holding knn.joblib; the table is written next to it")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="neighbours kept per movie")
+    parser.add_argument("--block-size", type=int, default=512, help="rows scored per matrix product")
+    parser.add_argument("--workers", type=int, default=None, help="threads (default: up to 4)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    vectors = fitted_vectors(joblib.load(os.path.join(args.data_dir, "knn.joblib")))
+    indices, distances = build_neighbour_table(vectors, args.k, args.block_size, args.workers)
+    NeighbourTable(indices, distances).save(args.data_dir)
+    print(
+        f"{indices.shape[0]} movies x {indices.shape[1]} neighbours -> {args.data_dir} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
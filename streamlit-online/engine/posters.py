@@ -0,0 +1,194 @@
+"""Poster thumbnails at display size, fetched once into a local content-addressed cache.
+
+Layout under the cache root::
+
+    blobs/<sha256>.<ext>    thumbnail bytes, named by their digest
+    refs/<key>              digest of the thumbnail made from one poster URL at one size
+
+``poster_path`` points at full-size TMDB images while the pages draw them at
+120x160. ``PosterCache.thumbnails`` downloads each poster it has not stored
+yet, in a bounded thread pool, scales it to the display size, encodes it as
+WebP (JPEG when Pillow has no WebP support) and stores it; from then on every
+session, and every process sharing the directory, reads the stored file.
+Concurrent requests for one URL share a single download, and a poster that
+failed is not retried for ``retry_after`` seconds.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from PIL import Image, features
+
+from engine.instrument import metrics
+
+THUMB_SIZE = (120, 160)
+# Larger downloads are not posters; they are dropped instead of decoded.
+MAX_POSTER_BYTES = 16 << 20
+CHUNK_SIZE = 64 << 10
+FORMATS = {"WEBP": ("webp", "image/webp"), "JPEG": ("jpg", "image/jpeg")}
+
+
+def _is_url(value) -> bool:
+    return isinstance(value, str) and value.startswith(("http://", "https://"))
+
+
+def make_thumbnail(data: bytes, size: Tuple[int, int], image_format: str, quality: int) -> bytes:
+    """``data`` (any image Pillow reads) scaled to exactly ``size`` and encoded as ``image_format``."""
+    with Image.open(io.BytesIO(data)) as image:
+        # Lets the JPEG decoder skip most of the full-size pixels.
+        image.draft("RGB", size)
+        thumbnail = image.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    thumbnail.save(out, format=image_format, quality=quality)
+    return out.getvalue()
+
+
+class PosterCache:
+    def __init__(
+        self,
+        root: str,
+        size: Tuple[int, int] = THUMB_SIZE,
+        quality: int = 80,
+        workers: int = 8,
+        timeout: float = 10,
+        retry_after: float = 600,
+    ):
+        self.root = root
+        self.size = size
+        self.quality = quality
+        self.format = "WEBP" if features.check("webp") else "JPEG"
+        self.extension, self.mime_type = FORMATS[self.format]
+        self.timeout = timeout
+        self.retry_after = retry_after
+        for sub in ("blobs", "refs"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="posters")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self._failed: Dict[str, float] = {}
+        self._counts = {"hits": 0, "fetched": 0, "failed": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def _ref_path(self, url: str) -> str:
+        key = f"{self.size[0]}x{self.size[1]}:{self.format}:{self.quality}:{url}"
+        return os.path.join(self.root, "refs", hashlib.sha256(key.encode("utf-8")).hexdigest()[:32])
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "blobs", f"{sha256}.{self.extension}")
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += value
+
+    def lookup(self, url) -> Optional[str]:
+        """Path of the stored thumbnail of ``url``, or None when it has not been fetched."""
+        if not _is_url(url):
+            return None
+        try:
+            with open(self._ref_path(url), encoding="utf-8") as f:
+                blob = self._blob_path(f.read().strip())
+        except OSError:
+            return None
+        return blob if os.path.exists(blob) else None
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _download(self, url: str) -> bytes:
+        with self._session().get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            chunks, total = [], 0
+            for chunk in response.iter_content(CHUNK_SIZE):
+                total += len(chunk)
+                if total > MAX_POSTER_BYTES:
+                    raise ValueError(f"{url} is larger than {MAX_POSTER_BYTES} bytes")
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _store(self, url: str, thumbnail: bytes) -> str:
+        sha256 = hashlib.sha256(thumbnail).hexdigest()
+        blob = self._blob_path(sha256)
+        for path, payload in ((blob, thumbnail), (self._ref_path(url), sha256.encode("ascii"))):
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        return blob
+
+    def _fetch(self, url: str) -> Optional[str]:
+        try:
+            with metrics.timer("posters.fetch"):
+                data = self._download(url)
+                thumbnail = make_thumbnail(data, self.size, self.format, self.quality)
+                path = self._store(url, thumbnail)
+        except (requests.RequestException, OSError, ValueError, Image.DecompressionBombError):
+            with self._lock:
+                self._failed[url] = time.monotonic()
+                self._counts["failed"] += 1
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(url, None)
+        with self._lock:
+            self._counts["fetched"] += 1
+            self._counts["bytes_in"] += len(data)
+            self._counts["bytes_out"] += len(thumbnail)
+        return path
+
+    def _schedule(self, url: str) -> Optional[Future]:
+        """The download of ``url``, started unless one is running or it failed recently."""
+        with self._lock:
+            future = self._pending.get(url)
+            if future is not None:
+                return future
+            failed = self._failed.get(url)
+            if failed is not None and time.monotonic() - failed < self.retry_after:
+                return None
+            future = self._pending[url] = self._pool.submit(self._fetch, url)
+            return future
+
+    def request(self, urls: Iterable) -> None:
+        """Start fetching the thumbnails of ``urls`` not stored yet, without waiting (e.g. the next page)."""
+        for url in urls:
+            if _is_url(url) and self.lookup(url) is None:
+                self._schedule(url)
+
+    def thumbnails(self, urls: Iterable, timeout: Optional[float] = None) -> List[Optional[str]]:
+        """Thumbnail path per URL, fetching the missing ones; None where it failed or is still running after ``timeout``."""
+        urls = list(urls)
+        paths: List[Optional[str]] = [self.lookup(url) for url in urls]
+        self._count("hits", sum(path is not None for path in paths))
+        futures: Dict[int, Future] = {}
+        for i, url in enumerate(urls):
+            if paths[i] is None and _is_url(url):
+                future = self._schedule(url)
+                if future is not None:
+                    futures[i] = future
+        if futures:
+            wait(futures.values(), timeout=timeout)
+            for i, future in futures.items():
+                if future.done():
+                    paths[i] = future.result()
+        return paths
+
+    def data_uri(self, path: str) -> str:
+        """The thumbnail at ``path`` inlined as a ``data:`` URI (a few KB at the default size)."""
+        with open(path, "rb") as f:
+            return f"data:{self.mime_type};base64,{base64.b64encode(f.read()).decode('ascii')}"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counts, pending=len(self._pending), format=self.format, size=list(self.size))
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,134 @@
+from functools import cached_property
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.instrument import timed
+
+
+class RatingsIndex:
+    """CSR-style userId -> ratings index.
+
+    Rating columns are sorted by (userId, movieId) and ``indptr`` holds each
+    user's contiguous offsets, so per-user lookups are O(log U + k) slices
+    instead of boolean masks over the full ratings table.
+    """
+
+    def __init__(
+        self,
+        user_ids: np.ndarray,
+        indptr: np.ndarray,
+        movie_ids: np.ndarray,
+        ratings: np.ndarray,
+        timestamps: Optional[np.ndarray] = None,
+    ):
+        self.user_ids = user_ids
+        self.indptr = indptr
+        self.movie_ids = movie_ids
+        self.ratings = ratings
+        self.timestamps = timestamps
+
+    @classmethod
+    @timed("ratings_index.from_frame")
+    def from_frame(cls, ratings: pd.DataFrame) -> "RatingsIndex":
+        users = ratings["userId"].to_numpy()
+        movies = ratings["movieId"].to_numpy()
+        key = (users.astype(np.int64) << 32) | movies.astype(np.int64)
+        order = None if np.all(key[1:] >= key[:-1]) else np.argsort(key)
+        del key
+
+        def column(name, dtype):
+            values = ratings[name].to_numpy(dtype=dtype, copy=False)
+            return values[order] if order is not None else np.array(values)
+
+        users = column("userId", np.int32)
+        starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]]) if users.size else users
+        offset_dtype = np.int32 if users.size < np.iinfo(np.int32).max else np.int64
+        indptr = np.append(starts, users.size).astype(offset_dtype)
+        timestamps = column("timestamp", np.int32) if "timestamp" in ratings else None
+        return cls(
+            user_ids=users[starts],
+            indptr=indptr,
+            movie_ids=column("movieId", np.int32),
+            ratings=column("rating", np.float32),
+            timestamps=timestamps,
+        )
+
+    def merged(self, delta: pd.DataFrame) -> "RatingsIndex":
+        """A new index with ``delta``'s ratings added; they replace the same (user, movie) ratings."""
+        columns = {
+            "userId": np.repeat(self.user_ids, self.user_counts()),
+            "movieId": self.movie_ids,
+            "rating": self.ratings,
+        }
+        if self.timestamps is not None:
+            columns["timestamp"] = self.timestamps
+        combined = {name: np.concatenate([values, delta[name].to_numpy()]) for name, values in columns.items()}
+        key = (combined["userId"].astype(np.int64) << 32) | combined["movieId"].astype(np.int64)
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        # Equal keys keep their input order, so the last of each run is the newest rating.
+        order = order[np.r_[key[1:] != key[:-1], True]]
+        return RatingsIndex.from_frame(pd.DataFrame({name: values[order] for name, values in combined.items()}))
+
+    @property
+    def n_users(self) -> int:
+        return int(self.user_ids.size)
+
+    @property
+    def n_ratings(self) -> int:
+        return int(self.movie_ids.size)
+
+    def user_slice(self, user_id) -> slice:
+        """Row range of ``user_id`` in the sorted columns (empty when unknown)."""
+        pos = int(np.searchsorted(self.user_ids, user_id))
+        if pos == self.user_ids.size or self.user_ids[pos] != user_id:
+            return slice(0, 0)
+        return slice(int(self.indptr[pos]), int(self.indptr[pos + 1]))
+
+    def user_movies(self, user_id) -> np.ndarray:
+        """Sorted movie ids rated by ``user_id`` (a view, no copy)."""
+        return self.movie_ids[self.user_slice(user_id)]
+
+    def has_rated(self, user_id, movie_ids) -> np.ndarray:
+        """Boolean mask of which ``movie_ids`` the user has already rated."""
+        rated = self.user_movies(user_id)
+        movie_ids = np.asarray(movie_ids)
+        if rated.size == 0:
+            return np.zeros(movie_ids.shape, dtype=bool)
+        pos = np.minimum(np.searchsorted(rated, movie_ids), rated.size - 1)
+        return rated[pos] == movie_ids
+
+    def user_history(self, user_id) -> pd.DataFrame:
+        """The user's ratings as a small frame with the original ratings columns."""
+        rows = self.user_slice(user_id)
+        history = {
+            "userId": np.full(rows.stop - rows.start, user_id, dtype=np.int32),
+            "movieId": self.movie_ids[rows],
+            "rating": self.ratings[rows],
+        }
+        if self.timestamps is not None:
+            history["timestamp"] = self.timestamps[rows]
+        return pd.DataFrame(history)
+
+    def user_counts(self) -> np.ndarray:
+        """Number of ratings per entry of ``user_ids``."""
+        return np.diff(self.indptr)
+
+    @cached_property
+    def _movie_totals(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        counts = np.bincount(self.movie_ids)
+        sums = np.bincount(self.movie_ids, weights=self.ratings)
+        ids = np.flatnonzero(counts)
+        return ids.astype(np.int32), counts[ids], sums[ids]
+
+    def movie_counts(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (movie ids, rating counts) for every rated movie."""
+        ids, counts, _ = self._movie_totals
+        return ids, counts
+
+    def movie_sums(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (movie ids, rating sums) for every rated movie."""
+        ids, _, sums = self._movie_totals
+        return ids, sums
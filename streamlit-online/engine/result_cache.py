@@ -0,0 +1,139 @@
+"""Bounded cache of recommendation results for repeated queries.
+
+Entries are keyed by (query kind, normalised parameters, model version) and
+hold small NumPy arrays (catalog positions or movie ids plus scores), never
+DataFrames, so thousands of results fit in a few MB. Eviction is LRU under an
+entry count and byte budget, with an optional time-to-live.
+"""
+
+import itertools
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+# Per-entry bookkeeping (key tuple, OrderedDict node, array headers) counted against the budget.
+ENTRY_OVERHEAD = 512
+
+_versions: "weakref.WeakKeyDictionary[object, int]" = weakref.WeakKeyDictionary()
+_version_counter = itertools.count(1)
+_version_lock = threading.Lock()
+
+
+def version_of(model) -> int:
+    """A token that changes whenever a loader hands out a new model object.
+
+    Unlike ``id()``, tokens are never reused after the old object is garbage
+    collected, so results computed against a reloaded bundle cannot be served.
+    """
+    with _version_lock:
+        token = _versions.get(model)
+        if token is None:
+            token = _versions[model] = next(_version_counter)
+        return token
+
+
+def normalize(value) -> Hashable:
+    """Turn query parameters into a hashable key: sets are sorted, arrays and lists become tuples."""
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(normalize(v) for v in value))
+    if isinstance(value, np.ndarray):
+        return tuple(value.ravel().tolist())
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class ResultCache:
+    def __init__(
+        self,
+        max_bytes: int = 8 << 20,
+        max_entries: int = 10_000,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Seconds for the TTL; injectable so expiry can be tested without sleeping.
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Tuple[np.ndarray, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def key(kind: str, params, version) -> Hashable:
+        return (kind, normalize(params), normalize(version))
+
+    def get(self, kind: str, params, version) -> Optional[Tuple[np.ndarray, ...]]:
+        key = self.key(kind, params, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and self._clock() - entry[0] > self.ttl:
+                self._drop(key)
+                self._counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[2]
+
+    def put(self, kind: str, params, version, *arrays: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Store read-only copies of ``arrays`` (narrowed to int32 / float32) and return them."""
+        stored = []
+        for values in arrays:
+            values = np.array(values)
+            if values.dtype.kind in "iu" and values.dtype.itemsize > 4:
+                if values.size == 0 or (values.min() >= -(1 << 31) and values.max() < (1 << 31)):
+                    values = values.astype(np.int32)
+            elif values.dtype == np.float64:
+                values = values.astype(np.float32)
+            values.flags.writeable = False
+            stored.append(values)
+        stored = tuple(stored)
+        size = ENTRY_OVERHEAD + sum(v.nbytes for v in stored)
+        key = self.key(kind, params, version)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return stored
+            self._entries[key] = (self._clock(), size, stored)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+        return stored
+
+    def get_or_compute(self, kind: str, params, version, compute: Callable[[], Tuple]) -> Tuple[np.ndarray, ...]:
+        cached = self.get(kind, params, version)
+        if cached is not None:
+            return cached
+        return self.put(kind, params, version, *compute())
+
+    def invalidate(self, kind: Optional[str] = None) -> int:
+        """Drop every entry (or those of one ``kind``); returns how many were dropped."""
+        with self._lock:
+            keys = [k for k in self._entries if kind is None or k[0] == kind]
+            for key in keys:
+                self._drop(key)
+            self._counters["invalidations"] += len(keys)
+            return len(keys)
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), bytes=self._bytes)
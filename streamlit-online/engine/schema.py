@@ -0,0 +1,70 @@
+"""Column dtypes shared by the app loaders and the offline exporters."""
+
+import numpy as np
+import pandas as pd
+
+from engine.instrument import timed
+
+MOVIE_DTYPES = {
+    "movieId": "int32",
+    "popularity": "float32",
+    "runtime": "float32",
+    "weightedVoteAverage": "float32",
+}
+RATING_DTYPES = {
+    "userId": "int32",
+    "movieId": "int32",
+    "rating": "float32",
+    "timestamp": "int32",
+    "weightedRating": "float32",
+}
+# Columns of movies.pkl that are not part of the KNN feature block.
+MOVIE_METADATA_COLUMNS = [
+    "original_language",
+    "popularity",
+    "runtime",
+    "release_date",
+    "poster_path",
+    "weightedVoteAverage",
+    "title",
+    "movieId",
+    "genres",
+]
+MOVIE_SORT_COLUMNS = ["popularity", "weightedVoteAverage", "release_date"]
+# Extra array of the movies table holding ``sort_order`` (see ``engine.columnar``).
+SORT_ORDER = "sort_order"
+
+# Layout written by ``engine.export_columnar`` under the local data directory.
+COLUMNAR_DIR = "columnar"
+MOVIES_TABLE = "movies"
+RATINGS_TABLE = "ratings"
+FEATURES_BLOCK = "features"
+
+
+@timed("coerce.movies")
+def coerce_movies(movies: pd.DataFrame) -> pd.DataFrame:
+    for col, dtype in MOVIE_DTYPES.items():
+        if col in movies:
+            movies[col] = pd.to_numeric(movies[col], errors="coerce").astype(dtype)
+    if "release_date" in movies:
+        movies["release_date"] = pd.to_datetime(movies["release_date"], errors="coerce")
+    return movies
+
+
+@timed("coerce.ratings")
+def coerce_ratings(ratings: pd.DataFrame) -> pd.DataFrame:
+    for col, dtype in RATING_DTYPES.items():
+        if col in ratings:
+            ratings[col] = pd.to_numeric(ratings[col], errors="coerce").astype(dtype)
+    return ratings
+
+
+def feature_columns(movies: pd.DataFrame) -> list:
+    """The one-hot genre/tag columns the KNN pipeline was fitted on."""
+    return [col for col in movies.columns if col not in MOVIE_METADATA_COLUMNS]
+
+
+def sort_order(movies: pd.DataFrame) -> np.ndarray:
+    """Positions of ``movies`` rows in display order: ``MOVIE_SORT_COLUMNS`` descending, NaN last."""
+    keys = movies[MOVIE_SORT_COLUMNS].reset_index(drop=True)
+    return keys.sort_values(by=MOVIE_SORT_COLUMNS, ascending=False).index.to_numpy(dtype=np.int32)
@@ -0,0 +1,436 @@
+"""Asyncio HTTP/JSON server for the recommendation service.
+
+Usage::
+
+    python -m engine.server [--host 127.0.0.1] [--port 8000] [--threads 4] [--preload] [--heavy]
+
+Artifacts are configured with the same ``MOVIE_APP_*`` variables as the app
+(``MOVIE_APP_LOCAL_DATA_DIR``, ``MOVIE_APP_MODEL_STORE``, ...). Endpoints:
+
+    GET  /health
+    GET  /genres
+    GET  /users/<id>/recommendations?n=10&weighted=0   CF picks
+    GET  /users/<id>/hybrid?weighted=0                  CF picks fused with their content neighbours
+    POST /users/<id>/ratings  {"ratings": [{"movieId": 1, "rating": 4.5, "timestamp": ...}, ...]}
+    GET  /titles/similar?title=<title>&n=50
+    GET  /titles/search?q=<query>&limit=30
+    POST /genre-profile   {"genres": ["Comedy", "Drama"], "n": 50}
+    POST /batch           {"requests": [{"kind": "user", "user_id": 1}, {"kind": "similar", "title": "..."}]}
+    GET  /metrics         the instrumentation snapshot
+
+The four list queries (``user``, ``hybrid``, ``similar``, ``genres``) also
+take facet filters, applied before their top N are picked: ``genres_any`` /
+``genres_all`` / ``languages`` (comma-separated, or lists in JSON bodies) and
+``year_min`` / ``year_max`` / ``runtime_min`` / ``runtime_max``, e.g.
+``/titles/similar?title=...&genres_any=Comedy,Drama&year_min=1990``.
+Movie lists come back as ``{"movies": [{"movieId": ..., "title": ..., "score": ...}, ...]}``.
+Queries run on a thread pool so the event loop keeps accepting connections
+while NumPy works, and concurrent identical queries share one computation.
+Batch items are the query parameters plus a ``kind`` of ``user``, ``hybrid``,
+``similar``, ``genres`` or ``search``; each gets its own result or error.
+Posted ratings are folded into the CF models at once (new users included)
+and merged into the base every ``--compact-every`` seconds.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from engine.facets import FacetFilter
+from engine.instrument import metrics
+from engine.loaders import ArtifactLoader, parse_flag
+from engine.result_cache import normalize
+from engine.service import RecommendationService, UnknownTitle, UnknownUser
+
+MOVIE_FIELDS = [
+    "movieId",
+    "title",
+    "genres",
+    "poster_path",
+    "popularity",
+    "weightedVoteAverage",
+    "release_date",
+    "runtime",
+]
+MAX_BODY = 1 << 20
+MAX_BATCH = 256
+USER_ROUTE = re.compile(r"^/users/(-?\d+)/(recommendations|hybrid|ratings)$")
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _int(params: dict, name: str, default: int, low: int = 1, high: int = 1000) -> int:
+    value = params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{name} must be an integer") from None
+    if not low <= value <= high:
+        raise HTTPError(400, f"{name} must be between {low} and {high}")
+    return value
+
+
+def _flag(params: dict, name: str) -> bool:
+    value = parse_flag(params.get(name, False))
+    if value is None:
+        raise HTTPError(400, f"{name} must be a boolean")
+    return value
+
+
+def _required(params: dict, name: str):
+    if params.get(name) in (None, ""):
+        raise HTTPError(400, f"missing {name}")
+    return params[name]
+
+
+def _facets(params: dict) -> Optional[FacetFilter]:
+    try:
+        return FacetFilter.from_params(params)
+    except (TypeError, ValueError) as exc:
+        raise HTTPError(400, f"bad facet filter: {exc}") from None
+
+
+def _movies(frame: pd.DataFrame, scores=None) -> dict:
+    frame = frame[[c for c in MOVIE_FIELDS if c in frame.columns]].copy()
+    if scores is not None:
+        frame["score"] = np.asarray(scores, dtype=np.float64)
+    # to_json handles NaN, NumPy scalars and timestamps in one go.
+    return {"movies": json.loads(frame.to_json(orient="records", date_format="iso", double_precision=6))}
+
+
+# Blocking query bodies, run on the thread pool: (service, params) -> JSON payload.
+def _user(service: RecommendationService, params: dict) -> dict:
+    user_id = _int(params, "user_id", 0, low=-(1 << 31), high=(1 << 31) - 1)
+    movie_ids, scores = service.user_recommendations(
+        user_id, _int(params, "n", 10), _flag(params, "weighted"), _facets(params)
+    )
+    engine = service.loader.content_engine()
+    positions = engine.positions_of(movie_ids)
+    keep = positions >= 0
+    return _movies(service.rows(positions[keep]), np.asarray(scores)[keep])
+
+
+def _hybrid(service: RecommendationService, params: dict) -> dict:
+    user_id = _int(params, "user_id", 0, low=-(1 << 31), high=(1 << 31) - 1)
+    positions, scores = service.hybrid_for_user(user_id, _flag(params, "weighted"), _facets(params))
+    return _movies(service.rows(positions), scores)
+
+
+def _similar(service: RecommendationService, params: dict) -> dict:
+    positions, similarity = service.similar_to_title(
+        str(_required(params, "title")), _int(params, "n", 50), _facets(params)
+    )
+    return _movies(service.rows(positions), similarity)
+
+
+def _genres(service: RecommendationService, params: dict) -> dict:
+    genres = _required(params, "genres")
+    if isinstance(genres, str):
+        genres = genres.split(",")
+    positions, similarity = service.genre_profile([str(g) for g in genres], _int(params, "n", 50), _facets(params))
+    return _movies(service.rows(positions), similarity)
+
+
+def _search(service: RecommendationService, params: dict) -> dict:
+    return _movies(service.search(str(_required(params, "q")), _int(params, "limit", 30)))
+
+
+QUERIES: Dict[str, Callable[[RecommendationService, dict], dict]] = {
+    "user": _user,
+    "hybrid": _hybrid,
+    "similar": _similar,
+    "genres": _genres,
+    "search": _search,
+}
+
+
+class Coalescer:
+    """Share one in-flight computation between concurrent identical requests."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, start: Callable[[], Awaitable]):
+        future = self._inflight.get(key)
+        if future is None:
+            self.started += 1
+            future = asyncio.ensure_future(start())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A client that disconnects must not cancel the work others are waiting for.
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {"started": self.started, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
+
+
+class RecommendationServer:
+    def __init__(self, service: RecommendationService, threads: int = 4):
+        self.service = service
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="query")
+        self.coalescer = Coalescer()
+        metrics.register("server", self.coalescer.stats)
+
+    async def _blocking(self, func: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    async def query(self, kind: str, params: dict) -> dict:
+        if kind not in QUERIES:
+            raise HTTPError(400, f"unknown kind {kind!r}")
+        key = (kind, normalize({k: v for k, v in params.items() if k != "kind"}))
+        return await self.coalescer.run(key, lambda: self._blocking(self._timed_query, kind, params))
+
+    def _timed_query(self, kind: str, params: dict) -> dict:
+        with metrics.timer(f"server.{kind}"):
+            return QUERIES[kind](self.service, params)
+
+    async def batch(self, body: dict) -> dict:
+        items = body.get("requests")
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise HTTPError(400, "requests must be a list of objects")
+        if len(items) > MAX_BATCH:
+            raise HTTPError(413, f"at most {MAX_BATCH} requests per batch")
+
+        async def one(item: dict) -> dict:
+            status, payload = await self._guarded(self.query(str(item.get("kind")), item))
+            return payload if status == 200 else dict(payload, status=status)
+
+        return {"results": await asyncio.gather(*(one(item) for item in items))}
+
+    async def _guarded(self, work: Awaitable) -> Tuple[int, dict]:
+        try:
+            return 200, await work
+        except HTTPError as exc:
+            return exc.status, {"error": str(exc)}
+        except UnknownUser as exc:
+            return 404, {"error": f"unknown user {exc.args[0]}"}
+        except UnknownTitle as exc:
+            return 404, {"error": f"unknown title {exc.args[0]!r}"}
+        except KeyError as exc:
+            # str(KeyError) quotes its message; a bare KeyError() has none.
+            return 404, {"error": str(exc.args[0]) if exc.args else str(exc)}
+        except MemoryError:
+            return 503, {"error": "not enough memory to load the models"}
+        except Exception as exc:
+            return 500, {"error": f"{type(exc).__name__}: {exc}"}
+
+    async def route(self, method: str, path: str, query: dict, body: Optional[dict]) -> dict:
+        match = USER_ROUTE.match(path)
+        if match and match.group(2) == "ratings":
+            self._expect(method, "POST")
+            return await self.add_ratings(int(match.group(1)), body or {})
+        if match:
+            self._expect(method, "GET")
+            kind = "user" if match.group(2) == "recommendations" else "hybrid"
+            return await self.query(kind, dict(query, user_id=match.group(1)))
+        if path == "/titles/similar":
+            self._expect(method, "GET")
+            return await self.query("similar", query)
+        if path == "/titles/search":
+            self._expect(method, "GET")
+            return await self.query("search", query)
+        if path == "/genre-profile":
+            self._expect(method, "POST")
+            return await self.query("genres", body or {})
+        if path == "/batch":
+            self._expect(method, "POST")
+            return await self.batch(body or {})
+        if path == "/genres":
+            self._expect(method, "GET")
+            return {"genres": await self._blocking(self.service.genres)}
+        if path == "/health":
+            return {"status": "ok", "source": self.service.loader.source_label()}
+        if path == "/metrics":
+            return await self._blocking(metrics.snapshot)
+        raise HTTPError(404, f"no route for {path}")
+
+    @staticmethod
+    def _expect(method: str, allowed: str) -> None:
+        if method != allowed:
+            raise HTTPError(405, f"use {allowed}")
+
+    async def handle(self, method: str, target: str, body: bytes) -> Tuple[int, dict]:
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parsed = None
+        if body:
+            try:
+                parsed = json.loads(body)
+            except ValueError:
+                return 400, {"error": "body is not valid JSON"}
+            if not isinstance(parsed, dict):
+                return 400, {"error": "body must be a JSON object"}
+        return await self._guarded(self.route(method, url.path, query, parsed))
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                if isinstance(body, HTTPError):
+                    status, payload = body.status, {"error": str(body)}
+                else:
+                    status, payload = await self.handle(method, target, body)
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(data)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    ).encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def add_ratings(self, user_id: int, body: dict) -> dict:
+        items = body.get("ratings")
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            raise HTTPError(400, "ratings must be a non-empty list of objects")
+        if len(items) > MAX_BATCH:
+            raise HTTPError(413, f"at most {MAX_BATCH} ratings per request")
+        try:
+            movie_ids = [int(item["movieId"]) for item in items]
+            ratings = [float(item["rating"]) for item in items]
+            timestamps = [int(item.get("timestamp") or time.time()) for item in items]
+        except (KeyError, TypeError, ValueError):
+            raise HTTPError(400, "each rating needs a movieId and a numeric rating") from None
+        try:
+            added = await self._blocking(self.service.add_ratings, user_id, movie_ids, ratings, timestamps)
+        except ValueError as exc:
+            raise HTTPError(400, str(exc)) from None
+        return {"user_id": user_id, "added": added}
+
+    async def compact_ratings(self, interval: float, min_rows: int = 1) -> None:
+        """Merge posted ratings into the base ratings and factors in the background."""
+        loader = self.service.loader
+        while True:
+            await asyncio.sleep(interval)
+            # Follows the loader, so a store hand-off starts over with the new models.
+            if loader.is_loaded("incremental_cf") and loader.incremental_cf().pending_rows >= min_rows:
+                try:
+                    await self._blocking(loader.incremental_cf().compact)
+                except Exception:
+                    # Counted as a failed "incremental.compact"; the ratings stay in the log for the next round.
+                    pass
+
+    async def watch_store(self, interval: float) -> None:
+        """Follow newly published model-store versions, like the app does on each rerun."""
+        while True:
+            await asyncio.sleep(interval)
+            await self._blocking(self.service.loader.sync_store)
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    try:
+        line = await reader.readline()
+    except ValueError:
+        # Longer than the reader's limit; the rest of the request cannot be told apart.
+        return "", "", "HTTP/1.1", {"connection": "close"}, HTTPError(400, "request line too long")
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        return None
+    headers = {}
+    while True:
+        try:
+            header = await reader.readline()
+        except ValueError:
+            return method, target, version, {"connection": "close"}, HTTPError(400, "header line too long")
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    declared = headers.get("content-length") or "0"
+    if not (declared.isascii() and declared.isdigit()):
+        # Without a usable length the body cannot be skipped either.
+        headers["connection"] = "close"
+        return method, target, version, headers, HTTPError(400, "invalid Content-Length")
+    length = int(declared)
+    if length > MAX_BODY:
+        # The body is not read, so the connection cannot be reused.
+        headers["connection"] = "close"
+        return method, target, version, headers, HTTPError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, version, headers, body
+
+
+async def serve(
+    server: RecommendationServer, host: str, port: int, store_poll: float = 10.0, compact_every: float = 300.0
+) -> None:
+    listener = await asyncio.start_server(server.serve_connection, host, port)
+    # Held here so the tasks are not garbage-collected while serving.
+    background = []
+    if server.service.loader.settings.store_root and store_poll > 0:
+        background.append(asyncio.create_task(server.watch_store(store_poll)))
+    if compact_every > 0:
+        background.append(asyncio.create_task(server.compact_ratings(compact_every)))
+    print(f"serving on http://{host}:{port}", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        for task in background:
+            task.cancel()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve recommendations over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--threads", type=int, default=4, help="worker threads for NumPy queries")
+    parser.add_argument("--preload", action="store_true", help="load the content models before serving")
+    parser.add_argument("--heavy", action="store_true", help="also preload ratings and both SVD models")
+    parser.add_argument("--store-poll", type=float, default=10.0, help="seconds between model-store checks")
+    parser.add_argument(
+        "--compact-every", type=float, default=300.0, help="seconds between merges of posted ratings (0: never)"
+    )
+    args = parser.parse_args(argv)
+
+    loader = ArtifactLoader()
+    loader.sync_store()
+    if args.preload or args.heavy:
+        loader.content_engine()
+        loader.title_index()
+    if args.heavy:
+        loader.cf_bundle()
+    server = RecommendationServer(RecommendationService(loader), threads=args.threads)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.store_poll, args.compact_every))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""Recommendation queries behind the Model page and the HTTP server.
+
+``RecommendationService`` answers the page-level questions (a user's picks,
+movies like a title, movies matching a genre profile) from an
+``ArtifactLoader``. Results are arrays of catalog positions or movie ids plus
+scores, cached in the loader's ``ResultCache`` keyed by the versions of the
+models that produced them; ``rows`` turns positions into ``movies`` rows.
+The list queries take an optional ``FacetFilter`` (``engine.facets``) that is
+applied before their top N are picked.
+"""
+
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.facets import FacetFilter
+from engine.loaders import ArtifactLoader
+from engine.result_cache import version_of
+
+
+class UnknownUser(KeyError):
+    pass
+
+
+class UnknownTitle(KeyError):
+    pass
+
+
+class RecommendationService:
+    def __init__(self, loader: ArtifactLoader):
+        self.loader = loader
+
+    @property
+    def cache(self):
+        return self.loader.result_cache()
+
+    def genres(self) -> List[str]:
+        """Genre names offered for profiles (every feature column but the last)."""
+        return list(self.loader.content_engine().features.columns[:-1])
+
+    def rows(self, positions, scores=None) -> pd.DataFrame:
+        return self.loader.content_engine().rows(positions, scores)
+
+    def movie_by_title(self, title: str, columns: Optional[Sequence[str]] = None) -> pd.Series:
+        """The first movie (in display order) titled ``title``."""
+        try:
+            position = self.loader.movie_lookup().position_of_title(title)
+        except KeyError:
+            raise UnknownTitle(title) from None
+        movies = self.loader.movie_columns()
+        names = movies.columns if columns is None else list(columns)
+        # Built straight from the cached columns: a one-row frame would cost more than the lookup.
+        values = [movies.column(name)[position] for name in names]
+        return pd.Series(values, index=names, dtype=object, name=movies.index[position])
+
+    def _allowed(self, facets: Optional[FacetFilter]) -> Tuple[Optional[np.ndarray], Optional[tuple], Optional[int]]:
+        """(display-order mask of the movies matching ``facets``, its cache key, the facet index version).
+
+        All None when there is nothing to filter.
+        """
+        if facets is None or not facets.active:
+            return None, None, None
+        index = self.loader.facet_index()
+        return index.mask(facets), facets.key(), version_of(index)
+
+    def search(self, query: str, limit: int = 30, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        return self.loader.search_titles(query, limit, columns)
+
+    def _user(self, user_id):
+        ratings, algo, weighted_algo = self.loader.cf_bundle()
+        if ratings.user_movies(user_id).size == 0 and not algo.knows_user(user_id):
+            raise UnknownUser(user_id)
+        return ratings, algo, weighted_algo
+
+    def user_history(self, user_id) -> pd.DataFrame:
+        """The user's rated movies, best rated (then most popular, most recent) first."""
+        ratings, _, _ = self._user(user_id)
+        history = ratings.user_history(user_id)
+        positions = self.loader.movie_lookup().positions_of(history["movieId"])
+        known = positions >= 0
+        watched = self.loader.take_movies(positions[known]).drop(columns="movieId").reset_index(drop=True)
+        history = pd.concat([history[known].reset_index(drop=True), watched], axis="columns")
+        return history.sort_values(["rating", "popularity", "timestamp"], ascending=False)
+
+    def add_ratings(self, user_id, movie_ids, ratings, timestamps=None) -> int:
+        """Record a user's new or changed ratings and refit the user (see ``engine.incremental``)."""
+        movie_ids = np.atleast_1d(movie_ids)
+        self.loader.incremental_cf().add_ratings(np.full(movie_ids.size, user_id), movie_ids, ratings, timestamps)
+        return int(movie_ids.size)
+
+    def user_recommendations(
+        self, user_id, n: int = 10, weighted: bool = False, facets: Optional[FacetFilter] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(movie ids, estimated ratings) of the user's best unrated movies (matching ``facets``)."""
+        ratings, algo, weighted_algo = self._user(user_id)
+        scorer = weighted_algo if weighted else algo
+        allowed, facet_key, facet_version = self._allowed(facets)
+
+        def compute():
+            catalog_allowed = None
+            if allowed is not None:
+                # The display-order mask in catalog order; catalog movies missing from the table never match.
+                found = self.loader.movie_lookup().positions_of(scorer.item_ids)
+                catalog_allowed = (found >= 0) & allowed[np.maximum(found, 0)]
+            positions, scores = scorer.recommend(
+                user_id, n, exclude=ratings.user_movies(user_id), allowed=catalog_allowed
+            )
+            return scorer.item_ids[positions], scores
+
+        return self.cache.get_or_compute(
+            "cf", (user_id, n, facet_key), (version_of(scorer), version_of(ratings), facet_version), compute
+        )
+
+    def hybrid_for_user(
+        self, user_id, weighted: bool = False, facets: Optional[FacetFilter] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, scores) of the user's CF picks fused with their content neighbours (matching ``facets``)."""
+        ratings, algo, weighted_algo = self._user(user_id)
+        engine = self.loader.content_engine()
+        seed_ids, seed_scores = self.user_recommendations(user_id, weighted=weighted, facets=facets)
+        allowed, facet_key, facet_version = self._allowed(facets)
+        # One batched KNN query for all CF picks, fused and de-duplicated.
+        return self.cache.get_or_compute(
+            "hybrid",
+            (user_id, weighted, facet_key),
+            (version_of(algo), version_of(weighted_algo), version_of(ratings), version_of(engine), facet_version),
+            lambda: engine.hybrid_scores(
+                seed_ids,
+                seed_scores,
+                exclude=ratings.user_movies(user_id),
+                rating_scale=algo.rating_scale,
+                allowed=allowed,
+            ),
+        )
+
+    def similar_to_title(
+        self, title: str, n: int = 50, facets: Optional[FacetFilter] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, similarities) of the movies closest to ``title`` (matching ``facets``), nearest first."""
+        engine = self.loader.content_engine()
+        if title not in engine.title_to_idx.index:
+            raise UnknownTitle(title)
+        allowed, facet_key, facet_version = self._allowed(facets)
+        return self.cache.get_or_compute(
+            "similar",
+            (title, n, facet_key),
+            (version_of(engine), facet_version),
+            lambda: engine.title_neighbours(title, n, allowed),
+        )
+
+    def genre_profile(
+        self, genres: Iterable[str], n: int = 50, facets: Optional[FacetFilter] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, similarities) of the ``n`` movies nearest a 0/1 genre profile.
+
+        As on the Model page, the matches are returned best rated first, then most popular.
+        Only movies matching ``facets`` are considered.
+        """
+        engine = self.loader.content_engine()
+        genres = sorted(set(genres))
+        unknown = set(genres) - set(engine.features.columns)
+        if unknown:
+            raise KeyError(f"unknown genres: {', '.join(sorted(unknown))}")
+        allowed, facet_key, facet_version = self._allowed(facets)
+
+        def compute():
+            profile = engine.features.columns.isin(genres).astype(np.float32).reshape(1, -1)
+            positions, similarity = engine.vector_neighbours(profile, n, allowed)
+            found = engine.movies.iloc[positions]
+            order = np.lexsort((-found["popularity"].to_numpy(), -found["weightedVoteAverage"].to_numpy()))
+            return positions[order], similarity[order]
+
+        # Ad-hoc vectors (genre profiles) need the live KNN query.
+        return self.cache.get_or_compute(
+            "profile", (tuple(genres), n, facet_key), (version_of(engine), facet_version), compute
+        )
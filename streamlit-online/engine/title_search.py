@@ -0,0 +1,156 @@
+"""In-memory title search: prefix, substring and typo-tolerant matches.
+
+Titles are case-folded once and numbered by popularity rank, so every posting
+list is already in result order. Prefix queries binary-search a sorted copy
+of the folded titles; substring queries intersect trigram posting lists and
+confirm the survivors, while shorter queries read the exact posting list of
+their 1- or 2-character gram; when those run short, titles sharing at least half of
+the query's trigrams fill the remaining slots.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.instrument import timed
+
+GRAM = 3
+# Sorts after every other code point, closing the prefix range [q, q + MAX_CHAR).
+MAX_CHAR = chr(0x10FFFF)
+
+
+def _grams(text: str) -> set:
+    return {text[i : i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def _short_gram_postings(folded: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """(grams, offsets, ranks): posting lists of every 1- and 2-character gram of the titles.
+
+    Built with NumPy over the code points of all titles at once; a per-title Python
+    loop like the trigrams' would double the index build time.
+    """
+    lengths = np.fromiter((len(text) for text in folded), dtype=np.int64, count=len(folded))
+    codes = np.frombuffer("".join(folded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    char_ranks = np.repeat(np.arange(len(folded), dtype=np.int32), lengths)
+    within = char_ranks[:-1] == char_ranks[1:]
+    # Code points stay below 2**21, so a pair's key never collides with a single character's.
+    pairs = ((codes[:-1][within] + 1) << 21) + codes[1:][within]
+    keys = np.concatenate([codes, pairs])
+    ranks = np.concatenate([char_ranks, char_ranks[:-1][within]])
+    order = np.lexsort((ranks, keys))
+    keys, ranks = keys[order], ranks[order]
+    first = np.ones(keys.size, dtype=bool)
+    first[1:] = (keys[1:] != keys[:-1]) | (ranks[1:] != ranks[:-1])
+    keys, ranks = keys[first], ranks[first]
+    unique, offsets = np.unique(keys, return_index=True)
+    grams = [chr(key) if key < 1 << 21 else chr((key >> 21) - 1) + chr(key & ((1 << 21) - 1)) for key in unique]
+    return grams, np.append(offsets, keys.size), ranks
+
+
+class TitleIndex:
+    """Search ``titles`` (positions in the source frame) ranked by ``popularity``."""
+
+    def __init__(self, titles, popularity=None, min_overlap: float = 0.5):
+        titles = np.asarray(titles, dtype=object)
+        popularity = np.zeros(len(titles)) if popularity is None else np.asarray(popularity, dtype=np.float64)
+        # rank -> position in the source frame; ties keep frame order.
+        self._positions = np.lexsort((np.arange(len(titles)), -np.nan_to_num(popularity, nan=-np.inf)))
+        self.titles = titles[self._positions]
+        self.folded: List[str] = [str(t).casefold() for t in self.titles]
+        self.min_overlap = min_overlap
+
+        folded = np.array(self.folded, dtype=str)
+        self._prefix_order = np.argsort(folded, kind="stable")
+        self._prefix_keys = folded[self._prefix_order]
+
+        gram_ids: Dict[str, int] = {}
+        pair_grams, pair_ranks = [], []
+        for rank, text in enumerate(self.folded):
+            for gram in _grams(text):
+                pair_grams.append(gram_ids.setdefault(gram, len(gram_ids)))
+                pair_ranks.append(rank)
+        pair_grams = np.asarray(pair_grams, dtype=np.int64)
+        order = np.lexsort((pair_ranks, pair_grams))
+        postings = np.asarray(pair_ranks, dtype=np.int32)[order]
+        offsets = np.searchsorted(pair_grams[order], np.arange(len(gram_ids) + 1))
+
+        # Shorter grams share the posting arrays, after the trigrams.
+        short_grams, short_offsets, short_postings = _short_gram_postings(self.folded)
+        for gram in short_grams:
+            gram_ids[gram] = len(gram_ids)
+        self._gram_ids = gram_ids
+        self._postings = np.concatenate([postings, short_postings])
+        self._offsets = np.concatenate([offsets, postings.size + short_offsets[1:]])
+
+    def __len__(self) -> int:
+        return len(self.folded)
+
+    def _posting(self, gram: str) -> np.ndarray:
+        gid = self._gram_ids.get(gram)
+        if gid is None:
+            return self._postings[:0]
+        return self._postings[self._offsets[gid] : self._offsets[gid + 1]]
+
+    def _prefix(self, query: str, limit: int) -> np.ndarray:
+        lo = np.searchsorted(self._prefix_keys, query, side="left")
+        hi = np.searchsorted(self._prefix_keys, query + MAX_CHAR, side="left")
+        return np.sort(self._prefix_order[lo:hi])[:limit]
+
+    def _substring(self, query: str, limit: int) -> List[int]:
+        if len(query) < GRAM:
+            # The query is a gram itself: its posting list holds exactly the titles containing it.
+            return self._posting(query)[:limit].tolist()
+        postings = sorted((self._posting(g) for g in _grams(query)), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if candidates.size == 0:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        found = []
+        for rank in candidates:
+            if query in self.folded[rank]:
+                found.append(int(rank))
+                if len(found) == limit:
+                    break
+        return found
+
+    def _fuzzy(self, query: str, limit: int) -> np.ndarray:
+        grams = _grams(query)
+        postings = [self._posting(g) for g in grams]
+        postings = [p for p in postings if p.size]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        overlap = np.bincount(np.concatenate(postings), minlength=len(self.folded))
+        hits = np.flatnonzero(overlap >= max(1.0, self.min_overlap * len(grams)))
+        return hits[np.lexsort((hits, -overlap[hits]))][:limit]
+
+    @timed("title_search")
+    def search(self, query: str, limit: int = 30) -> np.ndarray:
+        """Positions of up to ``limit`` matching titles: prefix, then substring, then fuzzy matches.
+
+        Each group is ordered by popularity and titles already listed are skipped.
+        """
+        query = query.casefold()
+        if not query.strip() or limit <= 0:
+            return np.empty(0, dtype=np.int64)
+        ranks, seen = [], set()
+
+        def extend(found) -> None:
+            for rank in found:
+                title = self.titles[rank]
+                if title not in seen and len(ranks) < limit:
+                    seen.add(title)
+                    ranks.append(int(rank))
+
+        extend(self._prefix(query, limit))
+        if len(ranks) < limit:
+            extend(self._substring(query, limit + len(ranks)))
+        if len(ranks) < limit and len(query) >= GRAM:
+            extend(self._fuzzy(query, limit + len(ranks)))
+        return self._positions[np.asarray(ranks, dtype=np.int64)]
+
+    @classmethod
+    def from_movies(cls, movies: pd.DataFrame) -> "TitleIndex":
+        popularity = movies["popularity"].to_numpy() if "popularity" in movies else None
+        return cls(movies["title"].to_numpy(), popularity)
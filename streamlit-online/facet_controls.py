@@ -0,0 +1,30 @@
+import math
+from typing import Optional
+
+import streamlit as st
+
+from engine.facets import FacetFilter, FacetIndex
+
+
+def _range_slider(label: str, bounds, key: str, step=1):
+    """A slider over ``bounds``; None while it spans the whole range (movies without a value stay in)."""
+    low, high = bounds
+    if low is None or low == high:
+        return None
+    low, high = math.floor(low), math.ceil(high)
+    picked = st.slider(label, min_value=low, max_value=high, value=(low, high), step=step, key=key)
+    return None if picked == (low, high) else picked
+
+
+def facet_filter(index: FacetIndex, key_prefix: str = "") -> Optional[FacetFilter]:
+    """Render the result filters in an expander; returns the filter, or None when nothing is narrowed.
+
+    key_prefix keeps Streamlit widget keys unique across pages.
+    """
+    with st.expander("🎚️ Filter results"):
+        genres_any = st.multiselect("Any of these genres", list(index.genre_names), key=f"{key_prefix}facet_genres")
+        years = _range_slider("Release year", index.year_bounds, key=f"{key_prefix}facet_years")
+        runtime = _range_slider("Runtime (minutes)", index.runtime_bounds, key=f"{key_prefix}facet_runtime", step=5)
+        languages = st.multiselect("Original language", index.languages, key=f"{key_prefix}facet_languages")
+    facets = FacetFilter(genres_any=genres_any, years=years, runtime=runtime, languages=languages)
+    return facets if facets.active else None
@@ -1,10 +1,13 @@
 import os
+from typing import Optional
+
 import streamlit as st
 
 from data_loader import light_mode_enabled
 
 
-def _get_password_secret() -> str:
+def get_password_secret() -> Optional[str]:
+    """The heavy-mode password from Streamlit secrets or env; also gates the Diagnostics page controls."""
     try:
         secret_val = st.secrets.get("heavy_mode_password", None)
     except Exception:
@@ -37,7 +40,7 @@ def resolve_light_mode(key_prefix: str = "") -> bool:
         key=toggle_key,
     )
 
-    password_secret = _get_password_secret()
+    password_secret = get_password_secret()
     light_mode = desired_light_mode
 
     if password_secret:
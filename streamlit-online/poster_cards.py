@@ -0,0 +1,108 @@
+import html
+import math
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+from data_loader import get_poster_cache
+
+PAGE_SIZE = 10
+# How long a render waits for missing thumbnails before drawing the remote poster instead.
+FETCH_WAIT_S = 5
+
+CARD_STYLE = """
+<style>
+.scrollable-container {
+    white-space: nowrap;
+    overflow-x: auto;
+}
+
+.scrollable-container img {
+    display: inline-block;
+    margin-right: 16px;
+    border: 1px solid #ccc;
+    border-radius: 4px;
+}
+</style>
+"""
+
+
+def _poster_sources(poster_paths) -> list:
+    """``src`` per card: the cached thumbnail inlined, or the remote poster when it is unavailable."""
+    posters = get_poster_cache()
+    if posters is None:
+        return list(poster_paths)
+    thumbnails = posters.thumbnails(poster_paths, timeout=FETCH_WAIT_S)
+    return [posters.data_uri(path) if path else url for path, url in zip(thumbnails, poster_paths)]
+
+
+def _card(src: str, title: str, rating=None) -> str:
+    rating_line = f"\n    <h6>User rating: {rating}</h6>" if rating is not None else ""
+    return f'''<div style="display: inline-block; text-align: center;">
+    <img src="{html.escape(str(src))}" alt="Some Image" width="120" height="160">
+    <h6 style= "padding-top: 10px">{html.escape(str(title))}</h6>{rating_line}
+    </div>'''
+
+
+def set_results(key: str, output: pd.DataFrame, header: str = "") -> None:
+    """Keep ``output`` for ``show_results(key)`` across reruns; a different result starts at its first page."""
+    token = (header, tuple(output["title"]))
+    if st.session_state.get(f"{key}_token") != token:
+        st.session_state[key] = (output, header)
+        st.session_state[f"{key}_token"] = token
+        st.session_state[f"{key}_page"] = 0
+
+
+def clear_results(key: str) -> None:
+    for name in (key, f"{key}_token", f"{key}_page"):
+        st.session_state.pop(name, None)
+
+
+def _turn_page(key: str, step: int) -> None:
+    st.session_state[f"{key}_page"] += step
+
+
+def show_results(key: str, empty_message: Optional[str] = None, page_size: int = PAGE_SIZE) -> None:
+    """Draw one page of the poster cards kept under ``key``, with buttons to page through the rest.
+
+    Only the visible cards are rendered and have their thumbnails fetched; the next
+    page's thumbnails are fetched in the background.
+    """
+    if key not in st.session_state:
+        return
+    output, header = st.session_state[key]
+    if output.empty:
+        if empty_message:
+            st.write(empty_message)
+        return
+    n_pages = math.ceil(len(output) / page_size)
+    page = min(st.session_state.get(f"{key}_page", 0), n_pages - 1)
+    start = page * page_size
+    rows = output.iloc[start : start + page_size]
+
+    st.markdown(CARD_STYLE, unsafe_allow_html=True)
+    sources = _poster_sources(rows["poster_path"].tolist())
+    ratings = rows["rating"].tolist() if "rating" in rows.columns else [None] * len(rows)
+    cards = "".join(_card(src, title, rating) for src, title, rating in zip(sources, rows["title"], ratings))
+    heading = f"<h3>{html.escape(header)}</h3>" if header else ""
+    st.markdown(
+        f"""
+        <div class="scrollable-container">
+        {heading}
+            {cards}
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+    posters = get_poster_cache()
+    if posters is not None and page + 1 < n_pages:
+        posters.request(output["poster_path"].iloc[start + page_size : start + 2 * page_size])
+
+    if n_pages > 1:
+        previous, label, following = st.columns([1, 4, 1])
+        previous.button("‹ Previous", key=f"{key}_previous", on_click=_turn_page, args=(key, -1), disabled=page == 0)
+        label.caption(f"{start + 1}–{start + len(rows)} of {len(output)}")
+        following.button(
+            "Next ›", key=f"{key}_next", on_click=_turn_page, args=(key, 1), disabled=page + 1 == n_pages
+        )
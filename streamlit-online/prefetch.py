@@ -0,0 +1,135 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterable, Optional
+
+import streamlit as st
+
+from data_loader import (
+    load_analysis_charts,
+    load_content_engine,
+    load_facet_index,
+    load_idx_to_title,
+    load_movies,
+    load_ratings_index,
+    load_svd_scorer,
+    load_title_index,
+    load_title_to_idx,
+)
+
+# Artifacts every page can use; the heavy ones are only fetched outside light mode.
+LIGHT_ARTIFACTS: Dict[str, Callable[[], object]] = {
+    "movies": load_movies,
+    "content": load_content_engine,
+    "title_to_idx": load_title_to_idx,
+    "idx_to_title": load_idx_to_title,
+    "title_index": load_title_index,
+    "facets": load_facet_index,
+    # Starts rendering the Analysis page charts that are not stored yet.
+    "charts": load_analysis_charts,
+}
+HEAVY_ARTIFACTS: Dict[str, Callable[[], object]] = {
+    "ratings": load_ratings_index,
+    "svd": load_svd_scorer,
+    "weighted_svd": lambda: load_svd_scorer(weighted=True),
+    "rating_charts": lambda: load_analysis_charts(compute=True),
+}
+
+
+@dataclass
+class ArtifactStatus:
+    name: str
+    state: str = "pending"  # pending -> running -> done | failed
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def seconds(self) -> Optional[float]:
+        if self.started is None:
+            return None
+        return (self.finished or time.perf_counter()) - self.started
+
+
+class Prefetcher:
+    """Run the cached artifact loaders concurrently in a background thread pool.
+
+    The loaders are the ``data_loader`` wrappers around the shared
+    ``ArtifactLoader``, which holds a per-artifact lock, so a page that asks for
+    an artifact still in flight simply waits for that one load to finish.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._status: Dict[str, ArtifactStatus] = {}
+        self._futures: Dict[str, Future] = {}
+
+    def submit(self, artifacts: Dict[str, Callable[[], object]]) -> None:
+        """Queue each artifact that has not been queued yet."""
+        with self._lock:
+            for name, loader in artifacts.items():
+                if name in self._futures:
+                    continue
+                self._status[name] = ArtifactStatus(name)
+                self._futures[name] = self._executor.submit(self._run, name, loader)
+
+    def _update(self, name: str, **fields) -> None:
+        """Change one artifact's status in a single step, so ``status()`` never sees it half-updated."""
+        with self._lock:
+            self._status[name] = replace(self._status[name], **fields)
+
+    def _run(self, name: str, loader: Callable[[], object]) -> None:
+        self._update(name, state="running", started=time.perf_counter())
+        try:
+            result = loader()
+            self._update(name, state="failed" if result is None else "done", finished=time.perf_counter())
+        except Exception as exc:
+            self._update(
+                name, state="failed", error=f"{type(exc).__name__}: {exc}", finished=time.perf_counter()
+            )
+
+    def status(self) -> Dict[str, ArtifactStatus]:
+        with self._lock:
+            return dict(self._status)
+
+    def shutdown(self) -> None:
+        """Cancel queued loads and let the worker threads exit once their current load finishes."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def wait(self, names: Optional[Iterable[str]] = None, timeout: Optional[float] = None) -> bool:
+        """Block until the named artifacts (default: all queued) finish; False on timeout."""
+        with self._lock:
+            futures = [self._futures[n] for n in (names or self._futures) if n in self._futures]
+        _, pending = wait(futures, timeout=timeout)
+        return not pending
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefetcher() -> Prefetcher:
+    return Prefetcher()
+
+
+def start_prefetch(include_heavy: bool = False) -> Prefetcher:
+    """Start (or extend) the process-wide prefetch; safe to call on every rerun."""
+    prefetcher = get_prefetcher()
+    prefetcher.submit(LIGHT_ARTIFACTS)
+    if include_heavy:
+        prefetcher.submit(HEAVY_ARTIFACTS)
+    return prefetcher
+
+
+def render_prefetch_status() -> None:
+    """Show per-artifact load state and timings."""
+    statuses = get_prefetcher().status()
+    if not statuses:
+        return
+    with st.expander("Artifact loading", expanded=False):
+        for status in statuses.values():
+            seconds = status.seconds
+            timing = "" if seconds is None else f" ({seconds:.1f}s)"
+            line = f"`{status.name}`: {status.state}{timing}"
+            if status.error:
+                line += f" — {status.error}"
+            st.write(line)
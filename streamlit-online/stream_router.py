@@ -1,8 +1,23 @@
 import streamlit as st
-import pandas as pd
+
+from data_loader import export_metrics, light_mode_enabled, sync_model_store
+from prefetch import get_prefetcher, render_prefetch_status, start_prefetch
 
 st.set_page_config(page_icon= "🎬", page_title="Movie Recommendation", layout="wide", initial_sidebar_state='collapsed')
 
+# Drop cached artifacts when the shared model store publishes a new version.
+if sync_model_store():
+    # Stop the old pool's threads before forgetting it, or each hand-off leaves them idling.
+    get_prefetcher().shutdown()
+    get_prefetcher.clear()
+
+# Warm the artifact caches in the background so pages only wait for what they use.
+start_prefetch(include_heavy=not light_mode_enabled())
+with st.sidebar:
+    render_prefetch_status()
+# Previous runs' timings, for an external scraper (no-op unless MOVIE_APP_METRICS_FILE is set).
+export_metrics()
+
 pg = st.navigation([st.Page("./Pages/overview_page.py",
                             title="Overview",
                             icon=":material/overview:",
@@ -20,5 +35,12 @@ pg = st.navigation([st.Page("./Pages/overview_page.py",
                             url_path = 'Analytics',
                             icon=":material/analytics:",
                             default=False
+                           ),
+                    # Not in the menu; open /Diagnostics directly.
+                    st.Page("./Pages/diagnostics_page.py",
+                            title="Diagnostics",
+                            url_path = 'Diagnostics',
+                            icon=":material/monitoring:",
+                            visibility="hidden"
                            )])
 pg.run()
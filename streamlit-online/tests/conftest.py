@@ -0,0 +1,17 @@
+import pytest
+
+from benchmarks.synthetic import generate
+from engine.loaders import ArtifactLoader, LoaderSettings
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory) -> str:
+    """A small synthetic data folder (same files and schemas as the real one), shared by the session."""
+    path = str(tmp_path_factory.mktemp("data"))
+    generate(path, n_ratings=3000, n_users=60, n_movies=300, seed=0, log=lambda *args: None)
+    return path
+
+
+@pytest.fixture
+def loader(data_dir) -> ArtifactLoader:
+    return ArtifactLoader(LoaderSettings(local_dir=data_dir, cache_dir=None))
@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from engine import aggregates
+from engine.aggregates import AGGREGATES_FILE
+from engine.loaders import ArtifactLoader, LoaderSettings
+
+
+def _copy_data(data_dir, tmp_path) -> str:
+    for name in ("movies.pkl", "ratings.pkl"):
+        shutil.copy(os.path.join(data_dir, name), tmp_path / name)
+    return str(tmp_path)
+
+
+def _loader(path: str) -> ArtifactLoader:
+    return ArtifactLoader(LoaderSettings(local_dir=path, cache_dir=None))
+
+
+def test_cli_output_is_dropped_once_the_ratings_change(data_dir, tmp_path, monkeypatch):
+    monkeypatch.setenv("MOVIE_APP_CACHE_DIR", "off")
+    monkeypatch.delenv("MOVIE_APP_MODEL_STORE", raising=False)
+    path = _copy_data(data_dir, tmp_path)
+    assert aggregates.main([path]) == 0
+    assert os.path.exists(os.path.join(path, AGGREGATES_FILE))
+
+    loader = _loader(path)
+    saved = loader.rating_aggregates()
+    assert saved is not None and saved.source == loader.ratings_fingerprint()
+    ratings = pd.read_pickle(os.path.join(path, "ratings.pkl"))
+    assert saved.n_ratings == len(ratings)
+    assert np.isclose(saved.rating_counts.sum(), len(ratings))
+
+    ratings.iloc[:-10].to_pickle(os.path.join(path, "ratings.pkl"))
+    changed = _loader(path)
+    # Without ``compute`` a stale file is a miss, not an answer.
+    assert changed.rating_aggregates() is None
+    assert changed.rating_aggregates(compute=True).n_ratings == len(ratings) - 10
@@ -0,0 +1,101 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from engine import artifact_cache
+from engine.artifact_cache import ArtifactCache
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves ``server.body`` with a strong ETag; Range is honoured unless an If-Range does not match."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body, etag = server.body, server.etag
+        start = 0
+        requested = self.headers.get("Range")
+        if requested and self.headers.get("If-Range", etag) == etag:
+            start = int(requested[len("bytes=") : -1])
+        self.send_response(206 if start else 200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body) - start))
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.end_headers()
+        sent = body[start:]
+        if server.truncate:
+            # Drop the connection halfway through, once.
+            server.truncate = False
+            sent = sent[: len(sent) // 2]
+            if server.change_after_truncate:
+                server.body, server.etag = server.change_after_truncate
+        self.wfile.write(sent)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.body, httpd.etag = bytes(range(256)) * 4096, '"v1"'
+    httpd.truncate, httpd.change_after_truncate, httpd.requests = False, None, []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Bytes of a chunk cut short are lost with the connection: keep chunks well under half the body.
+    monkeypatch.setattr(artifact_cache, "CHUNK_SIZE", 4096)
+    monkeypatch.setattr(artifact_cache.time, "sleep", lambda seconds: None)
+
+
+def _url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/model.bin"
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_download_then_hit(server, tmp_path):
+    cache = ArtifactCache(str(tmp_path))
+    path, hit = cache.get("model", _url(server))
+    assert not hit and _read(path) == server.body
+    assert cache.get("model", _url(server)) == (path, True)
+    assert len(server.requests) == 1
+
+
+def test_resume_appends_the_missing_range(server, tmp_path):
+    server.truncate = True
+    path, _ = ArtifactCache(str(tmp_path)).get("model", _url(server))
+    assert _read(path) == server.body
+    assert len(server.requests) == 2
+    offset = int(server.requests[1]["Range"][len("bytes=") : -1])
+    assert 0 < offset <= len(server.body) // 2
+    assert server.requests[1]["If-Range"] == '"v1"'
+
+
+def test_changed_remote_restarts_instead_of_splicing(server, tmp_path):
+    new_body = bytes(reversed(range(256))) * 4096
+    server.truncate, server.change_after_truncate = True, (new_body, '"v2"')
+    path, _ = ArtifactCache(str(tmp_path)).get("model", _url(server))
+    assert _read(path) == new_body
+    assert hashlib.sha256(new_body).hexdigest() == path.rsplit("/", 1)[-1]
+
+
+def test_verify_drops_a_corrupted_blob(server, tmp_path):
+    path, _ = ArtifactCache(str(tmp_path)).get("model", _url(server))
+    with open(path, "r+b") as f:
+        f.write(b"\xff")
+    # Same size: only re-hashing notices.
+    assert ArtifactCache(str(tmp_path)).lookup("model", _url(server)) == path
+    assert ArtifactCache(str(tmp_path), verify=True).lookup("model", _url(server)) is None
@@ -0,0 +1,29 @@
+import numpy as np
+
+from engine.cf import select_top_n
+
+
+def test_select_top_n_breaks_ties_by_column():
+    # Clipped estimates: far more than n columns share the ceiling.
+    scores = np.full((3, 1000), 4.0)
+    scores[:, ::7] = 5.0
+    scores[1, 500] = 5.5
+    scores[2, :50] = -np.inf
+    top, top_scores = select_top_n(scores, 10)
+    assert top[0].tolist() == list(range(0, 70, 7))
+    assert top[1].tolist() == [500] + list(range(0, 63, 7))
+    assert top[2].tolist() == list(range(56, 126, 7))
+    assert np.all(top_scores[0] == 5.0)
+
+
+def test_select_top_n_matches_a_stable_sort():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 4, size=(50, 200)).astype(float)
+    scores[rng.random(scores.shape) < 0.3] = -np.inf
+    expected = np.lexsort((np.broadcast_to(np.arange(200), scores.shape), -scores), axis=1)
+    for n in (1, 5, 150, 200, 250):
+        top, top_scores = select_top_n(scores, n)
+        columns = expected[:, :n]
+        best = np.take_along_axis(scores, columns, axis=1)
+        assert np.array_equal(top, np.where(np.isneginf(best), -1, columns))
+        assert np.array_equal(top_scores, best)
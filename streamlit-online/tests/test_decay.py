@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.decay import (
+    SECONDS_PER_DAY,
+    TimeDecay,
+    _notebook_weights,
+    decay_ratings,
+    load_weighted_ratings,
+    update_weights,
+)
+
+NOW = 1_600_000_000
+
+
+def test_one_half_life_halves_the_rating():
+    decay = TimeDecay("half_life", 30.0, NOW)
+    ratings = np.array([4.0, 4.0, 3.0, 5.0], dtype=np.float32)
+    # Ages: none, one half-life, two half-lives, and a rating newer than the reference.
+    timestamps = np.array([NOW, NOW - 30 * SECONDS_PER_DAY, NOW - 60 * SECONDS_PER_DAY, NOW + 100])
+    # The decay pulls ratings toward 0: one half-life is halfway there.
+    assert np.allclose(decay_ratings(ratings, timestamps, decay, chunk_rows=3), [4.0, 2.0, 0.75, 5.0])
+
+
+def test_default_decay_matches_the_notebook():
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(
+        {"rating": rng.integers(1, 11, 500) / 2, "timestamp": NOW - rng.integers(0, 60 * SECONDS_PER_DAY, 500)}
+    )
+    decay = TimeDecay().with_reference(int(frame["timestamp"].max()))
+    weighted = decay_ratings(frame["rating"].to_numpy(np.float32), frame["timestamp"].to_numpy(), decay)
+    assert np.allclose(weighted, _notebook_weights(frame), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("decay", [TimeDecay(), TimeDecay("half_life", 14.5, NOW), TimeDecay("linear", 365.0, None)])
+def test_dict_round_trip(decay):
+    assert TimeDecay.from_dict(decay.to_dict()) == decay
+    assert TimeDecay.from_dict(json.loads(json.dumps(decay.to_dict()))) == decay
+
+
+def test_unknown_kind_raises():
+    with pytest.raises(ValueError):
+        TimeDecay("cubic", 1.0)
+
+
+def test_update_weights_picks_up_late_and_changed_ratings(tmp_path):
+    path = str(tmp_path / "weighted_ratings")
+    decay = TimeDecay("half_life", 10.0)
+    users, movies = np.array([1, 1, 2]), np.array([10, 20, 10])
+    ratings, timestamps = np.array([4.0, 3.0, 5.0], dtype=np.float32), np.array([NOW, NOW - 5, NOW - 10])
+    assert update_weights(path, users, movies, ratings, timestamps, decay)["last_run_rows"] == 3
+    assert update_weights(path, users, movies, ratings, timestamps, decay)["last_run_rows"] == 0
+
+    # A re-rating, and a new pair older than the newest stored rating (a timestamp watermark would skip it).
+    users, movies = np.append(users, 3), np.append(movies, 30)
+    ratings, timestamps = np.array([4.0, 3.0, 1.0, 2.0], dtype=np.float32), np.array([NOW, NOW - 5, NOW, NOW - 20])
+    manifest = update_weights(path, users, movies, ratings, timestamps, decay)
+    assert manifest["last_run_rows"] == 2 and manifest["decay"]["reference"] == NOW
+    frame = load_weighted_ratings(path).sort_values(["userId", "movieId"])
+    assert frame["weightedRating"].round(4).tolist() == [4.0, 3.0, 1.0, 2.0]
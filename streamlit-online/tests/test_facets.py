@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.content import ContentRecommender
+from engine.facets import FacetFilter, FacetIndex
+from engine.neighbours import NeighbourTable, build_neighbour_table
+
+MOVIES = pd.DataFrame(
+    {
+        "genres": ["Action|Crime", "Comedy", "", "Action|Comedy|Drama", None, "Drama", "Crime|Drama", "Comedy|Drama"],
+        "release_date": ["1995-12-15", "2001-06-01", "1988-01-01", None, "2010-03-05", "1995-01-01", "2020-10-10", "x"],
+        "runtime": [170.0, 95.0, np.nan, 120.0, 88.0, 101.0, 140.0, 90.0],
+        "original_language": ["en", "fr", "en", None, "ja", "en", "fr", "en"],
+    }
+)
+
+
+def _expected(facets: FacetFilter) -> np.ndarray:
+    genres = MOVIES["genres"].fillna("").str.split("|").map(set)
+    years = pd.to_datetime(MOVIES["release_date"], errors="coerce").dt.year
+    expected = pd.Series(True, index=MOVIES.index)
+    if facets.genres_any:
+        expected &= genres.map(lambda g: bool(g & set(facets.genres_any)))
+    if facets.genres_all:
+        expected &= genres.map(lambda g: set(facets.genres_all) <= g)
+    for values, bounds in ((years, facets.years), (MOVIES["runtime"], facets.runtime)):
+        if bounds is not None:
+            low, high = bounds
+            expected &= values.notna()
+            if low is not None:
+                expected &= values >= low
+            if high is not None:
+                expected &= values <= high
+    if facets.languages:
+        expected &= MOVIES["original_language"].isin(facets.languages)
+    return expected.to_numpy()
+
+
+@pytest.mark.parametrize(
+    "facets",
+    [
+        FacetFilter(),
+        FacetFilter(genres_any=("Comedy", "Crime")),
+        FacetFilter(genres_all=("Drama", "Comedy")),
+        FacetFilter(years=(1995, 2001)),
+        FacetFilter(years=(None, 1995), runtime=(100, None)),
+        FacetFilter(runtime=(90, 120)),
+        FacetFilter(languages=("fr", "ja")),
+        FacetFilter(genres_any=("Drama",), years=(1990, None), runtime=(None, 150), languages=("en", "fr")),
+    ],
+)
+def test_mask_matches_a_pandas_filter(facets):
+    index = FacetIndex(*(MOVIES[name] for name in MOVIES.columns))
+    assert np.array_equal(index.mask(facets), _expected(facets))
+
+
+def test_unknown_genre_raises():
+    index = FacetIndex(*(MOVIES[name] for name in MOVIES.columns))
+    with pytest.raises(KeyError):
+        index.mask(FacetFilter(genres_any=("Western",)))
+
+
+def test_shallow_neighbour_table_falls_back_to_live_search(loader, monkeypatch):
+    live = loader.content_engine()
+    indices, distances = build_neighbour_table(live.vectors, k=5)
+    engine = ContentRecommender(*loader.content_bundle(), neighbour_table=NeighbourTable(indices, distances))
+    positions = np.flatnonzero(engine._row_of_pos >= 0)[:4]
+    allowed = np.zeros(len(engine.movies), dtype=bool)
+    allowed[::9] = True
+
+    calls = []
+    original = engine._live_neighbours
+    monkeypatch.setattr(engine, "_live_neighbours", lambda *args: calls.append(args) or original(*args))
+    # Unfiltered queries within the table depth are row lookups.
+    engine.neighbours(positions, 5)
+    assert not calls
+
+    found, similarity = engine.neighbours(positions, 5, allowed)
+    assert len(calls) == 1
+    assert found.shape == (4, 5) and allowed[found].all()
+    expected, expected_similarity = live.neighbours(positions, 5, allowed)
+    assert np.array_equal(found, expected)
+    assert np.allclose(similarity, expected_similarity)
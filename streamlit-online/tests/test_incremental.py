@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.cf import SVDScorer
+from engine.incremental import IncrementalCF, fold_in
+from engine.ratings_index import RatingsIndex
+
+
+def _scorer(rng, n_users=4, n_items=12, n_factors=3, biased=True) -> SVDScorer:
+    item_ids = np.arange(1, n_items + 1) * 10
+    return SVDScorer.from_factors(
+        pu=rng.normal(size=(n_users, n_factors)),
+        qi=rng.normal(size=(n_items, n_factors)),
+        bu=rng.normal(scale=0.1, size=n_users),
+        bi=rng.normal(scale=0.1, size=n_items),
+        global_mean=3.5,
+        user_ids=np.arange(1, n_users + 1),
+        user_inner=np.arange(n_users),
+        raw_item_ids=item_ids,
+        raw_item_inner=np.arange(n_items),
+        item_ids=item_ids[::-1],
+        biased=biased,
+    )
+
+
+def _ratings(n_users=4) -> RatingsIndex:
+    frame = pd.DataFrame(
+        {
+            "userId": np.repeat(np.arange(1, n_users + 1), 3),
+            "movieId": np.tile([10, 20, 30], n_users),
+            "rating": np.full(3 * n_users, 4.0),
+            "timestamp": np.arange(3 * n_users) + 1_000_000,
+        }
+    )
+    return RatingsIndex.from_frame(frame)
+
+
+@pytest.mark.parametrize("biased", [True, False])
+def test_fold_in_solves_the_regularised_normal_equations(biased):
+    rng = np.random.default_rng(0)
+    scorer = _scorer(rng, biased=biased)
+    # 999 is not in the model and is ignored.
+    movie_ids = np.array([20, 50, 70, 110, 999])
+    ratings = np.array([4.0, 2.5, 5.0, 3.0, 1.0])
+    reg = 0.05
+    pu, bu = fold_in(scorer, movie_ids, ratings, reg)
+
+    rows = movie_ids[:-1] // 10 - 1
+    design, target = scorer.qi[rows], ratings[:-1]
+    if biased:
+        target = target - scorer.global_mean - scorer.bi[rows]
+        design = np.hstack([design, np.ones((rows.size, 1))])
+    expected = np.linalg.solve(design.T @ design + reg * rows.size * np.eye(design.shape[1]), design.T @ target)
+    assert np.allclose(pu, expected[: scorer.qi.shape[1]])
+    assert bu == (pytest.approx(expected[-1]) if biased else 0.0)
+    assert fold_in(scorer, [999], [4.0]) is None
+
+
+def test_folded_user_scores_like_a_trained_one():
+    rng = np.random.default_rng(1)
+    scorer = _scorer(rng)
+    pu, bu = fold_in(scorer, [10, 40, 90], [5.0, 1.0, 3.5])
+    folded = scorer.with_folded_users([77, 2], np.vstack([pu, pu]), np.array([bu, bu]))
+    assert folded.knows_user(77) and not scorer.knows_user(77)
+
+    scores = folded.score([77, 2, 1])
+    # Same formula as for a user fitted in training, clipped to the rating scale, in catalog order.
+    rows = scorer.item_ids // 10 - 1
+    expected = np.clip(scorer.global_mean + bu + scorer.bi[rows] + scorer.qi[rows] @ pu, *scorer.rating_scale)
+    assert np.allclose(scores[0], expected)
+    assert np.allclose(scores[1], expected)
+    assert np.allclose(scores[2], scorer.score([1])[0])
+    assert np.allclose(folded.compacted().score([77, 2, 1]), scores)
+
+
+def test_compact_keeps_pending_ratings_when_it_fails(monkeypatch):
+    rng = np.random.default_rng(2)
+    cf = IncrementalCF(_ratings(), _scorer(rng), _scorer(rng))
+    cf.add_ratings([1, 9], [40, 50], [5.0, 2.0], timestamps=[1_000_100, 1_000_200])
+    before = cf.bundle()
+
+    def fail(self, delta):
+        raise MemoryError("merge")
+
+    monkeypatch.setattr(RatingsIndex, "merged", fail)
+    with pytest.raises(MemoryError):
+        cf.compact()
+    assert cf.pending_rows == 2
+    assert cf.bundle() is before
+    assert cf.compactions == 0
+
+    monkeypatch.undo()
+    assert cf.compact() == 2
+    ratings, algo, _ = cf.bundle()
+    assert cf.pending_rows == 0
+    assert 40 in ratings.user_movies(1) and ratings.user_movies(9).tolist() == [50]
+    assert algo.knows_user(9) and algo.n_folded_users == 0
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from engine import lookup
+from engine.lookup import MovieLookup
+from engine.service import RecommendationService, UnknownTitle
+
+IDS = np.array([5, 3, 9, 3, 0, 12])
+TITLES = ["Heat", "Alien", "Heat", "Brazil", "Up", "Ran"]
+
+
+@pytest.mark.parametrize("dense", [True, False])
+def test_ids_outside_the_table_are_missing(monkeypatch, dense):
+    if not dense:
+        # Too sparse for the id array: the sorted-array path.
+        monkeypatch.setattr(lookup, "DENSE_MIN_SLOTS", 0)
+        monkeypatch.setattr(lookup, "DENSE_SLOTS_PER_MOVIE", 1)
+    found = MovieLookup(IDS, TITLES)
+    assert (found._dense is not None) == dense
+    queries = [12, 0, 3, 5, -1, 13, 1 << 40, 7]
+    # Duplicated id 3 maps to its first row.
+    assert found.positions_of(queries).tolist() == [5, 4, 1, 0, -1, -1, -1, -1]
+    assert found.positions_of([]).size == 0
+
+
+def test_duplicate_titles_resolve_to_the_first_row():
+    found = MovieLookup(IDS, TITLES)
+    assert found.position_of_title("Heat") == 0
+    assert found.title_positions(["Ran", "Heat", "Jaws"]).tolist() == [5, 0, -1]
+    with pytest.raises(KeyError):
+        found.position_of_title("Jaws")
+
+
+def test_unknown_title_raises_unknown_title(loader):
+    service = RecommendationService(loader)
+    title = loader.movies(["title"])["title"].iloc[0]
+    assert service.movie_by_title(title, ["title"])["title"] == title
+    with pytest.raises(UnknownTitle):
+        service.movie_by_title("No Such Movie (1900)")
+    with pytest.raises(UnknownTitle):
+        service.similar_to_title("No Such Movie (1900)")
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from engine.ratings_index import RatingsIndex
+
+RATINGS = pd.DataFrame(
+    {
+        "userId": [7, 2, 7, 2, 9, 7, 2],
+        "movieId": [30, 10, 5, 40, 10, 12, 1],
+        "rating": [4.0, 3.5, 2.0, 5.0, 1.0, 4.5, 3.0],
+        "timestamp": [5, 1, 3, 2, 9, 4, 7],
+    }
+)
+# User 4 is known (e.g. from the users table) but has no ratings.
+USERS = [2, 4, 7, 9]
+
+
+def test_matches_a_pandas_groupby():
+    index = RatingsIndex.from_frame(RATINGS)
+    groups = RATINGS.groupby("userId")
+    counts = groups.size().reindex(USERS, fill_value=0)
+
+    assert index.user_ids.tolist() == sorted(groups.groups)
+    assert index.user_counts().tolist() == groups.size().tolist()
+    for user_id in USERS:
+        expected = sorted(RATINGS.loc[RATINGS["userId"] == user_id, "movieId"])
+        assert index.user_movies(user_id).tolist() == expected
+        assert index.user_movies(user_id).size == counts[user_id]
+        history = index.user_history(user_id)
+        merged = history.merge(RATINGS, on=["userId", "movieId"], suffixes=("", "_frame"))
+        assert len(merged) == counts[user_id]
+        assert np.allclose(merged["rating"], merged["rating_frame"])
+        assert (merged["timestamp"] == merged["timestamp_frame"]).all()
+    assert index.has_rated(4, [10, 30]).tolist() == [False, False]
+    assert index.has_rated(7, [30, 31, 5]).tolist() == [True, False, True]
+
+
+def test_movie_totals_match_a_pandas_groupby():
+    index = RatingsIndex.from_frame(RATINGS)
+    groups = RATINGS.groupby("movieId")["rating"]
+    ids, counts = index.movie_counts()
+    _, sums = index.movie_sums()
+    assert ids.tolist() == groups.size().index.tolist()
+    assert counts.tolist() == groups.size().tolist()
+    assert np.allclose(sums, groups.sum())
+
+
+def test_empty_frame():
+    index = RatingsIndex.from_frame(RATINGS.iloc[:0])
+    assert index.n_users == 0 and index.n_ratings == 0
+    assert index.user_counts().size == 0
+    assert index.user_movies(2).size == 0
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from engine.loaders import ArtifactLoader, LoaderSettings
+from engine.model_store import ModelStore, publish_data_dir
+from engine.result_cache import ENTRY_OVERHEAD, ResultCache, version_of
+from engine.service import RecommendationService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_eviction_at_capacity():
+    cache = ResultCache(max_entries=3)
+    for i in range(3):
+        cache.put("cf", i, 1, np.arange(i + 1))
+    assert cache.get("cf", 0, 1) is not None
+    cache.put("cf", 3, 1, np.arange(4))
+    # 1 was the least recently used once 0 was read.
+    assert cache.get("cf", 1, 1) is None
+    assert [cache.get("cf", i, 1)[0].size for i in (0, 2, 3)] == [1, 3, 4]
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 3
+
+    small = ResultCache(max_bytes=2 * (ENTRY_OVERHEAD + 40))
+    for i in range(3):
+        small.put("cf", i, 1, np.zeros(10, dtype=np.float32))
+    assert small.get("cf", 0, 1) is None and small.stats()["bytes"] <= small.max_bytes
+
+
+def test_ttl_expiry_with_an_injected_clock():
+    clock = FakeClock()
+    cache = ResultCache(ttl=10, clock=clock)
+    cache.put("content", "Heat", 1, np.arange(3))
+    clock.now += 10
+    assert cache.get("content", "Heat", 1) is not None
+    clock.now += 0.5
+    assert cache.get("content", "Heat", 1) is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_version_tokens_are_not_reused():
+    first = FakeClock()
+    token = version_of(first)
+    assert version_of(first) == token
+    del first
+    assert version_of(FakeClock()) != token
+
+
+def test_new_ratings_miss_cached_results(loader):
+    cache = ResultCache()
+    ratings, algo, _ = loader.cf_bundle()
+    user_id = int(ratings.user_ids[0])
+    cache.put("cf", (user_id, 10), (version_of(algo), version_of(ratings)), np.arange(10))
+    assert cache.get("cf", (user_id, 10), (version_of(algo), version_of(ratings))) is not None
+    changed = ratings.merged(pd.DataFrame({"userId": [user_id], "movieId": [1], "rating": [5.0], "timestamp": [0]}))
+    assert cache.get("cf", (user_id, 10), (version_of(algo), version_of(changed))) is None
+
+
+def test_store_hand_off_misses_cached_results(data_dir, tmp_path):
+    store = ModelStore(str(tmp_path / "store"))
+    publish_data_dir(store, data_dir)
+    loader = ArtifactLoader(LoaderSettings(local_dir=data_dir, cache_dir=None, store_root=store.root))
+    loader.sync_store()
+    service = RecommendationService(loader)
+    user_id = int(loader.ratings_index().user_ids[0])
+
+    first = service.user_recommendations(user_id)
+    assert service.user_recommendations(user_id) is first
+    assert loader.result_cache().stats()["hits"] == 1
+
+    publish_data_dir(store, data_dir)
+    assert loader.sync_store()
+    second = service.user_recommendations(user_id)
+    assert second is not first
+    assert np.array_equal(second[0], first[0])
+    assert loader.result_cache().stats()["misses"] == 2
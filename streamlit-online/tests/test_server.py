@@ -0,0 +1,114 @@
+import asyncio
+import http.client
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from engine import server as server_module
+from engine.server import RecommendationServer
+from engine.service import RecommendationService
+
+LINE_LIMIT = 4096
+
+
+@pytest.fixture
+def running(loader):
+    """(RecommendationServer, port) served from a background event loop on an ephemeral port."""
+    app = RecommendationServer(RecommendationService(loader), threads=2)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    # A small line limit, so an over-long header is read in full before the server answers and closes.
+    listener = asyncio.run_coroutine_threadsafe(
+        asyncio.start_server(app.serve_connection, "127.0.0.1", 0, limit=LINE_LIMIT), loop
+    ).result()
+    yield app, listener.sockets[0].getsockname()[1]
+
+    async def stop():
+        listener.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    app.pool.shutdown()
+
+
+def _get(port: int, path: str):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def _raw(port: int, request: bytes) -> bytes:
+    with socket.create_connection(("127.0.0.1", port), timeout=30) as sock:
+        sock.sendall(request)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+
+def test_user_recommendations(running, loader):
+    _, port = running
+    user_id = int(loader.ratings_index().user_ids[0])
+    status, payload = _get(port, f"/users/{user_id}/recommendations?n=5")
+    assert status == 200
+    assert len(payload["movies"]) == 5
+    scores = [movie["score"] for movie in payload["movies"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_unknown_user_is_404(running):
+    _, port = running
+    status, payload = _get(port, "/users/999999/recommendations")
+    assert status == 404
+    assert "999999" in payload["error"]
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5"])
+def test_bad_content_length_is_400(running, length):
+    _, port = running
+    response = _raw(port, b"POST /genre-profile HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 400 ")
+    assert b"Connection: close" in response
+
+
+def test_overlong_header_is_400(running):
+    _, port = running
+    response = _raw(port, b"GET /health HTTP/1.1\r\nX-Padding: " + b"a" * (2 * LINE_LIMIT) + b"\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 400 ")
+
+
+def test_concurrent_identical_requests_share_one_computation(running, loader, monkeypatch):
+    app, port = running
+    calls = []
+    query = server_module.QUERIES["user"]
+
+    def slow_user(service, params):
+        calls.append(params)
+        # Long enough for the second request to arrive while the first is computing.
+        time.sleep(0.5)
+        return query(service, params)
+
+    monkeypatch.setitem(server_module.QUERIES, "user", slow_user)
+    user_id = int(loader.ratings_index().user_ids[0])
+    with ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(lambda _: _get(port, f"/users/{user_id}/recommendations"), range(2)))
+    assert results[0] == results[1] and results[0][0] == 200
+    assert len(calls) == 1
+    assert app.coalescer.coalesced == 1